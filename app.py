@@ -1,78 +1,94 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify
+from flask import Blueprint, Flask, Response, g, render_template, request, redirect, url_for, jsonify
 from flask_cors import CORS
 import os
 import json
 import logging
-import shutil
 from pathlib import Path
 from genre_suggester.base_suggester import GenreSuggestion
-from genre_suggester.openai_suggester import OpenAIGenreSuggester
-from genre_suggester.tmdb_suggester import TMDBGenreSuggester
-import requests
-from rich.logging import RichHandler
-from rich.console import Console
-from rich import print as rprint
-import re
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from genre_suggester.factory import LazyGenreSuggester, SuggesterSettings
+from config import CONFIG_FILE, FINGERPRINT_CACHE_FILE, LIBRARY_INDEX_FILE, MOVE_JOURNAL_FILE, ConfigStore
+from metrics import (CONTENT_TYPE, HTTP_REQUEST_SECONDS, LIBRARY_MOVIES, REGISTRY, SCAN_DIRECTORIES,
+                     SCAN_SECONDS, SUGGESTION_CACHE_ENTRIES)
+from movie_library.duplicates import DuplicateFinder, FingerprintCache
+from movie_library.filename_parser import parse_filename, parse_filenames
+from movie_library.file_transfer import move_file, transfer_monitor
+from movie_library.index import LibraryIndex
+from movie_library.move_journal import MoveJournal, new_batch_id
+from movie_library.mover import DEFAULT_MOVE_WORKERS, ensure_genre_folder, execute_move_plan, move_movie_file
+from movie_library.suggestion_jobs import SuggestionJobRunner
+from movie_library.watcher import ChangeBroadcaster, LibraryWatcher
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 import threading
+import time
+import queue
 
-# Configure rich console logging
-console = Console(force_terminal=True)
+# DEBUG logs every suggester response; only turn it on when chasing a problem
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv('MOVIE_ORGANIZER_LOG_LEVEL', 'INFO').upper(),
     format='%(levelname)-8s %(message)s'
 )
 logger = logging.getLogger("movie_organizer")
 
-# Set OpenAI logger to debug as well
-logging.getLogger('genre_suggester.openai_suggester').setLevel(logging.DEBUG)
+# Routes live on a blueprint so a WSGI server can build the app with create_app()
+bp = Blueprint('organizer', __name__)
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Adds a Server-Timing header with the handler's duration to every response
+TIMING_HEADER = os.getenv('MOVIE_ORGANIZER_TIMING_HEADER', '').lower() in ('1', 'true', 'yes')
 
-# Get API tokens from environment
-OPENAI_API_TOKEN = os.getenv('MOVIE_ORGANIZER_OPENAI_API_TOKEN')
-TMDB_API_KEY = os.getenv('MOVIE_ORGANIZER_TMDB_API_KEY')
+# Suggester chain from MOVIE_ORGANIZER_* environment variables (shared with cli.py),
+# built on first use so startup never waits for API clients or the local catalog
+suggester_settings = SuggesterSettings.from_env()
+suggesters = LazyGenreSuggester(suggester_settings)
 
-# Initialize genre suggester
-if OPENAI_API_TOKEN:
-    logger.info("Using OpenAI for genre suggestions")
-    # Create TMDB suggester as fallback if API key is available
-    tmdb_suggester = TMDBGenreSuggester(TMDB_API_KEY) if TMDB_API_KEY else None
-    if tmdb_suggester:
-        try:
-            tmdb_suggester.initialize()
-            logger.info("Initialized TMDB suggester as fallback")
-        except Exception as e:
-            logger.error(f"Failed to initialize TMDB suggester: {e}")
-            tmdb_suggester = None
-    
-    # Create OpenAI suggester with optional TMDB fallback
-    genre_suggester = OpenAIGenreSuggester(OPENAI_API_TOKEN, tmdb_suggester=tmdb_suggester)
-    try:
-        genre_suggester.initialize()
-        logger.info("Successfully initialized OpenAI genre suggester")
-    except Exception as e:
-        logger.error(f"Failed to initialize genre suggester: {e}", exc_info=True)
-        genre_suggester = None
-else:
-    logger.error("OpenAI API token not configured")
-    genre_suggester = None
+def collect_suggestion_cache_size():
+    cache = suggesters.built_cache
+    if cache:
+        SUGGESTION_CACHE_ENTRIES.set(cache.stats()['entries'])
+
+REGISTRY.add_collector(collect_suggestion_cache_size)
 
 # Create a thread pool for handling LLM requests
-llm_executor = ThreadPoolExecutor(max_workers=3)
+LLM_WORKERS = int(os.getenv('MOVIE_ORGANIZER_LLM_WORKERS', 3))
+# Most each bulk suggestion job may spend on paid APIs, in dollars; unset for no limit
+JOB_BUDGET = float(os.environ['MOVIE_ORGANIZER_JOB_BUDGET']) if os.getenv('MOVIE_ORGANIZER_JOB_BUDGET') else None
+llm_executor = ThreadPoolExecutor(max_workers=LLM_WORKERS)
+
+# Bulk moves are renames on the same volume; a small pool overlaps the filesystem round trips
+MOVE_WORKERS = int(os.getenv('MOVIE_ORGANIZER_MOVE_WORKERS', DEFAULT_MOVE_WORKERS))
+move_executor = ThreadPoolExecutor(max_workers=MOVE_WORKERS)
+
+MOVIES_PAGE_SIZE = 100
+MAX_MOVIES_PAGE_SIZE = 500
+
+# selected_folder value for the view that merges every configured movie folder
+ALL_LIBRARIES = '__all__'
+# Each folder is scanned on its own worker; the view waits this long before serving a slow share
+# (a NAS that is asleep or gone) from what the index already knows about it
+SCAN_TIMEOUT_SECONDS = float(os.getenv('MOVIE_ORGANIZER_SCAN_TIMEOUT_SECONDS', 10))
+scan_executor = ThreadPoolExecutor(max_workers=int(os.getenv('MOVIE_ORGANIZER_SCAN_ROOT_WORKERS', 8)))
+
+# On-disk index of movie files, refreshed incrementally by directory mtime
+library_index = LibraryIndex(LIBRARY_INDEX_FILE)
+
+# Filesystem watcher: 'auto' uses inotify (via watchdog) when installed, else polls; 'off' disables it
+WATCH_MODE = os.getenv('MOVIE_ORGANIZER_WATCH_MODE', 'auto').lower()
+WATCH_POLL_SECONDS = float(os.getenv('MOVIE_ORGANIZER_WATCH_POLL_SECONDS', 30))
+SSE_KEEPALIVE_SECONDS = 15
 
-CONFIG_FILE = 'config.json'
+# Content fingerprints for finding duplicate rips, cached by inode and mtime so reruns read only new files
+duplicate_finder = DuplicateFinder(FingerprintCache(FINGERPRINT_CACHE_FILE))
+
+# Every move is journaled first; create_app() finishes whatever a previous run left half done
+move_journal = MoveJournal(MOVE_JOURNAL_FILE)
+
+# Parsed config.json, reloaded only when the file changes; writes are atomic
+config_store = ConfigStore(CONFIG_FILE)
 
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    return {'movie_folders': [], 'genres': []}
+    return config_store.get()
 
 def save_config(config):
-    with open(CONFIG_FILE, 'w') as f:
-        json.dump(config, f, indent=4, sort_keys=True)
+    config_store.save(config)
 
 def check_folder_access(folder_path):
     """Check if we have access to the folder and provide guidance if we don't"""
@@ -94,16 +110,101 @@ Error details: {str(e)}"""
         logger.error(error_message, exc_info=True)
         return False, error_message
 
-def get_relative_path(file_path, base_folder):
-    """Get the relative path of a file from its base folder"""
+def refresh_library(folder_path, full=False):
+    """Refresh the library index for a folder, recording scan duration and directory counts"""
+    with SCAN_SECONDS.time(full=str(bool(full)).lower()):
+        stats = library_index.refresh(folder_path, full=full)
+    SCAN_DIRECTORIES.inc(stats['directories'], kind='visited')
+    SCAN_DIRECTORIES.inc(stats['rescanned'], kind='rescanned')
+    if stats['rescanned'] or folder_path not in probed_roots:
+        library_executor.submit(probe_library, folder_path)
+    if suggester_settings.local_model_file and (stats['rescanned'] or folder_path not in trained_roots):
+        library_executor.submit(train_local_model, folder_path)
+    return stats
+
+scans_in_flight = {}
+scans_lock = threading.Lock()
+
+def scan_library(folder_path, full=False):
+    """Check access to one movie folder and refresh its index; runs on the scan pool"""
+    has_access, error_message = check_folder_access(folder_path)
+    if not has_access:
+        raise PermissionError(error_message)
+    return refresh_library(folder_path, full=full)
+
+def refresh_libraries(folders, full=False, timeout=SCAN_TIMEOUT_SECONDS):
+    """Refresh several movie folders at once, one scan per folder, waiting at most timeout seconds.
+
+    A folder still scanning when the time is up keeps going in the background
+    and is shown as the index last saw it; asking again while it runs waits
+    on the same scan instead of starting another. Returns {folder: 'scanned',
+    'scanning' or 'failed'}.
+    """
+    futures = {}
+    with scans_lock:
+        for folder in folders:
+            future = scans_in_flight.get(folder)
+            if future is None or future.done():
+                future = scans_in_flight[folder] = scan_executor.submit(scan_library, folder, full)
+            futures[folder] = future
+    wait(futures.values(), timeout=timeout)
+
+    status = {}
+    for folder, future in futures.items():
+        if not future.done():
+            logger.warning(f"Scan of {folder} is taking longer than {timeout}s; serving it from the index")
+            status[folder] = 'scanning'
+        elif future.exception():
+            logger.error(f"Error scanning {folder}: {future.exception()}")
+            status[folder] = 'failed'
+        else:
+            status[folder] = 'scanned'
+    return status
+
+# Probing container tags and retraining the local genre model are serialized on one
+# background thread, so the model always learns from the titles probed just before
+library_executor = ThreadPoolExecutor(max_workers=1)
+probed_roots = set()
+trained_roots = set()
+
+# Header parsing is CPU-bound, so large probes fan out to worker processes started on first use
+PROBE_WORKERS = int(os.getenv('MOVIE_ORGANIZER_PROBE_WORKERS', min(os.cpu_count() or 1, 4)))
+probe_executor = None
+
+def probe_library(root):
+    """Read the container tags of files under root that are new or changed since their last probe"""
+    global probe_executor
     try:
-        return str(Path(file_path).relative_to(base_folder))
-    except ValueError:
-        return str(file_path)
+        # Only the library thread gets here, so the pool needs no lock
+        if probe_executor is None and PROBE_WORKERS > 1:
+            probe_executor = ProcessPoolExecutor(max_workers=PROBE_WORKERS)
+        library_index.probe_media(root, probe_executor)
+        probed_roots.add(root)
+    except Exception as e:
+        logger.error(f"Error probing container tags under {root}: {e}", exc_info=True)
 
-def get_movie_files(folder_path):
-    """Get all movie files from the folder and subfolders"""
-    movies = []
+def train_local_model(root):
+    """Bring the local genre model in line with the genre folders under root"""
+    try:
+        local_model = suggesters.local_model
+        if local_model:
+            local_model.sync(root, library_index.labeled_movies(root, config_store.genres))
+            trained_roots.add(root)
+    except Exception as e:
+        logger.error(f"Error training local genre model on {root}: {e}", exc_info=True)
+
+def collect_library_sizes():
+    for root, count in library_index.movie_counts().items():
+        LIBRARY_MOVIES.set(count, root=root)
+
+REGISTRY.add_collector(collect_library_sizes)
+
+def get_movie_files(folder_path, genres=None, full_rescan=False):
+    """Get all movie files from the folder and subfolders.
+
+    Served from the library index, which is refreshed incrementally first:
+    only directories whose mtime changed since the last scan are re-listed.
+    """
     try:
         # First check if we have access to the folder
         has_access, error_message = check_folder_access(folder_path)
@@ -112,38 +213,11 @@ def get_movie_files(folder_path):
             return []
 
         # Get the configured genres
-        config = load_config()
-        genres = config.get('genres', [])
-
-        # Walk through the folder and its subfolders
-        for root, _, files in os.walk(folder_path):
-            # Skip #recycle folders
-            if '#recycle' in root.lower():
-                continue
-                
-            for file in files:
-                if file.lower().endswith(('.mp4', '.mkv', '.avi', '.mov')):
-                    full_path = os.path.join(root, file)
-                    relative_path = get_relative_path(full_path, folder_path)
-                    current_genre = os.path.basename(os.path.dirname(relative_path))
-                    
-                    # Skip if the immediate parent folder is #recycle
-                    if current_genre.lower() == '#recycle':
-                        continue
-                        
-                    # Only consider it a genre if it's in our configured genres
-                    if current_genre not in genres:
-                        current_genre = "Uncategorized"
-                    
-                    movies.append({
-                        'title': os.path.splitext(file)[0],
-                        'path': relative_path,
-                        'base_folder': folder_path,
-                        'current_genre': current_genre,
-                        'suggested_genre': None
-                    })
-        
-        return sorted(movies, key=lambda x: x['title'].lower())
+        if genres is None:
+            genres = config_store.genre_set
+
+        refresh_library(folder_path, full=full_rescan)
+        return library_index.list_movies(folder_path, genres)
     except PermissionError as e:
         logger.error(f"Permission denied accessing {folder_path}: {str(e)}", exc_info=True)
         raise
@@ -154,47 +228,18 @@ def get_movie_files(folder_path):
 # Business Logic Methods
 def clean_movie_title(filename: str) -> str:
     """Clean up movie title from filename"""
-    # Remove file extension
-    title = Path(filename).stem
-    
-    # Extract year if present
-    year_match = re.search(r'(?:^|\D)(\d{4})(?:\D|$)', title)
-    year = year_match.group(1) if year_match else None
-    
-    # Remove common video quality and source patterns
-    patterns = [
-        r'\b\d{3,4}p\b',           # Resolution (e.g., 720p, 1080p)
-        r'\bHDTV\b',
-        r'\bDVDRip\b',
-        r'\bBluRay\b',
-        r'\bWEB-?DL\b',            # Handle both WEB-DL and WEBDL
-        r'\bWEBRip\b',
-        r'\bx\d{3}\b',             # x264, x265
-        r'\bAAC\d*\b',             # AAC, AAC5.1
-        r'\bHEVC\b',
-        r'\bDD5\.1\b',             # Audio format
-        r'\d+MB\b',              # File size
-        r'\[.*?\]',                # Anything in brackets
-        r'\(.*?\)',                # Anything in parentheses
-    ]
-    
-    for pattern in patterns:
-        title = re.sub(pattern, '', title, flags=re.IGNORECASE)
-    
-    # Replace dots and underscores with spaces
-    title = title.replace('.', ' ').replace('_', ' ')
-    
-    # Remove multiple spaces
-    title = ' '.join(title.split())
-    
-    # Add year back if found
-    if year:
-        title = f"{title} ({year})"
-    
-    return title.strip()
+    return parse_filename(filename).display_title
 
-def suggest_genre_for_movie(movie_path):
+def movie_titles(base_folder, movie_paths):
+    """Clean titles for movie paths, from their container tags when the folder's index has them"""
+    if base_folder:
+        titles = library_index.movie_titles(base_folder, movie_paths)
+        return [titles[movie_path] for movie_path in movie_paths]
+    return [parsed.display_title for parsed in parse_filenames(movie_paths)]
+
+def suggest_genre_for_movie(movie_path, base_folder=None):
     """Get genre suggestion for a movie"""
+    genre_suggester = suggesters.suggester
     if not genre_suggester:
         logger.error("No genre suggester configured. Check if OpenAI API token is set.")
         return GenreSuggestion(
@@ -204,72 +249,101 @@ def suggest_genre_for_movie(movie_path):
             message="Genre suggester not configured. Check if OpenAI API token is set."
         )
         
-    clean_title = clean_movie_title(movie_path)
+    clean_title = movie_titles(base_folder, [movie_path])[0]
     logger.info(f"Processing movie: '{clean_title}'")
     
     config = load_config()
     return genre_suggester.suggest_genre(clean_title, config.get('genres', []))
 
-def ensure_genre_folder(base_folder, genre):
-    """Create genre folder if it doesn't exist"""
-    genre_folder = Path(base_folder) / genre
-    if not genre_folder.exists():
-        genre_folder.mkdir(parents=True, exist_ok=True)
-    return str(genre_folder)
+def suggest_genres_for_movies(base_folder, movie_paths, budget=None):
+    """Get genre suggestions for several movies, charging paid lookups to budget if given"""
+    genre_suggester = suggesters.suggester
+    if not genre_suggester:
+        logger.error("No genre suggester configured. Check if OpenAI API token is set.")
+        return [GenreSuggestion(
+            genre=None,
+            confidence="Low",
+            status="error",
+            message="Genre suggester not configured. Check if OpenAI API token is set."
+        ) for _ in movie_paths]
 
-def has_movies_or_subdirs(directory: Path) -> bool:
-    """Check if directory contains any movie files or subdirectories"""
-    try:
-        for item in directory.iterdir():
-            if item.is_dir():
-                return True  # Has subdirectory
-            if item.is_file() and item.suffix.lower() in ('.mp4', '.mkv', '.avi', '.mov'):
-                return True  # Has movie file
-        return False
-    except Exception as e:
-        logger.error(f"Error checking directory {directory}: {e}", exc_info=True)
-        return True  # Assume it has content if we can't check
-
-def move_movie_file(src_path, dest_folder):
-    """Move a movie file to destination folder and clean up empty source directory"""
-    # Convert relative path to absolute path if needed
-    src = Path(src_path)
-    if not src.is_absolute():
-        # Get the base folder from the path components before the movie file
-        # e.g., "Evil.Dead.Rise.2023.../movie.mkv" -> need to prepend base folder
-        base_folder = Path(dest_folder).parent
-        src = base_folder / src
-    
-    src_dir = src.parent
-    dest = Path(dest_folder) / src.name
-    
-    logger.info(f"Moving movie from '{src}' to '{dest}'")
-    
-    # Ensure source file exists
-    if not src.exists():
-        raise FileNotFoundError(f"Source file not found: {src}")
-    
-    # Move the movie file
-    shutil.move(str(src), str(dest))
-    
-    # Check if source directory should be cleaned up
-    if src_dir.exists() and src_dir != Path(dest_folder):
-        if not has_movies_or_subdirs(src_dir):
-            try:
-                logger.info(f"Removing directory and contents: {src_dir}")
-                shutil.rmtree(str(src_dir))
-            except Exception as e:
-                logger.error(f"Error removing directory {src_dir}: {e}", exc_info=True)
-    
-    return dest
+    clean_titles = movie_titles(base_folder, movie_paths)
+    logger.info(f"Processing {len(clean_titles)} movies in batch")
+
+    config = load_config()
+    return genre_suggester.suggest_genres(clean_titles, config.get('genres', []), budget)
+
+def store_suggestion(base_folder, movie_path, suggestion):
+    """Persist a suggestion in the library index so the movies table can show it"""
+    library_index.save_suggestion(base_folder, movie_path, suggestion.genre, suggestion.confidence,
+                                  suggestion.status, suggestion.message)
+
+# Bulk suggestion jobs run on the LLM pool, independent of any browser request. Only the
+# paid suggesters are rate limited (in the pipeline), so locally answered batches run at full speed
+suggestion_jobs = SuggestionJobRunner(llm_executor, suggest_genres_for_movies, store_suggestion, budget=JOB_BUDGET)
+
+def publish_library_changes(root, changes):
+    """Send movies that appeared or disappeared under root to every open movies page"""
+    if changes['added']:
+        library_executor.submit(probe_library, root)
+    if suggester_settings.local_model_file:
+        library_executor.submit(train_local_model, root)
+    genres = config_store.genre_set
+    library_changes.publish({
+        'root': root,
+        'added': [{
+            'title': movie['title'],
+            'path': movie['path'],
+            'base_folder': root,
+            'current_genre': movie['folder_name'] if movie['folder_name'] in genres else 'Uncategorized',
+            'suggested_genre': None
+        } for movie in changes['added']],
+        'removed': changes['removed']
+    })
+
+library_changes = ChangeBroadcaster()
+library_watcher = None
+library_watcher_lock = threading.Lock()
+
+def ensure_library_watcher():
+    """Start the filesystem watcher the first time a page subscribes to changes"""
+    global library_watcher
+    with library_watcher_lock:
+        if library_watcher is None and WATCH_MODE != 'off':
+            library_watcher = LibraryWatcher(library_index, lambda: load_config().get('movie_folders', []),
+                                             publish_library_changes, mode=WATCH_MODE,
+                                             poll_interval=WATCH_POLL_SECONDS)
+            library_watcher.start()
+    return library_watcher
+
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@bp.after_app_request
+def record_request_timing(response):
+    """Record how long the handler took; streamed bodies are timed up to their first byte"""
+    started = getattr(g, 'request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=str(response.status_code))
+    if TIMING_HEADER:
+        response.headers['Server-Timing'] = f'app;dur={elapsed * 1000:.1f}'
+    return response
+
+@bp.app_context_processor
+def template_constants():
+    return {'all_libraries': ALL_LIBRARIES}
 
 # HTTP Request Handlers
-@app.route('/')
+@bp.route('/')
 def index():
     config = load_config()
     return render_template('index.html', config=config)
 
-@app.route('/movies')
+@bp.route('/movies')
 def movies():
     try:
         config = load_config()
@@ -279,6 +353,14 @@ def movies():
         if not selected_folder:
             return render_template('movies.html', error_message="No movie folders configured", 
                                 movie_folders=[], movies=[], config=config)
+
+        if selected_folder == ALL_LIBRARIES:
+            library_status = refresh_libraries(movie_folders)
+            page = library_index.query_libraries(movie_folders, config.get('genres', []), limit=MOVIES_PAGE_SIZE)
+            return render_template('movies.html', movies=page.movies, movie_folders=movie_folders,
+                                 selected_folder=selected_folder, config=config,
+                                 total_movies=page.total, next_cursor=page.next_cursor,
+                                 page_size=MOVIES_PAGE_SIZE, library_status=library_status)
         
         # Check folder access before proceeding
         has_access, error_message = check_folder_access(selected_folder)
@@ -287,18 +369,169 @@ def movies():
                                 movie_folders=movie_folders, movies=[], 
                                 selected_folder=selected_folder, config=config)
         
-        movies = get_movie_files(selected_folder)
-        return render_template('movies.html', movies=movies, movie_folders=movie_folders,
-                             selected_folder=selected_folder, config=config)
+        # Only the first page is rendered; the table loads the rest from /api/movies
+        refresh_library(selected_folder)
+        page = library_index.query_movies(selected_folder, config.get('genres', []), limit=MOVIES_PAGE_SIZE)
+        return render_template('movies.html', movies=page.movies, movie_folders=movie_folders,
+                             selected_folder=selected_folder, config=config,
+                             total_movies=page.total, next_cursor=page.next_cursor,
+                             page_size=MOVIES_PAGE_SIZE)
     except Exception as e:
         logger.error(f"Error in movies route: {str(e)}", exc_info=True)
         return render_template('movies.html', error_message=str(e), 
                              movie_folders=[], movies=[], config=load_config())
 
-@app.route('/configure', methods=['POST'])
+@bp.route('/api/movies')
+def api_movies():
+    """Return one page of movies from the library index as JSON.
+
+    Query parameters: selected_folder (a movie folder, or __all__ for every
+    one merged), after (the next_cursor of the previous page, as JSON) or
+    page (1-based, one folder only), per_page, sort (title, genre or path),
+    order (asc or desc), genre, uncategorized and q (substring search on
+    title and path). The index is not refreshed here; that happens when
+    /movies is loaded or /rescan is called.
+    """
+    try:
+        config = load_config()
+        movie_folders = config.get('movie_folders', [])
+        selected_folder = request.args.get('selected_folder', movie_folders[0] if movie_folders else None)
+        if not selected_folder:
+            return jsonify({'error': 'No movie folders configured'}), 400
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', MOVIES_PAGE_SIZE, type=int), 1), MAX_MOVIES_PAGE_SIZE)
+        sort = request.args.get('sort', 'title')
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            return jsonify({'error': f'Invalid sort order: {order}'}), 400
+        after = json.loads(request.args['after']) if request.args.get('after') else None
+        if after is not None and not isinstance(after, list):
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        library_status = None
+        if selected_folder == ALL_LIBRARIES:
+            unscanned = [folder for folder in movie_folders if not library_index.has_root(folder)]
+            library_status = refresh_libraries(unscanned) if unscanned else {}
+            if page > 1 and after is None:
+                return jsonify({'error': 'Pages after the first of all libraries need the after cursor'}), 400
+            query, roots, paging = library_index.query_libraries, movie_folders, {}
+        else:
+            if not library_index.has_root(selected_folder):
+                has_access, error_message = check_folder_access(selected_folder)
+                if not has_access:
+                    return jsonify({'error': error_message}), 403
+                refresh_library(selected_folder)
+            query, roots, paging = library_index.query_movies, selected_folder, {'offset': (page - 1) * per_page}
+
+        page_result = query(
+            roots,
+            config.get('genres', []),
+            sort=sort,
+            descending=order == 'desc',
+            genre=request.args.get('genre') or None,
+            uncategorized=request.args.get('uncategorized', '').lower() in ('1', 'true', 'yes'),
+            search=request.args.get('q') or None,
+            limit=per_page,
+            after=after,
+            **paging
+        )
+        result = {
+            'movies': [movie.to_dict() for movie in page_result.movies],
+            'total': page_result.total,
+            'page': page,
+            'per_page': per_page,
+            'next_cursor': page_result.next_cursor,
+            'has_more': page_result.next_cursor is not None
+        }
+        if library_status is not None:
+            result['libraries'] = library_status
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error listing movies", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/events')
+def library_events():
+    """Server-sent events with movies added to or removed from the library as they happen"""
+    selected_folder = request.args.get('selected_folder')
+    if not ensure_library_watcher():
+        return jsonify({'error': 'Library watcher is disabled'}), 404
+
+    subscriber = library_changes.subscribe()
+
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if selected_folder not in (None, '', ALL_LIBRARIES) and event['root'] != selected_folder:
+                    continue
+                yield f"event: library\ndata: {json.dumps(event)}\n\n"
+        finally:
+            library_changes.unsubscribe(subscriber)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/rescan', methods=['POST'])
+def rescan():
+    """Force a full walk of a movie folder, ignoring cached directory mtimes"""
+    try:
+        data = request.get_json(silent=True) or {}
+        folder = data.get('selected_folder') or request.form.get('selected_folder')
+        if not folder:
+            return jsonify({'error': 'No folder provided'}), 400
+
+        if folder == ALL_LIBRARIES:
+            return jsonify({'success': True,
+                            'libraries': refresh_libraries(load_config().get('movie_folders', []), full=True)})
+
+        has_access, error_message = check_folder_access(folder)
+        if not has_access:
+            return jsonify({'error': error_message}), 403
+
+        stats = refresh_library(folder, full=True)
+        return jsonify({'success': True, **stats})
+
+    except Exception as e:
+        logger.error("Error rescanning folder", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/duplicates', methods=['GET'])
+def find_duplicates():
+    """Find movie files with identical content across every configured movie folder"""
+    try:
+        configured = load_config().get('movie_folders', [])
+        folders = [folder for folder in configured if os.path.isdir(folder)]
+        for folder in folders:
+            refresh_library(folder)
+        # An unmounted folder would look empty; keep its fingerprints until it is back
+        groups = duplicate_finder.find(library_index.movie_files(folders),
+                                       prune=len(folders) == len(configured))
+        return jsonify({
+            'wasted_bytes': sum(group.wasted_bytes for group in groups),
+            'groups': [{
+                'size': group.size,
+                'wasted_bytes': group.wasted_bytes,
+                'files': [{'base_folder': f.root, 'path': f.relative_path} for f in group.files]
+            } for group in groups]
+        })
+
+    except Exception as e:
+        logger.error("Error finding duplicates", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/configure', methods=['POST'])
 def configure():
-    config = load_config()
-    config['movie_folders'] = [folder.strip() for folder in request.form.get('movie_folders', '').split('\n') if folder.strip()]
+    movie_folders = [folder.strip() for folder in request.form.get('movie_folders', '').split('\n') if folder.strip()]
     # Split genres by comma and strip whitespace, then split any that contain newlines
     genres_text = request.form.get('genres', '').strip()
     raw_genres = [genre.strip() for genre in genres_text.split(',') if genre.strip()]
@@ -306,26 +539,31 @@ def configure():
     genres = []
     for genre in raw_genres:
         genres.extend([g.strip() for g in genre.split('\n') if g.strip()])
-    # Remove duplicates and sort alphabetically
-    config['genres'] = sorted(set(genres))
-    save_config(config)
-    return redirect(url_for('index'))
 
-@app.route('/suggest_genre', methods=['POST'])
+    def apply(config):
+        config['movie_folders'] = movie_folders
+        # Remove duplicates and sort alphabetically
+        config['genres'] = sorted(set(genres))
+
+    config_store.update(apply)
+    return redirect(url_for('.index'))
+
+@bp.route('/suggest_genre', methods=['POST'])
 def suggest_genre():
     """Handle genre suggestion request"""
     try:
         data = request.get_json()
-        logger.info(f"Received genre suggestion request: {data}")  # Debug log
-        
         movie_path = data.get('title')
         if not movie_path:
-            logger.error("No movie path provided in request")  # Debug log
+            logger.error("No movie path provided in request")
             return jsonify({'error': 'No movie path provided'}), 400
             
-        logger.info(f"Processing movie path: {movie_path}")  # Debug log
-        suggestion = suggest_genre_for_movie(movie_path)
-        logger.info(f"Got genre suggestion: {suggestion}")  # Debug log
+        base_folder = data.get('base_folder')
+        suggestion = suggest_genre_for_movie(movie_path, base_folder)
+        logger.debug(f"Got genre suggestion for {movie_path}: {suggestion}")
+
+        if base_folder:
+            store_suggestion(base_folder, movie_path, suggestion)
         
         # Convert GenreSuggestion object to response format
         response = {
@@ -341,7 +579,110 @@ def suggest_genre():
         logger.error(f"Error in genre suggestion: {str(e)}", exc_info=True)
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
-@app.route('/move_movie', methods=['POST'])
+@bp.route('/suggest_genres', methods=['POST'])
+def suggest_genres():
+    """Handle a batch genre suggestion request for several movies"""
+    try:
+        data = request.get_json()
+        movie_paths = data.get('titles')
+        if not movie_paths or not isinstance(movie_paths, list):
+            return jsonify({'error': 'No movie paths provided'}), 400
+
+        suggestions = suggest_genres_for_movies(data.get('base_folder'), movie_paths)
+
+        results = []
+        for movie_path, suggestion in zip(movie_paths, suggestions):
+            result = {
+                'title': movie_path,
+                'genre': suggestion.genre,
+                'status': suggestion.status
+            }
+            if suggestion.message:
+                result['message'] = suggestion.message
+            results.append(result)
+
+        return jsonify({'results': results})
+
+    except Exception as e:
+        logger.error(f"Error in batch genre suggestion: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e), 'status': 'error'}), 500
+
+@bp.route('/jobs/suggest', methods=['POST'])
+def start_suggestion_job():
+    """Start a background job that suggests genres for every Uncategorized movie in a folder"""
+    try:
+        data = request.get_json(silent=True) or {}
+        folder = data.get('selected_folder')
+        if not folder:
+            return jsonify({'error': 'No folder provided'}), 400
+        if folder == ALL_LIBRARIES:
+            return jsonify({'error': 'Bulk suggestions run on one movie folder at a time'}), 400
+        if not suggesters.suggester:
+            return jsonify({'error': 'Genre suggester not configured. Check if OpenAI API token is set.'}), 503
+
+        movies = get_movie_files(folder)
+        uncategorized = [movie.path for movie in movies
+                         if movie.current_genre == 'Uncategorized' and not movie.suggested_genre]
+        job = suggestion_jobs.start(folder, uncategorized)
+        return jsonify(job.to_dict()), 202
+
+    except Exception as e:
+        logger.error("Error starting suggestion job", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/jobs', methods=['GET'])
+def list_suggestion_jobs():
+    """List bulk suggestion jobs, newest first"""
+    return jsonify({'jobs': [job.to_dict() for job in suggestion_jobs.list_jobs()]})
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def suggestion_job_status(job_id):
+    """Report the progress of a bulk suggestion job"""
+    job = suggestion_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_suggestion_job(job_id):
+    """Stop a bulk suggestion job after the batches already in flight"""
+    job = suggestion_jobs.cancel(job_id)
+    if not job:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job.to_dict())
+
+@bp.route('/suggestion_cache', methods=['GET'])
+def suggestion_cache_stats():
+    """Report suggestion cache size and hit/miss counters"""
+    suggestion_cache = suggesters.cache
+    if not suggestion_cache:
+        return jsonify({'error': 'Suggestion cache not configured'}), 404
+    return jsonify(suggestion_cache.stats())
+
+@bp.route('/suggestion_cache/invalidate', methods=['POST'])
+def invalidate_suggestion_cache():
+    """Drop cached suggestions for one title, or all of them if no title is given"""
+    try:
+        suggestion_cache = suggesters.cache
+        if not suggestion_cache:
+            return jsonify({'error': 'Suggestion cache not configured'}), 404
+
+        data = request.get_json(silent=True) or {}
+        movie_path = data.get('title')
+        title = movie_titles(data.get('base_folder'), [movie_path])[0] if movie_path else None
+        removed = suggestion_cache.invalidate(title)
+        return jsonify({'success': True, 'removed': removed})
+
+    except Exception as e:
+        logger.error("Error invalidating suggestion cache", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/metrics')
+def metrics():
+    """Request latencies, scan, suggester and cache metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@bp.route('/move_movie', methods=['POST'])
 def move_movie():
     """Handle movie move request"""
     try:
@@ -355,15 +696,75 @@ def move_movie():
             return jsonify({'error': f'Missing required parameters: {", ".join(missing)}'}), 400
             
         genre_folder = ensure_genre_folder(base_folder, genre)
-        dest_path = move_movie_file(movie_path, genre_folder)
+        batch_id = new_batch_id()
+        dest_path = move_movie_file(movie_path, genre_folder, journal=move_journal, batch_id=batch_id)
+        library_index.clear_suggestion(base_folder, movie_path)
         
-        return jsonify({'success': True, 'new_path': str(dest_path)})
+        return jsonify({'success': True, 'new_path': str(dest_path), 'batch_id': batch_id})
         
     except Exception as e:
         logger.error("Error moving movie", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
-@app.route('/add_genre', methods=['POST'])
+@bp.route('/move_movies', methods=['POST'])
+def move_movies():
+    """Execute a whole move plan, streaming one JSON line per movie as it finishes"""
+    data = request.get_json() or {}
+    base_folder = data.get('base_folder')
+    moves = data.get('moves')
+    if not base_folder or not isinstance(moves, list):
+        return jsonify({'error': 'base_folder and a list of moves are required'}), 400
+    if base_folder == ALL_LIBRARIES:
+        return jsonify({'error': 'A move plan covers one movie folder'}), 400
+
+    batch_id = new_batch_id()
+    logger.info(f"Moving {len(moves)} movies in {base_folder} as batch {batch_id}")
+
+    def generate():
+        moved = failed = 0
+        for result in execute_move_plan(base_folder, moves, move_executor, move_journal, batch_id):
+            if result['success']:
+                moved += 1
+                library_index.clear_suggestion(base_folder, result['movie_path'])
+            else:
+                failed += 1
+            yield json.dumps(result) + '\n'
+        logger.info(f"Move plan finished: {moved} moved, {failed} failed")
+        refresh_library(base_folder)
+        yield json.dumps({'done': True, 'batch_id': batch_id, 'total': len(moves),
+                          'moved': moved, 'failed': failed}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@bp.route('/moves/progress')
+def move_progress():
+    """Bytes copied so far for moves that cross devices and are still copying"""
+    return jsonify({'transfers': transfer_monitor.snapshot()})
+
+@bp.route('/moves/batches')
+def move_batches():
+    """Recent move batches from the journal, newest first"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'batches': move_journal.batches(limit)})
+
+@bp.route('/moves/batches/<batch_id>/undo', methods=['POST'])
+def undo_move_batch(batch_id):
+    """Move every file of a batch back to where it was"""
+    try:
+        if not move_journal.entries(batch_id):
+            return jsonify({'error': f'Unknown batch: {batch_id}'}), 404
+        result = move_journal.undo_batch(batch_id, move_file)
+        base_folder = (request.get_json(silent=True) or {}).get('base_folder')
+        if base_folder == ALL_LIBRARIES:
+            refresh_libraries(load_config().get('movie_folders', []))
+        elif base_folder:
+            refresh_library(base_folder)
+        return jsonify(dict(result, batch_id=batch_id))
+    except Exception as e:
+        logger.error(f"Error undoing move batch {batch_id}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/add_genre', methods=['POST'])
 def add_genre():
     """Handle new genre addition request"""
     try:
@@ -372,10 +773,11 @@ def add_genre():
         if not new_genre:
             return jsonify({'error': 'No genre provided'}), 400
             
-        config = load_config()
-        if new_genre not in config['genres']:
-            config['genres'].append(new_genre)
-            save_config(config)
+        if config_store.canonical_genre(new_genre) is None:
+            def append(config):
+                if new_genre not in config.setdefault('genres', []):
+                    config['genres'].append(new_genre)
+            config_store.update(append)
             
         return jsonify({'success': True})
         
@@ -383,9 +785,35 @@ def add_genre():
         logger.error("Error adding genre", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+startup_lock = threading.Lock()
+started = False
+
+def start_background_work():
+    """Once per process: settle interrupted moves and build the suggesters off the request path"""
+    global started
+    with startup_lock:
+        if started:
+            return
+        started = True
+    move_executor.submit(move_journal.recover, move_file)
+    llm_executor.submit(suggesters.warm)
+
+def create_app(start_background=True):
+    """Build the Flask app, e.g. for a WSGI server (see wsgi.py)"""
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    app.register_blueprint(bp)
+    if start_background:
+        start_background_work()
+    return app
+
 if __name__ == '__main__':
-    # Check environment variables on startup
-    token_status = "not set" if not OPENAI_API_TOKEN else "set"
+    # The development server; MOVIE_ORGANIZER_DEBUG=0 turns off the debugger and reloader
+    debug = os.getenv('MOVIE_ORGANIZER_DEBUG', '1').lower() in ('1', 'true', 'yes')
+    token_status = "not set" if not suggester_settings.openai_api_token else "set"
     logger.info(f"Starting app with OpenAI API token status: {token_status}")
-    
-    app.run(host='0.0.0.0', port=5001, debug=True, use_reloader=True)
+
+    # With the reloader on, only the child process that serves requests does the startup work
+    serving_process = not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    create_app(start_background=serving_process).run(host='0.0.0.0', port=5001, debug=debug,
+                                                      use_reloader=debug, threaded=True)
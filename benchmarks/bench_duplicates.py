@@ -0,0 +1,93 @@
+"""Find duplicates in a library of large sparse files, then again from the cache.
+
+Creates --count sparse files of --size-mb each in a temporary folder (disk
+usage stays small; only the sampled regions and a marker are written),
+with every --dup-every-th file copied once and some same-size files that
+differ only outside the sampled regions. Reports time and bytes read for
+a cold run, a rerun against the fingerprint cache, and what hashing every
+file in full would have read:
+
+    python benchmarks/bench_duplicates.py
+    python benchmarks/bench_duplicates.py --count 1000 --size-mb 1024
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import FINGERPRINT_BYTES_READ
+from movie_library.duplicates import SAMPLE_SIZE, DuplicateFinder, FingerprintCache
+from movie_library.index import LibraryIndex
+
+def write_sparse(path, size, samples, marker_offset=None):
+    with open(path, 'wb') as f:
+        f.truncate(size)
+        for offset, data in samples:
+            f.seek(offset)
+            f.write(data)
+        if marker_offset is not None:
+            f.seek(marker_offset)
+            f.write(b'x')
+
+def build_library(root, count, size, dup_every, rng):
+    """Returns (duplicate pairs written, near copies written)"""
+    duplicates = near = 0
+    for i in range(count):
+        # Most files get a size of their own, as real rips do; some share one
+        file_size = size if i % 4 == 0 else size + i * 4096
+        samples = [(0, rng.randbytes(SAMPLE_SIZE)), (file_size // 2 - SAMPLE_SIZE, rng.randbytes(2 * SAMPLE_SIZE)),
+                   (file_size - SAMPLE_SIZE, rng.randbytes(SAMPLE_SIZE))]
+        genre = os.path.join(root, f"Genre {i % 7}")
+        os.makedirs(genre, exist_ok=True)
+        write_sparse(os.path.join(genre, f"Movie {i:05d} (2001).mkv"), file_size, samples)
+        if dup_every and i % dup_every == 0:
+            write_sparse(os.path.join(root, f"Movie {i:05d} (2001) copy.mkv"), file_size, samples)
+            duplicates += 1
+        elif dup_every and i % dup_every == 1:
+            # Same samples, different content in between: only the full hash tells them apart
+            write_sparse(os.path.join(root, f"Movie {i:05d} (2001) near.mkv"), file_size, samples,
+                         marker_offset=file_size // 4)
+            near += 1
+    return duplicates, near
+
+def run(label, finder, files):
+    before = {stage: FINGERPRINT_BYTES_READ.value(stage=stage) for stage in ('sample', 'full')}
+    start = time.perf_counter()
+    groups = finder.find(files)
+    elapsed = time.perf_counter() - start
+    read = {stage: FINGERPRINT_BYTES_READ.value(stage=stage) - before[stage] for stage in before}
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {len(groups):5d} groups  "
+          f"read {read['sample'] / 1e6:9.1f} MB sampled + {read['full'] / 1e6:9.1f} MB in full")
+    return groups
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=500, help='movie files to create')
+    parser.add_argument('--size-mb', type=int, default=128, help='apparent size of each file')
+    parser.add_argument('--dup-every', type=int, default=25, help='copy every Nth file once')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'movies')
+        duplicates, near = build_library(root, args.count, args.size_mb << 20, args.dup_every,
+                                         random.Random(args.seed))
+        index = LibraryIndex(os.path.join(tmp, 'index.db'))
+        index.refresh(root)
+        files = index.movie_files([root])
+        total = sum(f.size for f in files)
+        print(f"{len(files)} files, {total / 1e9:.1f} GB apparent, {duplicates} duplicated, {near} near copies")
+
+        cache = FingerprintCache(os.path.join(tmp, 'fingerprints.db'))
+        finder = DuplicateFinder(cache, max_workers=args.workers)
+        run('cold', finder, files)
+        run('rerun from cache', finder, files)
+        print(f"{'hashing every file in full':<28} would read {total / 1e6:.1f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Compare the single-pass filename parser with the original 13-regex cleaner.
+
+Parses a corpus of real-world release names, repeated with varied numbering
+up to --count filenames (100k by default). Runs cold (empty parse cache),
+warm (the same names again, as on a rescan) and with the legacy cleaner:
+
+    python benchmarks/bench_filename_parser.py
+    python benchmarks/bench_filename_parser.py --count 500000 --show
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_library.filename_parser import _parse_stem, parse_filenames
+
+CORPUS = [
+    "The.Matrix.1999.1080p.BluRay.x264-SPARKS.mkv",
+    "1917.2019.2160p.UHD.BluRay.x265-TERMiNAL.mkv",
+    "Blade.Runner.2049.2017.1080p.BluRay.DTS-HD.MA.7.1.x264-DON.mkv",
+    "2001.A.Space.Odyssey.1968.REMASTERED.720p.BluRay.x264-AMIABLE.mkv",
+    "[YTS.MX] Parasite (2019) [1080p] [WEBRip] [5.1].mp4",
+    "Parasite.2019.KOREAN.1080p.WEBRip.x264.AAC5.1-[YTS.MX].mp4",
+    "Inception_2010_720p_HDTV_AAC5.1.mp4",
+    "Charlotte's.Web.2006.DVDRip.XviD-DiAMOND.avi",
+    "Cam.2018.WEB.h264-GRP.mkv",
+    "Spider-Man.Into.the.Spider-Verse.2018.1080p.WEB-DL.DD5.1.H264-FGT.mkv",
+    "Mad Max Fury Road (2015) 1080p BluRay x265 HEVC 10bit AAC 7.1.mkv",
+    "Heat (1995).mkv",
+    "The Godfather Part II (1974) [BluRay] [1080p] [YTS.AM].mp4",
+    "Alien 1979 Directors Cut 700MB.avi",
+    "Amelie.2001.FRENCH.DVDRip.XviD.AC3-NoGroup.avi",
+    "Dune.Part.Two.2024.2160p.WEB-DL.DDP5.1.Atmos.DV.HDR.H.265-FLUX.mkv",
+    "Oppenheimer.2023.IMAX.1080p.BluRay.DDP5.1.x264-ZQ.mkv",
+    "Spirited.Away.2001.JAPANESE.1080p.BluRay.FLAC.x264-HANDJOB.mkv",
+    "Everything Everywhere All at Once (2022) (1080p BluRay x265 HEVC 10bit AAC 5.1 Tigole).mkv",
+    "Toy.Story.1995.720p.BRRip.x264-YIFY.mp4",
+    "Movie Name.mkv",
+    "some_home_video.mov",
+]
+
+def legacy_clean_movie_title(filename):
+    """clean_movie_title as it was before the filename parser"""
+    title = Path(filename).stem
+    year_match = re.search(r'(?:^|\D)(\d{4})(?:\D|$)', title)
+    year = year_match.group(1) if year_match else None
+    patterns = [
+        r'\b\d{3,4}p\b', r'\bHDTV\b', r'\bDVDRip\b', r'\bBluRay\b', r'\bWEB-?DL\b', r'\bWEBRip\b',
+        r'\bx\d{3}\b', r'\bAAC\d*\b', r'\bHEVC\b', r'\bDD5\.1\b', r'\d+MB\b', r'\[.*?\]', r'\(.*?\)',
+    ]
+    for pattern in patterns:
+        title = re.sub(pattern, '', title, flags=re.IGNORECASE)
+    title = title.replace('.', ' ').replace('_', ' ')
+    title = ' '.join(title.split())
+    if year:
+        title = f"{title} ({year})"
+    return title.strip()
+
+def build_names(count):
+    """Distinct filenames, so the cold run cannot lean on the parse cache"""
+    names = []
+    for i in range(count):
+        name = CORPUS[i % len(CORPUS)]
+        names.append(f"Genre{i % 7}/{i:06d}.{name}" if i >= len(CORPUS) else name)
+    return names
+
+def timed(label, func, names):
+    start = time.perf_counter()
+    result = func(names)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  ({elapsed / len(names) * 1e6:.2f} us/name)")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000, help='number of filenames to parse')
+    parser.add_argument('--show', action='store_true', help='print old and new titles for the corpus')
+    args = parser.parse_args()
+
+    if args.show:
+        for name, parsed in zip(CORPUS, parse_filenames(CORPUS)):
+            print(f"{name}\n    legacy: {legacy_clean_movie_title(name)}\n    parsed: {parsed}\n")
+
+    names = build_names(args.count)
+    print(f"Parsing {len(names)} filenames")
+    timed('legacy clean_movie_title', lambda ns: [legacy_clean_movie_title(n) for n in ns], names)
+    _parse_stem.cache_clear()
+    timed('parse_filenames (cold)', parse_filenames, names)
+    timed('parse_filenames (warm)', parse_filenames, names)
+
+if __name__ == '__main__':
+    main()
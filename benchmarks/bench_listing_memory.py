@@ -0,0 +1,129 @@
+"""Peak memory of listing a large library: dict rows compared with MovieRecord rows.
+
+Fills a temporary library index with --count movies (no files are created;
+the rows are written as a scan would write them), then lists them in a
+fresh process per implementation and reports the growth in peak RSS, the
+Python memory still held by the listing (tracemalloc) and the time taken:
+
+- original: get_movie_files before the index, a dict per movie and a
+  sorted copy keyed by a lambda calling .lower()
+- dicts: list_movies before MovieRecord, a dict per movie sorted in SQL
+- records: list_movies today
+
+    python benchmarks/bench_listing_memory.py
+    python benchmarks/bench_listing_memory.py --count 200000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_library.index import LibraryIndex
+from movie_library.scanner import DirectoryListing, ScannedFile
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Sci-Fi', 'Thriller']
+ROOT = '/library/movies'
+
+def fill_index(index, count, files_per_dir=50):
+    with index._lock:
+        for start in range(0, count, files_per_dir):
+            folder_index = start // files_per_dir
+            genre = GENRES[folder_index % len(GENRES)] if folder_index % 3 else 'Incoming'
+            directory = os.path.join(ROOT, genre)
+            files = []
+            for i in range(start, min(start + files_per_dir, count)):
+                name = f"Movie {i:06d} Part {i % 7} (20{i % 25:02d}).mkv"
+                relative_path = os.path.join(genre, name)
+                files.append(ScannedFile(os.path.join(ROOT, relative_path), relative_path, name, 1 << 30, 0, i, 0))
+            # Genre folders are listed in several chunks here, so each chunk gets a directory of its own
+            index._store_listing(ROOT, DirectoryListing(f"{directory}/{folder_index}", 0, True, files, []))
+        index._conn.commit()
+
+def original_listing(index, genres):
+    """get_movie_files before the library index, fed from the index instead of os.walk"""
+    with index._lock:
+        rows = index._conn.execute('SELECT title, relative_path, folder_name FROM files WHERE root = ?',
+                                   (ROOT,)).fetchall()
+    movies = []
+    for title, relative_path, folder_name in rows:
+        movies.append({
+            'title': title,
+            'path': relative_path,
+            'base_folder': ROOT,
+            'current_genre': folder_name if folder_name in genres else "Uncategorized",
+            'suggested_genre': None
+        })
+    return sorted(movies, key=lambda x: x['title'].lower())
+
+def dict_listing(index, genres):
+    """list_movies before MovieRecord"""
+    genres = set(genres)
+    with index._lock:
+        rows = index._conn.execute(
+            'SELECT f.title, f.relative_path, f.folder_name, s.genre FROM files f '
+            "LEFT JOIN suggestions s ON s.path = f.path AND s.status = 'success' "
+            'WHERE f.root = ? ORDER BY f.sort_title', (ROOT,)).fetchall()
+    return [{
+        'title': title,
+        'path': relative_path,
+        'base_folder': ROOT,
+        'current_genre': folder_name if folder_name in genres else "Uncategorized",
+        'suggested_genre': suggested_genre
+    } for title, relative_path, folder_name, suggested_genre in rows]
+
+def record_listing(index, genres):
+    return index.list_movies(ROOT, genres)
+
+LISTINGS = {'original': original_listing, 'dicts': dict_listing, 'records': record_listing}
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def measure(name, db_path, results):
+    """Runs in a fresh process so each listing starts from the same peak RSS"""
+    index = LibraryIndex(db_path)
+    listing = LISTINGS[name]
+    before = peak_rss_bytes()
+    start = time.perf_counter()
+    movies = listing(index, GENRES)
+    elapsed = time.perf_counter() - start
+    rss = peak_rss_bytes() - before
+    count = len(movies)
+    del movies
+
+    tracemalloc.start()
+    movies = listing(index, GENRES)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put((name, count, rss, held, peak, elapsed))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200000, help='movies in the index')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'index.db')
+        index = LibraryIndex(db_path)
+        fill_index(index, args.count)
+        index.close()
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        print(f"{'listing':<10} {'movies':>8} {'peak RSS +MB':>13} {'held MB':>9} {'peak MB':>9} {'ms':>9}")
+        for name in LISTINGS:
+            process = context.Process(target=measure, args=(name, db_path, results))
+            process.start()
+            name, count, rss, held, peak, elapsed = results.get()
+            process.join()
+            print(f"{name:<10} {count:8d} {rss / 1e6:13.1f} {held / 1e6:9.1f} {peak / 1e6:9.1f} {elapsed * 1000:9.1f}")
+
+if __name__ == '__main__':
+    main()
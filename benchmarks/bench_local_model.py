@@ -0,0 +1,107 @@
+"""Train and query the local genre model on a synthetic organized library.
+
+Builds --count labeled titles (20k by default) from per-genre word pools,
+with franchise sequels, shared filler words and --noise mislabeled movies
+so genres overlap the way a real library's do. Reports
+full training time, the cost of an incremental sync after a batch of moves,
+per-title prediction latency, held-out accuracy at each confidence level,
+and the size of the saved model:
+
+    python benchmarks/bench_local_model.py
+    python benchmarks/bench_local_model.py --count 50000 --moves 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from genre_suggester.local_model_suggester import LocalModelGenreSuggester
+
+GENRE_WORDS = {
+    'Horror': ['Dead', 'Blood', 'Haunting', 'Night', 'Evil', 'Curse', 'Zombie', 'Scream', 'Possession', 'Grave'],
+    'Comedy': ['Wedding', 'Party', 'Dude', 'Vacation', 'Roommates', 'Crazy', 'Stupid', 'Bachelor', 'Buddy', 'Road'],
+    'Action': ['Strike', 'Force', 'Mission', 'Fury', 'Assault', 'Hard', 'Fast', 'Explosive', 'Target', 'Agent'],
+    'Drama': ['Letters', 'Silence', 'Daughter', 'River', 'Winter', 'Promise', 'Story', 'Father', 'Home', 'Life'],
+    'Sci-Fi': ['Star', 'Galaxy', 'Planet', 'Android', 'Future', 'Orbit', 'Matrix', 'Signal', 'Time', 'Alien'],
+    'Animation': ['Little', 'Magic', 'Kingdom', 'Friends', 'Adventure', 'Dragon', 'Toy', 'Bear', 'Princess', 'Fox'],
+    'Documentary': ['Inside', 'Truth', 'Making', 'Secrets', 'History', 'World', 'Untold', 'Voices', 'Earth', 'Food'],
+}
+FILLER = ['The', 'Of', 'A', 'Last', 'Return', 'Lost', 'City', 'Dark', 'Love', 'House', 'Day', 'Man']
+
+def make_title(rng, genre):
+    # Some titles are filler only ("The Last Day") and give the model nothing to go on
+    words = rng.sample(GENRE_WORDS[genre], rng.choice((0, 1, 1, 2))) + rng.sample(FILLER, rng.randint(1, 2))
+    rng.shuffle(words)
+    title = ' '.join(words)
+    if rng.random() < 0.15:
+        title += f" {rng.choice(['2', '3', 'II', 'III', 'Part 2', 'Returns', 'Reloaded'])}"
+    return f"{title} ({rng.randint(1960, 2024)})"
+
+def build_library(rng, count, noise):
+    genres = list(GENRE_WORDS)
+    library = {}
+    for i in range(count):
+        genre = rng.choice(genres)
+        title = make_title(rng, genre)
+        folder = rng.choice(genres) if rng.random() < noise else genre
+        library[f"{folder}/{i:06d}.mkv"] = (title, folder)
+    return library
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=20000, help='labeled titles in the library')
+    parser.add_argument('--moves', type=int, default=200, help='titles changed before the incremental sync')
+    parser.add_argument('--queries', type=int, default=5000, help='held-out titles to predict')
+    parser.add_argument('--noise', type=float, default=0.2, help='share of titles filed under a random genre')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    library = build_library(rng, args.count, args.noise)
+    genres = list(GENRE_WORDS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'genre_model.json')
+        suggester = LocalModelGenreSuggester(model_path)
+        suggester.initialize()
+
+        start = time.perf_counter()
+        suggester.sync('/movies', library)
+        elapsed = time.perf_counter() - start
+        print(f"full training on {len(library)} titles  {elapsed * 1000:9.1f} ms")
+        print(f"saved model                     {os.path.getsize(model_path) / 1e6:9.1f} MB")
+
+        moved = dict(library)
+        for key in rng.sample(sorted(moved), args.moves):
+            title, _ = moved.pop(key)
+            genre = rng.choice(genres)
+            moved[f"{genre}/{key.split('/')[1]}"] = (title, genre)
+        start = time.perf_counter()
+        result = suggester.sync('/movies', moved)
+        elapsed = time.perf_counter() - start
+        print(f"incremental sync ({args.moves} moves)     {elapsed * 1000:9.1f} ms  "
+              f"(+{result['added']} -{result['removed']}, includes saving)")
+
+        start = time.perf_counter()
+        suggester = LocalModelGenreSuggester(model_path)
+        suggester.initialize()
+        print(f"loading the saved model         {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+        queries = [(make_title(rng, genre), genre) for genre in (rng.choice(genres) for _ in range(args.queries))]
+        start = time.perf_counter()
+        answers = [suggester.suggest_genre(title, genres) for title, _ in queries]
+        elapsed = time.perf_counter() - start
+        print(f"predict {len(queries)} titles             {elapsed * 1000:9.1f} ms  "
+              f"({elapsed / len(queries) * 1e6:.1f} us/title)")
+
+        for level in ('High', 'Medium', 'Low'):
+            hits = [answer.genre == genre for answer, (_, genre) in zip(answers, queries) if answer.confidence == level]
+            accuracy = f"{sum(hits) / len(hits):.1%} correct" if hits else "-"
+            print(f"  {level:<6} confidence: {len(hits) / len(queries):6.1%} of titles, {accuracy}")
+
+if __name__ == '__main__':
+    main()
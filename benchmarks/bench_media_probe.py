@@ -0,0 +1,146 @@
+"""Probe the container tags of a library of synthetic MKV, MP4 and AVI files.
+
+Creates --count sparse files of --size-mb each in a temporary folder, in
+turn an MKV with its Tags after the clusters (found via the SeekHead), an
+MP4 with its moov atom at the end, an AVI with a LIST INFO chunk and an
+MKV with no tags at all. Titles in the tags differ from the filenames, so
+the run also checks that each file's embedded title and year come back.
+Reports time for probing inline, on a process pool, and again once every
+file is cached in the index:
+
+    python benchmarks/bench_media_probe.py
+    python benchmarks/bench_media_probe.py --count 5000 --workers 8
+"""
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_library.index import LibraryIndex
+from movie_library import media_probe
+
+def ebml(element_id, data):
+    """An EBML element with an 8-byte size, so offsets are easy to work out"""
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + b'\x01' + len(data).to_bytes(7, 'big') + data
+
+def write_mkv(path, size, title, year):
+    header = ebml(media_probe.EBML_HEADER, ebml(0x4282, b'matroska'))
+    info = ebml(media_probe.INFO, ebml(media_probe.INFO_TITLE, b'release.group.encode'))
+    tags = b''
+    if title:
+        simple = [ebml(media_probe.SIMPLE_TAG, ebml(media_probe.TAG_NAME, name.encode())
+                       + ebml(media_probe.TAG_STRING, value.encode()))
+                  for name, value in (('TITLE', title), ('DATE_RELEASED', f'{year}-05-01'))]
+        tags = ebml(media_probe.TAGS, ebml(media_probe.TAG, b''.join(simple)))
+    seek_head_size = len(ebml(media_probe.SEEK_HEAD, ebml(media_probe.SEEK, ebml(media_probe.SEEK_ID, b'\0' * 4)
+                                                            + ebml(media_probe.SEEK_POSITION, b'\0' * 8))))
+    cluster_size = max(size - len(header) - 12 - seek_head_size - len(info) - len(tags) - 12, 0)
+    tags_position = seek_head_size + len(info) + 12 + cluster_size
+    seek_head = ebml(media_probe.SEEK_HEAD, ebml(media_probe.SEEK, ebml(
+        media_probe.SEEK_ID, media_probe.TAGS.to_bytes(4, 'big'))
+        + ebml(media_probe.SEEK_POSITION, tags_position.to_bytes(8, 'big'))))
+    with open(path, 'wb') as f:
+        # A Segment of unknown size, as written by live muxers
+        f.write(header + media_probe.SEGMENT.to_bytes(4, 'big') + b'\x01' + b'\xff' * 7)
+        f.write(seek_head + info)
+        f.write(media_probe.CLUSTER.to_bytes(4, 'big') + b'\x01' + cluster_size.to_bytes(7, 'big'))
+        f.seek(cluster_size, os.SEEK_CUR)
+        f.write(tags)
+
+def atom(kind, data):
+    return struct.pack('>I4s', len(data) + 8, kind) + data
+
+def write_mp4(path, size, title, year):
+    def text(kind, value):
+        return atom(kind, atom(b'data', struct.pack('>II', 1, 0) + value.encode()))
+    hdlr = atom(b'hdlr', b'\0' * 8 + b'mdirappl' + b'\0' * 9)
+    meta = atom(b'meta', b'\0' * 4 + hdlr + atom(b'ilst', text(b'\xa9nam', title) + text(b'\xa9day', str(year))))
+    moov = atom(b'moov', atom(b'mvhd', b'\0' * 100) + atom(b'udta', meta))
+    ftyp = atom(b'ftyp', b'isom\0\0\2\0isomiso2mp41')
+    mdat_size = max(size - len(ftyp) - len(moov), 8)
+    with open(path, 'wb') as f:
+        # Not written for streaming: the media data comes first and moov last
+        f.write(ftyp + struct.pack('>I4s', mdat_size, b'mdat'))
+        f.seek(mdat_size - 8, os.SEEK_CUR)
+        f.write(moov)
+
+def write_avi(path, size, title, year):
+    def chunk(kind, value):
+        data = value.encode() + b'\0'
+        return struct.pack('<4sI', kind, len(data)) + data + b'\0' * (len(data) & 1)
+    info = b'INFO' + chunk(b'INAM', title) + chunk(b'ICRD', f'{year}-01-01')
+    movi_size = max(size - 24 - len(info), 4)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<4sI4s', b'RIFF', size - 8, b'AVI '))
+        f.write(struct.pack('<4sI', b'LIST', len(info)) + info)
+        f.write(struct.pack('<4sI4s', b'LIST', movi_size, b'movi'))
+        f.truncate(size)
+
+def build_library(root, count, size):
+    """Returns {relative path: expected clean title}"""
+    expected = {}
+    for i in range(count):
+        folder = os.path.join(root, f"Genre {i % 7}")
+        os.makedirs(folder, exist_ok=True)
+        title, year = f"Embedded Title {i}", 1950 + i % 70
+        kind = i % 4
+        if kind == 0:
+            name = f"release.{i:05d}.1080p.x264.mkv"
+            write_mkv(os.path.join(folder, name), size, title, year)
+        elif kind == 1:
+            name = f"release.{i:05d}.720p.mp4"
+            write_mp4(os.path.join(folder, name), size, title, year)
+        elif kind == 2:
+            name = f"release.{i:05d}.xvid.avi"
+            write_avi(os.path.join(folder, name), size, title, year)
+        else:
+            name = f"Untagged Movie {i:05d} (2001).mkv"
+            write_mkv(os.path.join(folder, name), size, None, None)
+            title, year = f"Untagged Movie {i:05d}", 2001
+        expected[os.path.join(f"Genre {i % 7}", name)] = f"{title} ({year})"
+    return expected
+
+def forget_probes(index):
+    with index._lock:
+        index._conn.execute('DELETE FROM media_tags')
+        index._conn.commit()
+
+def run(label, index, root, executor=None):
+    start = time.perf_counter()
+    counts = index.probe_media(root, executor)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed * 1000:9.1f} ms  {counts['probed']:6d} probed  {counts['tagged']:6d} tagged")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000, help='movie files to create')
+    parser.add_argument('--size-mb', type=int, default=64, help='apparent size of each file')
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'movies')
+        expected = build_library(root, args.count, args.size_mb << 20)
+        index = LibraryIndex(os.path.join(tmp, 'index.db'))
+        index.refresh(root)
+        print(f"{len(expected)} files of {args.size_mb} MB apparent size")
+
+        run('inline', index, root)
+        forget_probes(index)
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            run(f'{args.workers} worker processes', index, root, executor)
+        run('rerun from index', index, root)
+
+        titles = index.movie_titles(root, expected)
+        wrong = [(path, titles[path], title) for path, title in expected.items() if titles[path] != title]
+        for path, got, title in wrong[:5]:
+            print(f"  {path}: got {got!r}, expected {title!r}")
+        print(f"{len(expected) - len(wrong)}/{len(expected)} titles as embedded")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Compare the parallel scandir scanner with the original os.walk scan.
+
+Builds a synthetic library (100k movie files by default) in a temporary
+directory, or scans an existing folder given with --root, e.g. a NAS mount:
+
+    python benchmarks/bench_scanner.py
+    python benchmarks/bench_scanner.py --root /Volumes/Movies --workers 4 8 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from movie_library.scanner import scan_movie_files
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Sci-Fi', 'Thriller']
+
+def build_tree(root, file_count, files_per_dir=5):
+    """Create a genre/movie-folder tree with empty movie files and some sidecars"""
+    for i in range(file_count):
+        folder_index = i // files_per_dir
+        genre = GENRES[folder_index % len(GENRES)] if folder_index % 3 else 'Incoming'
+        folder = os.path.join(root, genre, f"Movie.{folder_index:06d}.2020.1080p.BluRay.x264")
+        if i % files_per_dir == 0:
+            os.makedirs(folder, exist_ok=True)
+            open(os.path.join(folder, 'movie.nfo'), 'w').close()
+        open(os.path.join(folder, f"Movie.{i:06d}.2020.1080p.BluRay.x264.mkv"), 'w').close()
+    os.makedirs(os.path.join(root, '#recycle', 'Old.Movie'), exist_ok=True)
+    open(os.path.join(root, '#recycle', 'Old.Movie', 'Old.Movie.mkv'), 'w').close()
+
+def legacy_get_movie_files(folder_path, genres):
+    """The os.walk based scan that get_movie_files used before the library index"""
+    movies = []
+    for root, _, files in os.walk(folder_path):
+        if '#recycle' in root.lower():
+            continue
+        for file in files:
+            if file.lower().endswith(('.mp4', '.mkv', '.avi', '.mov')):
+                full_path = os.path.join(root, file)
+                try:
+                    relative_path = str(Path(full_path).relative_to(folder_path))
+                except ValueError:
+                    relative_path = str(full_path)
+                current_genre = os.path.basename(os.path.dirname(relative_path))
+                if current_genre.lower() == '#recycle':
+                    continue
+                if current_genre not in genres:
+                    current_genre = "Uncategorized"
+                movies.append({
+                    'title': os.path.splitext(file)[0],
+                    'path': relative_path,
+                    'base_folder': folder_path,
+                    'current_genre': current_genre,
+                    'suggested_genre': None
+                })
+    return sorted(movies, key=lambda x: x['title'].lower())
+
+def timed(label, func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<32} {best * 1000:10.1f} ms  ({len(result)} files)")
+    return result
+
+def run(root, workers, repeat):
+    legacy = timed('os.walk (legacy)', lambda: legacy_get_movie_files(root, GENRES), repeat)
+    for count in workers:
+        scanned = timed(f"scandir, {count} workers", lambda: list(scan_movie_files(root, max_workers=count)), repeat)
+        if sorted(f.relative_path for f in scanned) != sorted(m['path'] for m in legacy):
+            print(f"  WARNING: scanner with {count} workers found a different set of files")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--root', help='Scan an existing folder instead of building a synthetic tree')
+    parser.add_argument('--files', type=int, default=100_000, help='Number of files in the synthetic tree')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.root:
+        run(args.root, args.workers, args.repeat)
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"Building synthetic tree with {args.files} files in {root}...")
+        build_tree(root, args.files)
+        run(root, args.workers, args.repeat)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Organize a movie folder from the command line, without the web server.
+
+Scans the folder, asks the configured genre suggesters about every
+uncategorized movie in parallel, and moves the ones suggested with enough
+confidence into their genre folders. Uses the same config.json, library
+index, suggestion cache and move journal as the web app, so batches moved
+here can be undone from the movies page.
+
+    python cli.py /movies --dry-run --plan plan.json   # write the plan, move nothing
+    python cli.py --apply-plan plan.json               # carry out a reviewed plan
+    python cli.py /movies --jobs 8 --min-confidence medium --json
+    python cli.py /movies --budget 0.50                # spend at most $0.50 on paid APIs
+    python cli.py --find-duplicates                    # list identical files across all movie folders
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional, Tuple
+from config import CONFIG_FILE, FINGERPRINT_CACHE_FILE, LIBRARY_INDEX_FILE, MOVE_JOURNAL_FILE, ConfigStore
+from genre_suggester.base_suggester import GenreSuggestion
+from genre_suggester.factory import SuggesterSettings, build_genre_suggester
+from genre_suggester.local_model_suggester import LocalModelGenreSuggester
+from genre_suggester.pipeline_suggester import PipelineGenreSuggester, SuggestionBudget
+from movie_library.duplicates import DuplicateFinder, FingerprintCache
+from movie_library.file_transfer import move_file
+from movie_library.index import LibraryIndex, MovieRecord
+from movie_library.move_journal import MoveJournal, new_batch_id
+from movie_library.mover import DEFAULT_MOVE_WORKERS, execute_move_plan
+from movie_library.suggestion_jobs import DEFAULT_BATCH_SIZE
+
+logger = logging.getLogger("movie_organizer.cli")
+
+PLAN_VERSION = 1
+CONFIDENCE_LEVELS = ('low', 'medium', 'high')
+
+class Reporter:
+    """Writes results to stdout as JSON lines (--json) or as short text lines"""
+
+    def __init__(self, as_json: bool, stream=sys.stdout):
+        self.as_json = as_json
+        self.stream = stream
+
+    def emit(self, event: str, text: str, **fields) -> None:
+        if self.as_json:
+            self.stream.write(json.dumps(dict(fields, event=event)) + '\n')
+        else:
+            self.stream.write(text + '\n')
+        self.stream.flush()
+
+def confidence_rank(confidence: Optional[str]) -> int:
+    """Position of a confidence level in CONFIDENCE_LEVELS, -1 if unknown"""
+    try:
+        return CONFIDENCE_LEVELS.index((confidence or '').strip().lower())
+    except ValueError:
+        return -1
+
+def uncategorized_movies(index: LibraryIndex, folder: str, genres,
+                         full_rescan: bool = False) -> List[Tuple[MovieRecord, str]]:
+    """(movie, clean title) for movies under folder not in a genre folder yet, from a freshly refreshed index.
+
+    New and changed files have their container tags probed first, on worker
+    processes, so clean titles come from the tags where a file has them.
+    """
+    index.refresh(folder, full=full_rescan)
+    with ProcessPoolExecutor() as executor:
+        index.probe_media(folder, executor)
+    movies = [movie for movie in index.list_movies(folder, genres) if movie.current_genre == 'Uncategorized']
+    titles = index.movie_titles(folder, [movie.path for movie in movies])
+    return [(movie, titles[movie.path]) for movie in movies]
+
+def suggest_in_parallel(suggester: PipelineGenreSuggester, movies: List[Tuple[MovieRecord, str]],
+                        valid_genres: List[str], jobs: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                        budget: Optional[SuggestionBudget] = None
+                        ) -> Iterator[Tuple[Tuple[MovieRecord, str], GenreSuggestion]]:
+    """Suggest genres for (movie, clean title) pairs in batches on jobs threads, yielding each pair
+    with its suggestion as batches finish"""
+
+    def suggest_batch(batch: List[Tuple[MovieRecord, str]]) -> List[GenreSuggestion]:
+        return suggester.suggest_genres([title for _, title in batch], valid_genres, budget)
+
+    batches = [movies[i:i + batch_size] for i in range(0, len(movies), batch_size)]
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(suggest_batch, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                suggestions = future.result()
+            except Exception as e:
+                logger.error(f"Error suggesting genres for a batch of {len(batch)} movies: {e}")
+                suggestions = [GenreSuggestion(genre=None, confidence="Low", status="error", message=str(e))
+                               for _ in batch]
+            yield from zip(batch, suggestions)
+
+def plan_entry(movie: MovieRecord, title: str, suggestion: GenreSuggestion, config_store: ConfigStore,
+               min_rank: int) -> Tuple[bool, Dict]:
+    """Decide whether a suggestion is good enough to act on; returns (move, plan entry)"""
+    entry = {'movie_path': movie.path, 'title': title,
+             'genre': suggestion.genre, 'confidence': suggestion.confidence}
+    if suggestion.status != 'success' or not suggestion.genre:
+        return False, dict(entry, reason=suggestion.message or f'Suggestion {suggestion.status}')
+    genre = config_store.canonical_genre(suggestion.genre)
+    if genre is None:
+        return False, dict(entry, reason=f"'{suggestion.genre}' is not a configured genre")
+    if confidence_rank(suggestion.confidence) < min_rank:
+        return False, dict(entry, reason=f'Confidence {suggestion.confidence} is below the threshold')
+    return True, dict(entry, genre=genre)
+
+def build_plan(folder: str, config_store: ConfigStore, index: LibraryIndex, suggester: PipelineGenreSuggester,
+               reporter: Reporter, jobs: int, min_confidence: str, full_rescan: bool = False,
+               budget: Optional[SuggestionBudget] = None,
+               local_model: Optional[LocalModelGenreSuggester] = None) -> Dict:
+    """Scan folder and suggest genres for its uncategorized movies, returning a move plan"""
+    started = time.monotonic()
+    genres = config_store.genres
+    movies = uncategorized_movies(index, folder, config_store.genre_set, full_rescan)
+    if local_model:
+        # Learn from what is already sorted before asking about the rest
+        local_model.sync(folder, index.labeled_movies(folder, genres))
+    reporter.emit('scan', f"Found {len(movies)} uncategorized movies in {folder}",
+                  folder=folder, uncategorized=len(movies))
+
+    budget = budget if budget is not None else SuggestionBudget()
+    min_rank = confidence_rank(min_confidence)
+    moves, skipped = [], []
+    for (movie, title), suggestion in suggest_in_parallel(suggester, movies, genres, jobs, budget=budget):
+        index.save_suggestion(folder, movie.path, suggestion.genre, suggestion.confidence,
+                              suggestion.status, suggestion.message)
+        move, entry = plan_entry(movie, title, suggestion, config_store, min_rank)
+        (moves if move else skipped).append(entry)
+        if move:
+            text = f"plan  {entry['movie_path']} -> {entry['genre']} ({entry['confidence']})"
+        else:
+            text = f"skip  {entry['movie_path']}: {entry['reason']}"
+        reporter.emit('suggestion', text, action='move' if move else 'skip', **entry)
+
+    return {
+        'version': PLAN_VERSION,
+        'base_folder': folder,
+        'created_at': time.time(),
+        'min_confidence': min_confidence,
+        'suggest_seconds': round(time.monotonic() - started, 3),
+        'spend': budget.to_dict(),
+        'moves': sorted(moves, key=lambda entry: entry['movie_path']),
+        'skipped': sorted(skipped, key=lambda entry: entry['movie_path'])
+    }
+
+def apply_plan(plan: Dict, index: LibraryIndex, journal: MoveJournal, reporter: Reporter, jobs: int) -> Dict:
+    """Carry out the moves of a plan as one journaled batch; returns the summary"""
+    base_folder = plan['base_folder']
+    if not plan['moves']:
+        return {'batch_id': None, 'total': 0, 'moved': 0, 'failed': 0}
+    batch_id = new_batch_id()
+    moved = failed = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for result in execute_move_plan(base_folder, plan['moves'], executor, journal, batch_id):
+            if result['success']:
+                moved += 1
+                index.clear_suggestion(base_folder, result['movie_path'])
+                text = f"moved {result['movie_path']} -> {result['genre']}"
+            else:
+                failed += 1
+                text = f"error {result['movie_path']}: {result['error']}"
+            reporter.emit('move', text, **result)
+    index.refresh(base_folder)
+    return {'batch_id': batch_id, 'total': len(plan['moves']), 'moved': moved, 'failed': failed}
+
+def find_duplicates(folders: List[str], index: LibraryIndex, reporter: Reporter, jobs: int,
+                    full_rescan: bool = False) -> Dict:
+    """Report files with identical content across folders; returns the summary"""
+    for folder in folders:
+        index.refresh(folder, full=full_rescan)
+    cache = FingerprintCache(FINGERPRINT_CACHE_FILE)
+    try:
+        # An unmounted folder would look empty; keep its fingerprints until it is back
+        groups = DuplicateFinder(cache, max_workers=jobs).find(
+            index.movie_files(folders), prune=all(os.path.isdir(folder) for folder in folders))
+    finally:
+        cache.close()
+    for group in groups:
+        paths = [f.path for f in group.files]
+        reporter.emit('duplicate', f"{group.wasted_bytes / 1e9:.2f} GB wasted by {len(paths)} copies:\n  "
+                      + '\n  '.join(paths), size=group.size, wasted_bytes=group.wasted_bytes, files=paths)
+    return {'groups': len(groups), 'wasted_bytes': sum(group.wasted_bytes for group in groups)}
+
+def load_plan(path: str) -> Dict:
+    with open(path, 'r') as f:
+        plan = json.load(f)
+    if plan.get('version') != PLAN_VERSION or 'base_folder' not in plan or not isinstance(plan.get('moves'), list):
+        raise ValueError(f"{path} is not a move plan written by this version")
+    return plan
+
+def write_plan(plan: Dict, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(plan, f, indent=2)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Suggest genres for uncategorized movies and move them into genre folders")
+    parser.add_argument('folder', nargs='?',
+                        help="movie folder to organize (default: the first one in the config)")
+    parser.add_argument('--dry-run', action='store_true', help="write the move plan without moving anything")
+    parser.add_argument('--plan', metavar='FILE', help="where --dry-run writes the plan (default: stdout)")
+    parser.add_argument('--apply-plan', metavar='FILE', help="move the files of a plan written by --dry-run")
+    parser.add_argument('--find-duplicates', action='store_true',
+                        help="list files with identical content across every configured movie folder")
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_MOVE_WORKERS,
+                        help="concurrent suggestion batches and moves (default: %(default)s)")
+    parser.add_argument('--min-confidence', choices=CONFIDENCE_LEVELS, default='high',
+                        help="lowest suggestion confidence that gets moved (default: %(default)s)")
+    parser.add_argument('--rate-per-minute', type=float,
+                        help="make at most this many paid API calls a minute "
+                             "(default: MOVIE_ORGANIZER_LLM_REQUESTS_PER_MINUTE or 60)")
+    parser.add_argument('--budget', type=float, metavar='DOLLARS',
+                        help="stop asking paid APIs once this much is spent (default: no limit)")
+    parser.add_argument('--full-rescan', action='store_true', help="re-list every directory, not only changed ones")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per line instead of text")
+    parser.add_argument('--config', default=CONFIG_FILE, help="path to config.json (default: %(default)s)")
+    parser.add_argument('--verbose', '-v', action='count', default=0, help="log progress to stderr (-vv for debug)")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.apply_plan and (args.dry_run or args.plan):
+        parser.error("--apply-plan cannot be combined with --dry-run or --plan")
+    if args.find_duplicates and (args.apply_plan or args.dry_run or args.folder):
+        parser.error("--find-duplicates checks every configured folder and moves nothing")
+    if args.plan and not args.dry_run:
+        parser.error("--plan is only used with --dry-run")
+    return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)],
+                        format='%(levelname)-8s %(message)s', stream=sys.stderr)
+    # Keep stdout for the plan and results when the plan goes there
+    reporter = Reporter(args.json, sys.stderr if args.dry_run and not args.plan else sys.stdout)
+    config_store = ConfigStore(args.config)
+    index = LibraryIndex(LIBRARY_INDEX_FILE)
+
+    if args.find_duplicates:
+        folders = config_store.get().get('movie_folders', [])
+        summary = find_duplicates(folders, index, reporter, args.jobs, args.full_rescan)
+        reporter.emit('summary', f"Found {summary['groups']} sets of duplicates wasting "
+                      f"{summary['wasted_bytes'] / 1e9:.2f} GB", **summary)
+        return 0
+
+    if args.apply_plan:
+        plan = load_plan(args.apply_plan)
+    else:
+        folders = config_store.get().get('movie_folders', [])
+        folder = args.folder or (folders[0] if folders else None)
+        if not folder:
+            logger.error("No folder given and no movie folders configured")
+            return 2
+        settings = SuggesterSettings.from_env()
+        if args.rate_per_minute is not None:
+            settings.api_requests_per_minute = args.rate_per_minute
+        chain = build_genre_suggester(settings)
+        suggester = chain.suggester
+        if not suggester:
+            logger.error("No genre suggester configured. Check if OpenAI API token is set.")
+            return 2
+        try:
+            plan = build_plan(folder, config_store, index, suggester, reporter, args.jobs, args.min_confidence,
+                              args.full_rescan, SuggestionBudget(args.budget), chain.local_model)
+        finally:
+            suggester.cleanup()
+        spend = plan['spend']
+        if spend['tiers']:
+            reporter.emit('spend', f"Spent ${spend['spent']:.4f} on paid APIs; answered by " + ', '.join(
+                f"{tier} {stats['answered']}/{stats['titles']}" for tier, stats in spend['tiers'].items()), **spend)
+
+    if args.dry_run:
+        if args.plan:
+            write_plan(plan, args.plan)
+        else:
+            json.dump(plan, sys.stdout, indent=2)
+            sys.stdout.write('\n')
+        reporter.emit('summary', f"Planned {len(plan['moves'])} moves, skipped {len(plan['skipped'])}",
+                      planned=len(plan['moves']), skipped=len(plan['skipped']), plan=args.plan)
+        return 0
+
+    journal = MoveJournal(MOVE_JOURNAL_FILE)
+    # Finish whatever an interrupted run (web or CLI) left half done before starting a new batch
+    journal.recover(move_file)
+    summary = apply_plan(plan, index, journal, reporter, args.jobs)
+    reporter.emit('summary', f"Moved {summary['moved']} of {summary['total']} movies ({summary['failed']} failed)"
+                  + (f" in batch {summary['batch_id']}" if summary['batch_id'] else ''),
+                  skipped=len(plan.get('skipped', [])), **summary)
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,120 @@
+import copy
 import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 CONFIG_FILE = 'config.json'
+# The library index, move journal and fingerprint cache live next to the config, shared by app.py and cli.py
+LIBRARY_INDEX_FILE = 'library_index.db'
+MOVE_JOURNAL_FILE = 'move_journal.db'
+FINGERPRINT_CACHE_FILE = 'fingerprints.db'
+DEFAULT_CONFIG = {'movie_folders': [], 'genres': []}
+
+class ConfigStore:
+    """config.json parsed once and kept in memory until the file changes.
+
+    Every read costs one stat() to notice edits made outside the app.
+    Writers are serialized by a lock and replace the file atomically
+    (temp file + rename), so readers never see a half-written config.
+    Treat the dict returned by get() as read-only; change it via update().
+    """
+
+    def __init__(self, path: str = CONFIG_FILE, defaults: Optional[Dict] = None):
+        self.path = path
+        self.defaults = defaults if defaults is not None else DEFAULT_CONFIG
+        self._lock = threading.RLock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._config: Dict = copy.deepcopy(self.defaults)
+        self._genre_set: FrozenSet[str] = frozenset()
+        self._genre_lookup: Dict[str, str] = {}
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _set(self, config: Dict, signature: Optional[Tuple[int, int, int]]) -> None:
+        genres = config.get('genres', [])
+        self._config = config
+        self._signature = signature
+        self._genre_set = frozenset(genres)
+        self._genre_lookup = {genre.casefold(): genre for genre in genres}
+
+    def _refresh(self) -> None:
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        if signature is None:
+            self._set(copy.deepcopy(self.defaults), None)
+            return
+        with open(self.path, 'r') as f:
+            config = json.load(f)
+        logger.debug(f"Reloaded {self.path}")
+        self._set(config, signature)
+
+    def get(self) -> Dict:
+        """The current configuration, re-read only if the file changed"""
+        with self._lock:
+            self._refresh()
+            return self._config
+
+    def save(self, config: Dict) -> None:
+        """Replace the configuration on disk atomically"""
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix='.config-', suffix='.json', dir=directory)
+            try:
+                # mkstemp makes the file 0600; keep the permissions config.json had
+                os.chmod(tmp_path, self._file_mode())
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(config, f, indent=4, sort_keys=True)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._set(config, self._file_signature())
+
+    def _file_mode(self) -> int:
+        """Permission bits of the current config file, or 0644 less the umask for a new one"""
+        try:
+            return stat.S_IMODE(os.stat(self.path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o644 & ~umask
+
+    def update(self, mutate: Callable[[Dict], None]) -> Dict:
+        """Apply mutate to a copy of the latest config and save it, as one locked step"""
+        with self._lock:
+            config = copy.deepcopy(self.get())
+            mutate(config)
+            self.save(config)
+            return config
+
+    @property
+    def genres(self) -> List[str]:
+        return self.get().get('genres', [])
+
+    @property
+    def genre_set(self) -> FrozenSet[str]:
+        """Configured genres as a frozenset for membership checks"""
+        with self._lock:
+            self._refresh()
+            return self._genre_set
 
-# Load configuration
-if os.path.exists(CONFIG_FILE):
-    with open(CONFIG_FILE, 'r') as f:
-        config = json.load(f)
-else:
-    config = {'movie_folders': [], 'genres': []}
+    def canonical_genre(self, name: str) -> Optional[str]:
+        """The configured spelling of a genre, matched case-insensitively"""
+        with self._lock:
+            self._refresh()
+            return self._genre_lookup.get(name.casefold())
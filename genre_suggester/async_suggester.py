@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+import aiohttp
+from .base_suggester import AsyncGenreSuggesterInterface, GenreSuggesterInterface, GenreSuggestion
+from .http_utils import RETRY_STATUS_CODES, TokenBucket, backoff_delay, parse_retry_after
+from metrics import SUGGESTER_CALL_SECONDS, SUGGESTER_ERRORS
+from .openai_suggester import (DEFAULT_MODEL, MAX_COMPLETION_TOKENS, RESPONSE_FORMAT, build_messages,
+                               parse_response, make_suggestion, record_token_usage)
+from .local_catalog_suggester import CONFIDENCE_RANK, NO_YEAR, split_title_year
+from .tmdb_suggester import suggestion_from_details
+
+logger = logging.getLogger(__name__)
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
+DEFAULT_MAX_CONCURRENCY = 100
+
+def error_suggestion(message: str) -> GenreSuggestion:
+    return GenreSuggestion(genre=None, confidence="Low", status="error", message=message)
+
+async def get_json_with_retries(session: aiohttp.ClientSession, url: str, params: Dict[str, str],
+                                rate_limiter: Optional[TokenBucket] = None, max_retries: int = 4,
+                                backoff_base: float = 0.5, backoff_max: float = 30.0):
+    """GET a JSON body with the retry rules of http_utils.request_with_retries.
+
+    429/5xx responses and connection errors are retried with exponential
+    backoff; a Retry-After header takes precedence and pauses the shared
+    rate limiter, which is waited on without blocking the event loop.
+    """
+    attempt = 0
+    while True:
+        if rate_limiter:
+            await rate_limiter.acquire_async()
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status not in RETRY_STATUS_CODES or attempt >= max_retries:
+                    response.raise_for_status()
+                    return await response.json()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                reason = f"returned {response.status}"
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt >= max_retries:
+                raise
+            retry_after, reason = None, f"failed ({e or type(e).__name__})"
+
+        if retry_after is not None:
+            delay = min(retry_after, backoff_max)
+            if rate_limiter:
+                rate_limiter.pause(delay)
+        else:
+            delay = backoff_delay(attempt, backoff_base, backoff_max)
+        logger.warning(f"GET {url} {reason}; retrying in {delay:.1f}s")
+        attempt += 1
+        await asyncio.sleep(delay)
+
+class AsyncOpenAIGenreSuggester(AsyncGenreSuggesterInterface):
+    """Genre suggester that calls the OpenAI chat completions API with aiohttp"""
+
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL,
+                 base_url: str = OPENAI_BASE_URL, timeout: float = 90):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def initialize(self) -> None:
+        """Open the HTTP session"""
+        if not self.api_key:
+            raise ValueError("No OpenAI API key provided")
+        self.session = aiohttp.ClientSession(
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+
+    async def cleanup(self) -> None:
+        """Close the HTTP session"""
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """Get genre suggestion using OpenAI"""
+        if not self.session:
+            raise ValueError("Client not initialized. Call initialize() first")
+
+        try:
+            with SUGGESTER_CALL_SECONDS.time(backend='openai', call='single'):
+                async with self.session.post(f"{self.base_url}/chat/completions", json={
+                    "model": self.model,
+                    "messages": build_messages(title, valid_genres),
+                    "temperature": 0.3,
+                    "max_tokens": MAX_COMPLETION_TOKENS,
+                    "response_format": RESPONSE_FORMAT
+                }) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+            usage = data.get("usage") or {}
+            record_token_usage(self.model, 'single', 1, usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                               (usage.get("prompt_tokens_details") or {}).get("cached_tokens"))
+
+            response_text = data["choices"][0]["message"]["content"].strip()
+            logger.debug(f"OpenAI response: {response_text}")
+            clean_title, year, genre, confidence = parse_response(response_text)
+            return make_suggestion(clean_title, year, genre, confidence, valid_genres)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            SUGGESTER_ERRORS.inc(backend='openai')
+            logger.error(f"Error in async OpenAI API call: {e}")
+            return error_suggestion(str(e))
+
+class AsyncTMDBGenreSuggester(AsyncGenreSuggesterInterface):
+    """Genre suggester that calls the TMDB API with aiohttp"""
+
+    def __init__(self, api_key: str, base_url: str = TMDB_BASE_URL, timeout: float = 10,
+                 max_retries: int = 4, requests_per_second: float = 20,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        # Shared by every lookup in flight so bulk lookups stay under TMDB's limit
+        self.rate_limiter = rate_limiter or TokenBucket(requests_per_second)
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    async def initialize(self) -> None:
+        """Open the HTTP session"""
+        if not self.api_key:
+            raise ValueError("No TMDB API key provided")
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def cleanup(self) -> None:
+        """Close the HTTP session"""
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    async def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """Get genre suggestion using TMDB API"""
+        if not self.session:
+            raise ValueError("Client not initialized. Call initialize() first")
+
+        # clean_movie_title appends the year as " (2002)"; TMDB searches better with it as a separate filter
+        name, year = split_title_year(title)
+        params = {"api_key": self.api_key, "query": name, "include_adult": "false"}
+        if year != NO_YEAR:
+            params["year"] = str(year)
+
+        try:
+            with SUGGESTER_CALL_SECONDS.time(backend='tmdb', call='search'):
+                results = (await get_json_with_retries(
+                    self.session, f"{self.base_url}/search/movie", params,
+                    self.rate_limiter, self.max_retries)).get("results", [])
+
+            if not results:
+                return GenreSuggestion(
+                    genre=None,
+                    confidence="Low",
+                    status="undetermined",
+                    message=f"No movies found matching '{title}'"
+                )
+
+            movie = results[0]
+            with SUGGESTER_CALL_SECONDS.time(backend='tmdb', call='movie'):
+                movie_details = await get_json_with_retries(
+                    self.session, f"{self.base_url}/movie/{movie['id']}", {"api_key": self.api_key},
+                    self.rate_limiter, self.max_retries)
+
+            return suggestion_from_details(title, movie, movie_details, valid_genres)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            SUGGESTER_ERRORS.inc(backend='tmdb')
+            logger.error(f"Async TMDB API error: {e}")
+            return error_suggestion(str(e))
+
+def is_confident(suggestion: GenreSuggestion, valid_genres: List[str]) -> bool:
+    """A high-confidence answer naming one of our genres; good enough to stop waiting for others"""
+    return (suggestion.status == "success" and suggestion.confidence == "High"
+            and suggestion.genre is not None
+            and suggestion.genre.lower() in (g.lower() for g in valid_genres))
+
+def merge_suggestions(suggestions: Sequence[GenreSuggestion], valid_genres: List[str]) -> GenreSuggestion:
+    """Combine the answers of several backends, listed in backend priority order"""
+    successes = [s for s in suggestions if s.status == "success" and s.genre]
+    if not successes:
+        undetermined = [s for s in suggestions if s.status == "undetermined"]
+        return (undetermined or list(suggestions) or [error_suggestion("No suggester configured")])[0]
+
+    # Backends agreeing on a genre is the strongest signal we have
+    by_genre = {}
+    for suggestion in successes:
+        by_genre.setdefault(suggestion.genre.lower(), []).append(suggestion)
+    for agreeing in by_genre.values():
+        if len(agreeing) > 1:
+            messages = [s.message for s in agreeing if s.message]
+            return GenreSuggestion(genre=agreeing[0].genre, confidence="High", status="success",
+                                   message='; '.join(messages) or None)
+
+    known = {g.lower() for g in valid_genres}
+    return max(successes, key=lambda s: (s.genre.lower() in known, CONFIDENCE_RANK.get(s.confidence, 0)))
+
+class ConcurrentGenreSuggester(AsyncGenreSuggesterInterface):
+    """Asks several async backends at once and returns the first confident answer.
+
+    If no backend is confident, waits for all of them and merges their
+    answers. A semaphore caps how many titles are looked up at the same time.
+    """
+
+    def __init__(self, backends: List[AsyncGenreSuggesterInterface],
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.backends = backends
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def initialize(self) -> None:
+        """Initialize every backend"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        for backend in self.backends:
+            await backend.initialize()
+
+    async def cleanup(self) -> None:
+        """Clean up every backend"""
+        for backend in self.backends:
+            await backend.cleanup()
+
+    async def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """Query all backends concurrently for one title"""
+        async with self._semaphore:
+            tasks = [asyncio.ensure_future(backend.suggest_genre(title, valid_genres))
+                     for backend in self.backends]
+            try:
+                pending = set(tasks)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None and is_confident(task.result(), valid_genres):
+                            return task.result()
+
+                return merge_suggestions([
+                    task.result() if task.exception() is None else error_suggestion(str(task.exception()))
+                    for task in tasks
+                ], valid_genres)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def suggest_genres(self, titles: List[str], valid_genres: List[str]) -> List[GenreSuggestion]:
+        """Look up many titles at once, bounded by the concurrency semaphore"""
+        return list(await asyncio.gather(*(self.suggest_genre(title, valid_genres) for title in titles)))
+
+class AsyncSuggesterBridge(GenreSuggesterInterface):
+    """Exposes an async suggester through the blocking GenreSuggesterInterface.
+
+    The async suggester runs on its own event loop in a background thread,
+    so Flask handlers and worker threads can share its HTTP sessions.
+    """
+
+    def __init__(self, suggester: AsyncGenreSuggesterInterface, timeout: float = 120):
+        self.suggester = suggester
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self, coroutine, timeout: Optional[float] = None):
+        if not self._loop:
+            raise ValueError("Client not initialized. Call initialize() first")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def initialize(self) -> None:
+        """Start the event loop thread and initialize the async suggester on it"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='async-suggester', daemon=True)
+        self._thread.start()
+        self._run(self.suggester.initialize(), self.timeout)
+
+    def cleanup(self) -> None:
+        """Clean up the async suggester and stop the event loop"""
+        if not self._loop:
+            return
+        try:
+            self._run(self.suggester.cleanup(), self.timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(self.timeout)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+
+    def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """Get a genre suggestion, blocking until the async suggester answers"""
+        return self._run(self.suggester.suggest_genre(title, valid_genres), self.timeout)
+
+    def suggest_genres(self, titles: List[str], valid_genres: List[str]) -> List[GenreSuggestion]:
+        """Get suggestions for many titles with all lookups in flight together"""
+        if hasattr(self.suggester, 'suggest_genres'):
+            coroutine = self.suggester.suggest_genres(titles, valid_genres)
+        else:
+            async def gather():
+                return list(await asyncio.gather(
+                    *(self.suggester.suggest_genre(title, valid_genres) for title in titles)))
+            coroutine = gather()
+        return self._run(coroutine)
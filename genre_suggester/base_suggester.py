@@ -31,6 +31,22 @@ class GenreSuggesterInterface(ABC):
         """
         pass
     
+    def suggest_genres(self, titles: List[str], valid_genres: List[str]) -> List[GenreSuggestion]:
+        """
+        Suggest genres for several movie titles.
+
+        Implementations that can classify many titles in one request should
+        override this; the default asks for each title in turn.
+
+        Args:
+            titles: The movie titles to get genres for
+            valid_genres: List of valid genres to choose from
+
+        Returns:
+            One GenreSuggestion per title, in the same order
+        """
+        return [self.suggest_genre(title, valid_genres) for title in titles]
+
     @abstractmethod
     def initialize(self) -> None:
         """Initialize any necessary resources or connections"""
@@ -40,3 +56,30 @@ class GenreSuggesterInterface(ABC):
     def cleanup(self) -> None:
         """Clean up any resources or connections"""
         pass
+
+class AsyncGenreSuggesterInterface(ABC):
+    """Abstract base class for asyncio genre suggestion implementations"""
+
+    @abstractmethod
+    async def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """
+        Suggest a genre for the given movie title.
+
+        Args:
+            title: The movie title to get a genre for
+            valid_genres: List of valid genres to choose from
+
+        Returns:
+            GenreSuggestion object containing the suggested genre and metadata
+        """
+        pass
+
+    @abstractmethod
+    async def initialize(self) -> None:
+        """Initialize any necessary resources or connections"""
+        pass
+
+    @abstractmethod
+    async def cleanup(self) -> None:
+        """Clean up any resources or connections"""
+        pass
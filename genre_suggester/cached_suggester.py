@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from metrics import SUGGESTION_CACHE_LOOKUPS
+from .base_suggester import GenreSuggestion
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 50000
+
+def normalize_title(title: str) -> str:
+    """Normalize a cleaned movie title so trivial differences share a cache entry"""
+    return ' '.join(title.casefold().split())
+
+def genres_fingerprint(valid_genres: List[str]) -> str:
+    """Hash the configured genre list; a different list gives different suggestions"""
+    joined = '\n'.join(sorted(g.casefold() for g in valid_genres))
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()[:16]
+
+class SuggestionCache:
+    """SQLite-backed cache of genre suggestions with TTL and LRU eviction"""
+
+    def __init__(self, db_path: str, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS suggestions (
+                title_key TEXT NOT NULL,
+                genres_key TEXT NOT NULL,
+                suggestion TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (title_key, genres_key)
+            )""")
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_suggestions_access ON suggestions(last_access)')
+        self._conn.commit()
+
+    def get(self, title: str, valid_genres: List[str]) -> Optional[GenreSuggestion]:
+        """Return the cached suggestion, or None if missing or expired"""
+        key = (normalize_title(title), genres_fingerprint(valid_genres))
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT suggestion, created_at FROM suggestions WHERE title_key = ? AND genres_key = ?',
+                key).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute(
+                        'DELETE FROM suggestions WHERE title_key = ? AND genres_key = ?', key)
+                    self._conn.commit()
+                self.misses += 1
+                SUGGESTION_CACHE_LOOKUPS.inc(result='miss')
+                return None
+
+            self._conn.execute(
+                'UPDATE suggestions SET last_access = ? WHERE title_key = ? AND genres_key = ?',
+                (now,) + key)
+            self._conn.commit()
+            self.hits += 1
+        SUGGESTION_CACHE_LOOKUPS.inc(result='hit')
+        return GenreSuggestion(**json.loads(row[0]))
+
+    def put(self, title: str, valid_genres: List[str], suggestion: GenreSuggestion) -> None:
+        """Store a suggestion, evicting the least recently used entries over the size cap"""
+        key = (normalize_title(title), genres_fingerprint(valid_genres))
+        now = time.time()
+        payload = json.dumps(suggestion.__dict__)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO suggestions (title_key, genres_key, suggestion, created_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?)', key + (payload, now, now))
+            count = self._conn.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM suggestions WHERE rowid IN '
+                    '(SELECT rowid FROM suggestions ORDER BY last_access LIMIT ?)',
+                    (count - self.max_entries,))
+            self._conn.commit()
+
+    def invalidate(self, title: Optional[str] = None) -> int:
+        """Remove cached suggestions for one title, or everything. Returns rows removed."""
+        with self._lock:
+            if title:
+                cursor = self._conn.execute(
+                    'DELETE FROM suggestions WHERE title_key = ?', (normalize_title(title),))
+            else:
+                cursor = self._conn.execute('DELETE FROM suggestions')
+            self._conn.commit()
+            return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """Remove entries older than the TTL. Returns rows removed."""
+        with self._lock:
+            cursor = self._conn.execute(
+                'DELETE FROM suggestions WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM suggestions').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
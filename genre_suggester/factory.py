@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional
+from .cached_suggester import SuggestionCache
+from .local_catalog_suggester import CONFIDENCE_RANK
+from .local_model_suggester import LocalModelGenreSuggester
+from .pipeline_suggester import PipelineGenreSuggester, PipelineTier
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_CACHE_FILE = 'suggestion_cache.db'
+LOCAL_MODEL_FILE = 'genre_model.json'
+
+@dataclass
+class SuggesterSettings:
+    """Which genre suggesters to use and how, normally read from MOVIE_ORGANIZER_* variables"""
+    openai_api_token: Optional[str] = None
+    # None uses the suggesters' default model
+    openai_model: Optional[str] = None
+    tmdb_api_key: Optional[str] = None
+    tmdb_requests_per_second: float = 20
+    cache_file: str = SUGGESTION_CACHE_FILE
+    cache_ttl: int = 30 * 24 * 60 * 60
+    cache_max_entries: int = 50000
+    local_catalog_file: Optional[str] = None
+    local_model_file: Optional[str] = LOCAL_MODEL_FILE
+    use_async: bool = False
+    async_concurrency: int = 100
+    # Answers below this confidence are passed on to the next, more expensive suggester
+    min_confidence: str = 'Medium'
+    openai_cost_per_title: float = 0.002
+    api_requests_per_minute: float = 60
+
+    @classmethod
+    def from_env(cls) -> 'SuggesterSettings':
+        return cls(
+            openai_api_token=os.getenv('MOVIE_ORGANIZER_OPENAI_API_TOKEN'),
+            openai_model=os.getenv('MOVIE_ORGANIZER_OPENAI_MODEL'),
+            tmdb_api_key=os.getenv('MOVIE_ORGANIZER_TMDB_API_KEY'),
+            tmdb_requests_per_second=float(os.getenv('MOVIE_ORGANIZER_TMDB_REQUESTS_PER_SECOND', 20)),
+            cache_ttl=int(os.getenv('MOVIE_ORGANIZER_SUGGESTION_CACHE_TTL', 30 * 24 * 60 * 60)),
+            cache_max_entries=int(os.getenv('MOVIE_ORGANIZER_SUGGESTION_CACHE_SIZE', 50000)),
+            local_catalog_file=os.getenv('MOVIE_ORGANIZER_LOCAL_CATALOG'),
+            local_model_file=_local_model_file(os.getenv('MOVIE_ORGANIZER_LOCAL_MODEL', LOCAL_MODEL_FILE)),
+            use_async=os.getenv('MOVIE_ORGANIZER_ASYNC_SUGGESTERS', '').lower() in ('1', 'true', 'yes'),
+            async_concurrency=int(os.getenv('MOVIE_ORGANIZER_ASYNC_CONCURRENCY', 100)),
+            min_confidence=_min_confidence(os.getenv('MOVIE_ORGANIZER_MIN_CONFIDENCE', 'Medium')),
+            openai_cost_per_title=float(os.getenv('MOVIE_ORGANIZER_OPENAI_COST_PER_TITLE', 0.002)),
+            api_requests_per_minute=float(os.getenv('MOVIE_ORGANIZER_LLM_REQUESTS_PER_MINUTE', 60))
+        )
+
+def _min_confidence(value: str) -> str:
+    confidence = value.strip().capitalize()
+    if confidence not in CONFIDENCE_RANK:
+        raise ValueError(f"MOVIE_ORGANIZER_MIN_CONFIDENCE must be one of {', '.join(CONFIDENCE_RANK)}, "
+                         f"not {value!r}")
+    return confidence
+
+def _local_model_file(value: str) -> Optional[str]:
+    return None if value.lower() in ('', '0', 'off', 'false', 'no') else value
+
+class SuggesterChain(NamedTuple):
+    """The suggester to ask, plus the parts of it that callers look after themselves"""
+    suggester: Optional[PipelineGenreSuggester]
+    cache: Optional[SuggestionCache]
+    local_model: Optional[LocalModelGenreSuggester]
+
+def _build_api_tiers(settings: SuggesterSettings) -> List[PipelineTier]:
+    # The API clients (openai, requests, aiohttp) are imported only when a key asks for them
+    if not settings.openai_api_token and not settings.tmdb_api_key:
+        logger.error("OpenAI API token not configured")
+        return []
+    from .http_utils import TokenBucket
+    # Paid calls are spaced out across every job and request sharing this pipeline
+    api_throttle = TokenBucket(settings.api_requests_per_minute / 60, capacity=1).acquire \
+        if settings.api_requests_per_minute > 0 else None
+
+    if settings.openai_api_token and settings.use_async:
+        from .async_suggester import (AsyncOpenAIGenreSuggester, AsyncTMDBGenreSuggester,
+                                      ConcurrentGenreSuggester, AsyncSuggesterBridge)
+        from .openai_suggester import DEFAULT_MODEL
+        logger.info("Using concurrent async OpenAI + TMDB genre suggestions")
+        async_backends = [AsyncOpenAIGenreSuggester(settings.openai_api_token,
+                                                    model=settings.openai_model or DEFAULT_MODEL)]
+        if settings.tmdb_api_key:
+            async_backends.append(AsyncTMDBGenreSuggester(
+                settings.tmdb_api_key, requests_per_second=settings.tmdb_requests_per_second))
+        bridge = AsyncSuggesterBridge(
+            ConcurrentGenreSuggester(async_backends, max_concurrency=settings.async_concurrency))
+        return [PipelineTier('openai', bridge, settings.openai_cost_per_title, api_throttle, remote=True)]
+
+    tiers = []
+    if settings.tmdb_api_key:
+        from .tmdb_suggester import TMDBGenreSuggester
+        # Free and rate limited by its own token bucket; asked before paying for OpenAI
+        tiers.append(PipelineTier('tmdb', TMDBGenreSuggester(
+            settings.tmdb_api_key, requests_per_second=settings.tmdb_requests_per_second), remote=True))
+    if settings.openai_api_token:
+        from .openai_suggester import DEFAULT_MODEL, OpenAIGenreSuggester
+        model = settings.openai_model or DEFAULT_MODEL
+        logger.info(f"Using OpenAI {model} for genre suggestions")
+        tiers.append(PipelineTier('openai', OpenAIGenreSuggester(settings.openai_api_token, model=model),
+                                  settings.openai_cost_per_title, api_throttle, remote=True))
+    else:
+        logger.warning("OpenAI API token not configured; titles TMDB cannot answer stay undetermined")
+    return tiers
+
+def build_genre_suggester(settings: SuggesterSettings) -> SuggesterChain:
+    """The configured suggester pipeline, initialized; any part of it may be None"""
+    tiers = []
+    if settings.local_catalog_file:
+        from .local_catalog_suggester import LocalCatalogGenreSuggester
+        # Well-known titles are answered offline before any paid API is asked
+        logger.info(f"Using local catalog {settings.local_catalog_file} for genre suggestions")
+        tiers.append(PipelineTier('local_catalog', LocalCatalogGenreSuggester(settings.local_catalog_file)))
+
+    local_model = None
+    if settings.local_model_file:
+        # Titles like the ones already sorted are answered by a model trained on the library
+        local_model = LocalModelGenreSuggester(settings.local_model_file)
+        tiers.append(PipelineTier('local_model', local_model))
+
+    api_tiers = _build_api_tiers(settings)
+    suggestion_cache = None
+    if api_tiers:
+        # Answer repeat titles from disk instead of paying for another API call
+        suggestion_cache = SuggestionCache(settings.cache_file, ttl_seconds=settings.cache_ttl,
+                                           max_entries=settings.cache_max_entries)
+    tiers.extend(api_tiers)
+    if not tiers:
+        return SuggesterChain(None, None, None)
+
+    pipeline = PipelineGenreSuggester(tiers, cache=suggestion_cache, min_confidence=settings.min_confidence)
+    try:
+        pipeline.initialize()
+        logger.info("Successfully initialized genre suggester")
+    except Exception as e:
+        logger.error(f"Failed to initialize genre suggester: {e}", exc_info=True)
+        return SuggesterChain(None, None, None)
+    if local_model not in [tier.suggester for tier in pipeline.tiers]:
+        local_model = None
+    return SuggesterChain(pipeline, suggestion_cache, local_model)
+
+class LazyGenreSuggester:
+    """Builds the suggester chain on first use instead of at import time.
+
+    API clients, their imports and the local catalog load only once a
+    suggestion is actually wanted (or warm() is called in the background),
+    so the web app starts quickly and pages that need no suggestions never
+    wait for them.
+    """
+
+    def __init__(self, settings: SuggesterSettings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._built = False
+        self._chain = SuggesterChain(None, None, None)
+
+    def _build(self) -> None:
+        if self._built:
+            return
+        with self._lock:
+            if not self._built:
+                self._chain = build_genre_suggester(self.settings)
+                self._built = True
+
+    def warm(self) -> None:
+        """Build the chain now, e.g. from a background thread right after startup"""
+        self._build()
+
+    @property
+    def suggester(self) -> Optional[PipelineGenreSuggester]:
+        self._build()
+        return self._chain.suggester
+
+    @property
+    def cache(self) -> Optional[SuggestionCache]:
+        self._build()
+        return self._chain.cache
+
+    @property
+    def local_model(self) -> Optional[LocalModelGenreSuggester]:
+        self._build()
+        return self._chain.local_model
+
+    @property
+    def built_cache(self) -> Optional[SuggestionCache]:
+        """The cache if the chain has been built already, without building it"""
+        return self._chain.cache
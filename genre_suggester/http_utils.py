@@ -0,0 +1,130 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class TokenBucket:
+    """Thread-safe token bucket; callers block in acquire() until a token is free"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Take tokens, sleeping until enough have accumulated"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """Take tokens like acquire(), sleeping on the event loop instead of blocking it"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """Take tokens if enough are free and return 0, else seconds until they might be"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so every caller waits, e.g. after the server says to back off.
+
+        Pauses overlap rather than add up: several threads told to wait two
+        seconds at once hold the bucket for two seconds, not for each of them.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def _refill(self) -> None:
+        """Add the tokens accrued since the last update; call with the lock held"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """Session with a keep-alive connection pool sized for concurrent workers"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+def backoff_delay(attempt: int, backoff_base: float, backoff_max: float) -> float:
+    """Exponential backoff with jitter before retry number attempt + 1"""
+    return min(backoff_max, backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+def request_with_retries(session: requests.Session, method: str, url: str,
+                         rate_limiter: Optional[TokenBucket] = None, max_retries: int = 4,
+                         backoff_base: float = 0.5, backoff_max: float = 30.0,
+                         **kwargs) -> requests.Response:
+    """Send a request, retrying 429/5xx responses and connection errors with exponential backoff.
+
+    A Retry-After header takes precedence over the computed backoff and
+    also pauses the shared rate limiter, so other threads back off too.
+    The last response is returned (or the last error raised) once retries
+    are exhausted.
+    """
+    attempt = 0
+    while True:
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, backoff_base, backoff_max)
+            logger.warning(f"{method} {url} failed ({e}); retrying in {delay:.1f}s")
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= max_retries:
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                delay = min(retry_after, backoff_max)
+                if rate_limiter:
+                    rate_limiter.pause(delay)
+            else:
+                delay = backoff_delay(attempt, backoff_base, backoff_max)
+            logger.warning(f"{method} {url} returned {response.status_code}; retrying in {delay:.1f}s")
+            response.close()
+
+        attempt += 1
+        time.sleep(delay)
@@ -0,0 +1,226 @@
+import csv
+import gzip
+import json
+import logging
+import re
+import sys
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+from .base_suggester import GenreSuggesterInterface, GenreSuggestion
+
+logger = logging.getLogger(__name__)
+
+# IMDb title types worth indexing; TV episodes and the like only add noise
+MOVIE_TITLE_TYPES = {'movie', 'tvMovie', 'video'}
+NO_YEAR = 0
+FUZZY_MIN_SIMILARITY = 0.6
+# Trigrams shared by this many titles say little about which one matches
+COMMON_TRIGRAM_LIMIT = 20000
+CONFIDENCE_RANK = {'High': 3, 'Medium': 2, 'Low': 1}
+
+TITLE_YEAR_PATTERN = re.compile(r'^(.*?)\s*\((\d{4})\)$')
+NON_ALNUM_PATTERN = re.compile(r'[^0-9a-z]+')
+
+def normalize_catalog_title(title: str) -> str:
+    """Casefold, strip accents and punctuation so filenames and catalog titles compare equal"""
+    title = unicodedata.normalize('NFKD', title.casefold())
+    title = ''.join(c for c in title if not unicodedata.combining(c))
+    title = title.replace('&', ' and ')
+    return ' '.join(NON_ALNUM_PATTERN.sub(' ', title).split())
+
+def split_title_year(title: str) -> Tuple[str, int]:
+    """Split 'Name (2002)' as produced by clean_movie_title into name and year"""
+    match = TITLE_YEAR_PATTERN.match(title.strip())
+    if match:
+        return match.group(1), int(match.group(2))
+    return title, NO_YEAR
+
+def trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _parse_year(value) -> int:
+    if value is None:
+        return NO_YEAR
+    text = str(value)[:4]
+    return int(text) if text.isdigit() else NO_YEAR
+
+def read_catalog(path: str) -> Iterator[Tuple[str, int, List[str]]]:
+    """Yield (title, year, genres) from an IMDb-style TSV or a JSON-lines dump.
+
+    TSV files need a header with primaryTitle (or title), startYear (or
+    year) and genres columns; IMDb's title.basics.tsv(.gz) works as-is.
+    JSONL records may use title/original_title, year/release_date and a
+    genres list of strings or {"name": ...} objects, as in TMDB exports.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        base_path = path[:-3] if path.endswith('.gz') else path
+        if base_path.endswith(('.jsonl', '.json')):
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                title = record.get('title') or record.get('original_title')
+                year = _parse_year(record.get('year') or record.get('release_date'))
+                genres = record.get('genres') or []
+                if isinstance(genres, str):
+                    genres = genres.split(',')
+                genres = [g['name'] if isinstance(g, dict) else g for g in genres]
+                if title and genres:
+                    yield title, year, [g.strip() for g in genres if g and g.strip()]
+        else:
+            csv.field_size_limit(sys.maxsize)
+            reader = csv.DictReader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+            for row in reader:
+                if row.get('titleType') and row['titleType'] not in MOVIE_TITLE_TYPES:
+                    continue
+                title = row.get('primaryTitle') or row.get('title')
+                genres = row.get('genres') or ''
+                if not title or genres in ('', '\\N'):
+                    continue
+                year = _parse_year(row.get('startYear') or row.get('year'))
+                yield title, year, [g.strip() for g in genres.split(',') if g.strip()]
+
+class CatalogIndex:
+    """Compact in-memory title index with exact and trigram lookups.
+
+    Entries live in parallel arrays; genre lists are interned tuples so the
+    few hundred distinct combinations are shared by millions of titles.
+    """
+
+    def __init__(self):
+        self.titles: List[str] = []
+        self.years = array('H')
+        self.genres: List[Tuple[str, ...]] = []
+        self.exact: Dict[str, List[int]] = {}
+        self.trigram_postings: Dict[str, array] = {}
+        self._genre_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def add(self, title: str, year: int, genres: List[str]) -> None:
+        normalized = normalize_catalog_title(title)
+        if not normalized:
+            return
+        genre_tuple = tuple(genres)
+        genre_tuple = self._genre_tuples.setdefault(genre_tuple, genre_tuple)
+        entry = len(self.titles)
+        self.titles.append(title)
+        self.years.append(year if 0 < year < 65536 else NO_YEAR)
+        self.genres.append(genre_tuple)
+        self.exact.setdefault(normalized, []).append(entry)
+        for gram in trigrams(normalized):
+            postings = self.trigram_postings.get(gram)
+            if postings is None:
+                postings = self.trigram_postings[gram] = array('I')
+            postings.append(entry)
+
+    def _best_by_year(self, entries: List[int], year: int) -> Tuple[int, bool]:
+        """Pick the entry closest to year; returns (entry, year matched within one)"""
+        if not year:
+            return entries[0], False
+        best = min(entries, key=lambda e: abs(self.years[e] - year) if self.years[e] else 9999)
+        return best, bool(self.years[best]) and abs(self.years[best] - year) <= 1
+
+    def lookup(self, title: str, year: int = NO_YEAR) -> Optional[Tuple[int, str]]:
+        """Find the best entry for a title. Returns (entry, confidence) or None."""
+        normalized = normalize_catalog_title(title)
+        if not normalized:
+            return None
+
+        entries = self.exact.get(normalized)
+        if entries:
+            entry, year_matched = self._best_by_year(entries, year)
+            if year_matched or (len(entries) == 1 and not year):
+                return entry, 'High'
+            return entry, 'Medium'
+
+        return self._fuzzy_lookup(normalized, year)
+
+    def _fuzzy_lookup(self, normalized: str, year: int) -> Optional[Tuple[int, str]]:
+        query = trigrams(normalized)
+        postings = [self.trigram_postings[g] for g in query if g in self.trigram_postings]
+        selective = [p for p in postings if len(p) <= COMMON_TRIGRAM_LIMIT]
+        counts = Counter()
+        for p in (selective or postings):
+            counts.update(p)
+        if not counts:
+            return None
+
+        best = None
+        best_score = 0.0
+        for entry, shared in counts.most_common(50):
+            candidate = len(trigrams(normalize_catalog_title(self.titles[entry])))
+            score = shared / (len(query) + candidate - shared)
+            if year and self.years[entry] and abs(self.years[entry] - year) <= 1:
+                score += 0.1
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is None or best_score < FUZZY_MIN_SIMILARITY:
+            return None
+        return best, 'Medium' if best_score >= 0.85 else 'Low'
+
+class LocalCatalogGenreSuggester(GenreSuggesterInterface):
+    """Genre suggester that answers from a local title/year/genres dump, fully offline.
+
+    Meant as the first tier of a pipeline: titles it cannot answer
+    confidently go on to the next tier.
+    """
+
+    def __init__(self, catalog_path: str):
+        self.catalog_path = catalog_path
+        self.index: Optional[CatalogIndex] = None
+
+    def initialize(self) -> None:
+        """Load the catalog into memory"""
+        index = CatalogIndex()
+        for title, year, genres in read_catalog(self.catalog_path):
+            index.add(title, year, genres)
+        self.index = index
+        logger.info(f"Loaded {len(index)} titles from local catalog {self.catalog_path}")
+
+    def cleanup(self) -> None:
+        """Drop the in-memory index"""
+        self.index = None
+
+    def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """Get genre suggestion from the local catalog"""
+        if self.index is None:
+            raise ValueError("Catalog not loaded. Call initialize() first")
+
+        name, year = split_title_year(title)
+        match = self.index.lookup(name, year)
+        if match is None:
+            return GenreSuggestion(
+                genre=None,
+                confidence="Low",
+                status="undetermined",
+                message=f"'{title}' not found in local catalog"
+            )
+
+        entry, confidence = match
+        genres = self.index.genres[entry]
+        found = f"Found '{self.index.titles[entry]}'" + (f" ({self.index.years[entry]})" if self.index.years[entry] else "")
+
+        # Prefer the first catalog genre we already have a folder for
+        valid_by_lower = {g.lower(): g for g in valid_genres}
+        for genre in genres:
+            if genre.lower() in valid_by_lower:
+                return GenreSuggestion(
+                    genre=valid_by_lower[genre.lower()],
+                    confidence=confidence,
+                    status="success",
+                    message=f"{found} in local catalog"
+                )
+
+        return GenreSuggestion(
+            genre=genres[0],
+            confidence=confidence,
+            status="success",
+            message=f"{found} in local catalog"
+        )
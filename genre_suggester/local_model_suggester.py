@@ -0,0 +1,237 @@
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+from .base_suggester import GenreSuggesterInterface, GenreSuggestion
+from .local_catalog_suggester import normalize_catalog_title, split_title_year
+
+logger = logging.getLogger(__name__)
+
+MODEL_VERSION = 1
+# Additive smoothing for feature counts
+ALPHA = 1.0
+CHAR_NGRAM_SIZES = (3, 4)
+# Below this many labeled movies the model keeps quiet and every title goes on to the next tier
+MIN_TRAINING_EXAMPLES = 20
+# Posterior probability of the best genre needed for each confidence level
+HIGH_PROBABILITY = 0.9
+MEDIUM_PROBABILITY = 0.6
+# Titles made mostly of features never seen in training get Low confidence whatever the posterior says
+MIN_KNOWN_FEATURE_SHARE = 0.5
+
+def title_features(title: str) -> List[str]:
+    """Words plus character 3- and 4-grams of the title without its year.
+
+    Words carry the obvious signal ("christmas", "zombie"); character
+    n-grams catch sequels and spelling variants ("Saw II", "Saw 3D").
+    """
+    name, _ = split_title_year(title)
+    normalized = normalize_catalog_title(name)
+    if not normalized:
+        return []
+    features = [f"w:{word}" for word in normalized.split()]
+    padded = f" {normalized} "
+    for size in CHAR_NGRAM_SIZES:
+        features.extend(f"c:{padded[i:i + size]}" for i in range(len(padded) - size + 1))
+    return features
+
+class Prediction(NamedTuple):
+    """The model's answer for one title"""
+    # Posterior probability of each candidate genre, most likely first
+    ranked: List[Tuple[str, float]]
+    # Probability of the top genre from the title's features alone, as if every genre were equally common
+    evidence: float
+    # Share of the title's features that were seen in training
+    known_share: float
+
+class NaiveBayesGenreModel:
+    """Multinomial naive Bayes over title features, trained by adding and removing examples.
+
+    Counts are kept per feature ({feature: {genre: count}}), so scoring a
+    title touches only the genres each of its features was seen with, and
+    untraining a movie that left a genre folder is the same update with a
+    negative weight.
+    """
+
+    def __init__(self):
+        self.feature_genre_counts: Dict[str, Dict[str, int]] = {}
+        self.genre_feature_totals: Dict[str, int] = {}
+        self.genre_examples: Dict[str, int] = {}
+
+    @property
+    def examples(self) -> int:
+        return sum(self.genre_examples.values())
+
+    def update(self, title: str, genre: str, weight: int = 1) -> None:
+        """Add (weight 1) or remove (weight -1) one labeled title"""
+        features = title_features(title)
+        self.genre_examples[genre] = self.genre_examples.get(genre, 0) + weight
+        self.genre_feature_totals[genre] = self.genre_feature_totals.get(genre, 0) + weight * len(features)
+        for feature in features:
+            counts = self.feature_genre_counts.setdefault(feature, {})
+            count = counts.get(genre, 0) + weight
+            if count > 0:
+                counts[genre] = count
+            else:
+                counts.pop(genre, None)
+                if not counts:
+                    del self.feature_genre_counts[feature]
+        if self.genre_examples[genre] <= 0:
+            del self.genre_examples[genre]
+            del self.genre_feature_totals[genre]
+
+    def predict(self, title: str, genres: Iterable[str]) -> Prediction:
+        """Posterior probability of each trained genre among genres, and how much the title itself said"""
+        candidates = [genre for genre in genres if genre in self.genre_examples]
+        if not candidates:
+            return Prediction([], 0.0, 0.0)
+        features = title_features(title)
+        known = [self.feature_genre_counts[f] for f in features if f in self.feature_genre_counts]
+        vocabulary = len(self.feature_genre_counts)
+        total_examples = self.examples
+        log_alpha = math.log(ALPHA)
+
+        likelihoods = {}
+        for genre in candidates:
+            denominator = math.log(self.genre_feature_totals[genre] + ALPHA * max(vocabulary, 1))
+            likelihoods[genre] = len(known) * (log_alpha - denominator)
+        for counts in known:
+            for genre, count in counts.items():
+                if genre in likelihoods:
+                    likelihoods[genre] += math.log(count + ALPHA) - log_alpha
+
+        # The n-grams of a word overlap and are far from independent; weighing the
+        # evidence as one feature per word keeps the probabilities from being overconfident
+        words = sum(1 for feature in features if feature.startswith('w:'))
+        scale = words / len(features) if features else 0.0
+        evidence = {genre: scale * likelihood for genre, likelihood in likelihoods.items()}
+        posterior = _normalize({genre: math.log(self.genre_examples[genre] / total_examples) + score
+                                for genre, score in evidence.items()})
+        ranked = sorted(posterior.items(), key=lambda item: item[1], reverse=True)
+        return Prediction(ranked, _normalize(evidence)[ranked[0][0]], len(known) / len(features) if features else 0.0)
+
+    def to_dict(self) -> Dict:
+        return {'feature_genre_counts': self.feature_genre_counts,
+                'genre_feature_totals': self.genre_feature_totals,
+                'genre_examples': self.genre_examples}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'NaiveBayesGenreModel':
+        model = cls()
+        model.feature_genre_counts = data['feature_genre_counts']
+        model.genre_feature_totals = data['genre_feature_totals']
+        model.genre_examples = data['genre_examples']
+        return model
+
+def _normalize(log_scores: Dict[str, float]) -> Dict[str, float]:
+    """Probabilities from unnormalized log scores"""
+    best = max(log_scores.values())
+    weights = {genre: math.exp(score - best) for genre, score in log_scores.items()}
+    total = sum(weights.values())
+    return {genre: weight / total for genre, weight in weights.items()}
+
+class LocalModelGenreSuggester(GenreSuggesterInterface):
+    """Genre suggester that learns from the movies already sorted into genre folders.
+
+    Every movie in a configured genre folder is a labeled example. sync()
+    brings the model in line with the current library by training only
+    the movies that were added, moved or removed since last time, and
+    saves model and examples to model_path.
+    """
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.model = NaiveBayesGenreModel()
+        # {root: {movie key: [title, genre]}}; what the model was trained on, for incremental syncs
+        self.examples: Dict[str, Dict[str, List[str]]] = {}
+        self._lock = threading.RLock()
+
+    def initialize(self) -> None:
+        """Load the saved model, if any"""
+        try:
+            with open(self.model_path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == MODEL_VERSION:
+                self.model = NaiveBayesGenreModel.from_dict(data['model'])
+                self.examples = data['examples']
+                logger.info(f"Loaded genre model with {self.model.examples} examples from {self.model_path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable genre model {self.model_path}: {e}")
+
+    def cleanup(self) -> None:
+        """Nothing to release; the model is saved after every sync"""
+
+    def sync(self, root: str, labeled: Dict[str, Tuple[str, str]]) -> Dict[str, int]:
+        """Train on the labeled movies ({key: (title, genre)}) now under root, replacing what root had before.
+
+        Only differences from the previous sync are trained, so after a
+        batch of moves this costs time proportional to the batch.
+        """
+        with self._lock:
+            previous = self.examples.get(root, {})
+            added = removed = 0
+            for key, (title, genre) in previous.items():
+                if labeled.get(key) != (title, genre):
+                    self.model.update(title, genre, -1)
+                    removed += 1
+            for key, (title, genre) in labeled.items():
+                if tuple(previous.get(key, ())) != (title, genre):
+                    self.model.update(title, genre, 1)
+                    added += 1
+            if not added and not removed:
+                return {'added': 0, 'removed': 0}
+            self.examples[root] = {key: [title, genre] for key, (title, genre) in labeled.items()}
+            self._save()
+        logger.info(f"Genre model trained on {root}: {added} examples added, {removed} removed")
+        return {'added': added, 'removed': removed}
+
+    def _save(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.model_path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.genre-model-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': MODEL_VERSION, 'model': self.model.to_dict(), 'examples': self.examples}, f)
+            os.replace(tmp_path, self.model_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        """Get genre suggestion from the model trained on the library"""
+        with self._lock:
+            if self.model.examples < MIN_TRAINING_EXAMPLES:
+                prediction = Prediction([], 0.0, 0.0)
+            else:
+                prediction = self.model.predict(title, valid_genres)
+        if not prediction.ranked:
+            return GenreSuggestion(
+                genre=None,
+                confidence="Low",
+                status="undetermined",
+                message="Not enough organized movies to learn from"
+            )
+
+        genre, probability = prediction.ranked[0]
+        # The prior alone must not make an answer confident: in a library that is 70% Drama,
+        # a title the model knows nothing about is still 70% Drama
+        certainty = min(probability, prediction.evidence)
+        if prediction.known_share < MIN_KNOWN_FEATURE_SHARE:
+            confidence = "Low"
+        elif certainty >= HIGH_PROBABILITY:
+            confidence = "High"
+        elif certainty >= MEDIUM_PROBABILITY:
+            confidence = "Medium"
+        else:
+            confidence = "Low"
+        return GenreSuggestion(
+            genre=genre,
+            confidence=confidence,
+            status="success",
+            message=f"Learned from your library ({probability:.0%} {genre})"
+        )
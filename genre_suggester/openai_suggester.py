@@ -1,19 +1,190 @@
+import json
 import logging
 from typing import List, Optional, Dict, Tuple
 from openai import OpenAI
+from metrics import OPENAI_TOKENS, OPENAI_TOKENS_PER_TITLE, SUGGESTER_CALL_SECONDS, SUGGESTER_ERRORS, SUGGESTER_FALLBACKS
 from .base_suggester import GenreSuggesterInterface, GenreSuggestion
-from .tmdb_suggester import TMDBGenreSuggester
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Rough token accounting for splitting batches; ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+BATCH_PROMPT_TOKEN_BUDGET = 6000
+BATCH_COMPLETION_TOKENS_PER_TITLE = 40
+BATCH_MAX_COMPLETION_TOKENS = 4000
+DEFAULT_BATCH_SIZE = 50
+# One answer is a small JSON object; anything longer than this is not an answer
+MAX_COMPLETION_TOKENS = 100
+
+# The instructions and examples never change, so every call starts with the same
+# prompt prefix and OpenAI can serve it from its prompt cache. The genre list and
+# filenames, which do change, come last in the final user message.
+RULES = """IMPORTANT RULES:
+1. ALWAYS prefer one of the existing genres, even if it's broader than the specific sub-genre you have in mind (e.g. "Action" rather than "Superhero", "Horror" rather than "Supernatural Horror")
+2. A movie fitting multiple genres is normal - pick the most relevant existing genre
+3. When uncertain, use a broader existing genre with Low confidence rather than creating a new one
+4. Only suggest a new genre if the movie absolutely cannot fit into any existing genre
+5. Use null for a year that is not in the filename, and for a genre you cannot determine at all"""
+
+SYSTEM_PROMPT = f"""You are a movie expert who can clean up movie filenames and determine genres.
+Each request lists the existing genres and gives one movie filename. Extract the actual title and year, then determine its genre.
+
+Respond with a JSON object: {{"title": "cleaned movie title", "year": "year" or null, "genre": "genre" or null, "confidence": "High", "Medium" or "Low"}}
+
+{RULES}"""
+
+BATCH_SYSTEM_PROMPT = f"""You are a movie expert who can clean up movie filenames and determine genres.
+Each request lists the existing genres and gives a numbered list of movie filenames. For each one, extract the actual title and year, then determine its genre.
+
+Respond with a JSON object containing a "results" array with one entry per filename, in the same order:
+{{"results": [{{"id": 1, "title": "cleaned movie title", "year": "year" or null, "genre": "genre" or null, "confidence": "High", "Medium" or "Low"}}]}}
+
+{RULES}
+6. Return exactly one result per id and nothing else"""
+
+# Few-shot examples, asked against a fixed genre list so they stay part of the cached prefix
+EXAMPLE_GENRES = ['Action', 'Comedy', 'Drama', 'Fantasy', 'Horror', 'Sci-Fi']
+EXAMPLES = [
+    ("Spider.Man.2002.1080p.BluRay.x264",
+     {"title": "Spider-Man", "year": "2002", "genre": "Action", "confidence": "High"}),
+    ("Lord.of.the.Rings.2001.BluRay",
+     {"title": "The Lord of the Rings", "year": "2001", "genre": "Fantasy", "confidence": "High"}),
+    ("The.Conjuring.2013.WEBRip",
+     {"title": "The Conjuring", "year": "2013", "genre": "Horror", "confidence": "High"}),
+    ("Some.Unknown.Movie.2024.WEBRip",
+     {"title": "Some Unknown Movie", "year": "2024", "genre": "Drama", "confidence": "Low"}),
+]
+
+SUGGESTION_PROPERTIES = {
+    "title": {"type": "string"},
+    "year": {"type": ["string", "null"]},
+    "genre": {"type": ["string", "null"]},
+    "confidence": {"type": "string", "enum": ["High", "Medium", "Low"]}
+}
+
+# Strict schemas make the model answer with exactly these fields and nothing else
+RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "genre_suggestion", "strict": True, "schema": {
+    "type": "object",
+    "properties": SUGGESTION_PROPERTIES,
+    "required": list(SUGGESTION_PROPERTIES),
+    "additionalProperties": False
+}}}
+
+BATCH_RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "genre_suggestions", "strict": True, "schema": {
+    "type": "object",
+    "properties": {"results": {"type": "array", "items": {
+        "type": "object",
+        "properties": {"id": {"type": "integer"}, **SUGGESTION_PROPERTIES},
+        "required": ["id", *SUGGESTION_PROPERTIES],
+        "additionalProperties": False
+    }}},
+    "required": ["results"],
+    "additionalProperties": False
+}}}
+
+def _request(genres: List[str], filenames: str) -> str:
+    return f"Existing genres: {', '.join(genres)}\n{filenames}"
+
+def _single_request(title: str, valid_genres: List[str]) -> str:
+    return _request(valid_genres, f'Movie filename: "{title}"')
+
+def _batch_request(titles: List[str], valid_genres: List[str]) -> str:
+    return _request(valid_genres, "Movie filenames:\n" + '\n'.join(f'{i + 1}. "{title}"' for i, title in enumerate(titles)))
+
+PROMPT_PREFIX = [{"role": "system", "content": SYSTEM_PROMPT}]
+for _filename, _answer in EXAMPLES:
+    PROMPT_PREFIX += [{"role": "user", "content": _single_request(_filename, EXAMPLE_GENRES)},
+                      {"role": "assistant", "content": json.dumps(_answer)}]
+
+BATCH_PROMPT_PREFIX = [
+    {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+    {"role": "user", "content": _batch_request([filename for filename, _ in EXAMPLES], EXAMPLE_GENRES)},
+    {"role": "assistant", "content": json.dumps({"results": [
+        {"id": i + 1, **answer} for i, (_, answer) in enumerate(EXAMPLES)]})}
+]
+
+def build_messages(title: str, valid_genres: List[str]) -> List[Dict[str, str]]:
+    """Build the chat messages asking for one filename's title, year and genre"""
+    return PROMPT_PREFIX + [{"role": "user", "content": _single_request(title, valid_genres)}]
+
+def build_batch_messages(titles: List[str], valid_genres: List[str]) -> List[Dict[str, str]]:
+    """Build the chat messages asking for the title, year and genre of each of several filenames"""
+    return BATCH_PROMPT_PREFIX + [{"role": "user", "content": _batch_request(titles, valid_genres)}]
+
+def _field(entry: dict, name: str) -> Optional[str]:
+    value = str(entry.get(name) or '').strip()
+    return value if value and value.upper() != 'N/A' else None
+
+def parse_entry(entry: dict) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
+    """Title, year, genre and confidence of one JSON answer"""
+    return _field(entry, 'title'), _field(entry, 'year'), _field(entry, 'genre'), _field(entry, 'confidence') or "Low"
+
+def parse_response(response_text: str) -> Tuple[Optional[str], Optional[str], Optional[str], str]:
+    """Parse the JSON object of a single-title response"""
+    entry = json.loads(response_text)
+    if not isinstance(entry, dict):
+        raise ValueError(f"Expected a JSON object, got {response_text!r}")
+    return parse_entry(entry)
+
+def make_suggestion(clean_title: Optional[str], year: Optional[str], genre: Optional[str],
+                    confidence: str, valid_genres: List[str]) -> GenreSuggestion:
+    """Turn a parsed answer into a GenreSuggestion, using our casing for known genres"""
+    if not genre or genre.upper() == 'N/A':
+        title_info = f"'{clean_title}" + (f" ({year})" if year else "") + "'"
+        return GenreSuggestion(
+            genre=None,
+            confidence=confidence,
+            status="undetermined",
+            message=f"Unable to determine genre for {title_info}"
+        )
+        
+    # Check if the suggested genre matches any of our valid genres (case-insensitive)
+    for valid_genre in valid_genres:
+        if valid_genre.lower() == genre.lower():
+            return GenreSuggestion(
+                genre=valid_genre,  # Use our casing
+                confidence=confidence,
+                status="success",
+                message=None
+            )
+            
+    # If no match, return the suggested genre as a new genre
+    return GenreSuggestion(
+        genre=genre,
+        confidence=confidence,
+        status="success",
+        message=None
+    )
+
+def record_token_usage(model: str, call: str, titles: int, prompt_tokens: Optional[int],
+                       completion_tokens: Optional[int], cached_tokens: Optional[int] = None) -> None:
+    """Add the token counts an OpenAI response reported to the metrics.
+
+    cached_tokens is the part of prompt_tokens served from OpenAI's prompt
+    cache. Per-title counts go to a histogram so single and batch calls can
+    be compared.
+    """
+    counts = {'prompt': prompt_tokens, 'cached_prompt': cached_tokens, 'completion': completion_tokens}
+    for kind, tokens in counts.items():
+        if tokens:
+            OPENAI_TOKENS.inc(tokens, model=model, type=kind)
+            OPENAI_TOKENS_PER_TITLE.observe(tokens / max(titles, 1), call=call, type=kind)
+    logger.debug(f"OpenAI {call} call for {titles} titles: {prompt_tokens} prompt tokens "
+                 f"({cached_tokens or 0} cached), {completion_tokens} completion tokens")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used to keep batches inside the prompt budget"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
 class OpenAIGenreSuggester(GenreSuggesterInterface):
-    """Genre suggester that uses OpenAI's GPT-4"""
+    """Genre suggester that uses OpenAI's chat models"""
     
-    def __init__(self, api_key: str, tmdb_suggester: Optional[TMDBGenreSuggester] = None, model: str = "gpt-4-1106-preview"):
+    def __init__(self, api_key: str, model: str = DEFAULT_MODEL):
         self.api_key = api_key
         self.model = model
         self.client = None
-        self.tmdb_suggester = tmdb_suggester
         
     def initialize(self) -> None:
         """Initialize OpenAI client"""
@@ -30,128 +201,27 @@ class OpenAIGenreSuggester(GenreSuggesterInterface):
         if not self.client:
             raise ValueError("Client not initialized. Call initialize() first")
             
-        # Create the prompt for both title extraction and genre suggestion
-        genres_list = ', '.join(valid_genres)
-        messages = [
-            {"role": "system", "content": f"""You are a movie expert who can clean up movie filenames and determine genres.
-Given a movie filename, first extract the actual title and year, then determine its genre.
-
-Your primary goal is to categorize movies using these existing genres whenever possible: {genres_list}
-Only suggest a new genre if absolutely none of the existing genres could work.
-
-Format your response EXACTLY like this:
-TITLE: [cleaned movie title]
-YEAR: [year if found, or N/A if not found]
-SELECTED_GENRE: [Use one of the provided genres if suitable, otherwise suggest a new genre]
-CONFIDENCE: [High/Medium/Low]
-
-Here are examples of using broader existing genres:
-
-Input: "Spider.Man.2002.1080p.BluRay.x264"
-TITLE: Spider-Man
-YEAR: 2002
-SELECTED_GENRE: Action
-CONFIDENCE: High
-Explanation: While this could be "Superhero", we use the broader "Action" genre that exists
-
-Input: "Lord.of.the.Rings.2001.BluRay"
-TITLE: The Lord of the Rings
-YEAR: 2001
-SELECTED_GENRE: Fantasy
-CONFIDENCE: High
-Explanation: While this could be "Epic Fantasy", we use the broader "Fantasy" genre that exists
-
-Input: "The.Conjuring.2013.WEBRip"
-TITLE: The Conjuring
-YEAR: 2013
-SELECTED_GENRE: Horror
-CONFIDENCE: High
-Explanation: While this could be "Supernatural Horror", we use the broader "Horror" genre that exists
-
-Input: "Some.Unknown.Movie.2024.WEBRip"
-TITLE: Some Unknown Movie
-YEAR: 2024
-SELECTED_GENRE: Drama
-CONFIDENCE: Low
-Explanation: When uncertain, use a broader existing genre rather than creating a new one
-
-IMPORTANT RULES:
-1. ALWAYS prefer an existing genre, even if it's broader than the specific sub-genre you have in mind
-2. A movie fitting multiple genres is normal - pick the most relevant existing genre
-3. It's better to use a broader existing genre than to create a new specific one
-4. Only suggest a new genre if the movie absolutely cannot fit into any existing genre"""},
-            {"role": "user", "content": f"""Movie filename: "{title}"
-
-Please clean up this movie title and determine its genre from the available genres."""}
-        ]
+        messages = build_messages(title, valid_genres)
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.3,
-                max_tokens=250
-            )
+            with SUGGESTER_CALL_SECONDS.time(backend='openai', call='single'):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=MAX_COMPLETION_TOKENS,
+                    response_format=RESPONSE_FORMAT
+                )
+            self._record_usage(response, 'single', 1)
             
             response_text = response.choices[0].message.content.strip()
             logger.debug(f"OpenAI response: {response_text}")
             
-            # Parse response
-            clean_title = None
-            year = None
-            genre = None
-            confidence = "Low"
-            message = None
-            
-            for line in response_text.split('\n'):
-                if line.startswith('TITLE:'):
-                    clean_title = line.replace('TITLE:', '').strip()
-                elif line.startswith('YEAR:'):
-                    year_str = line.replace('YEAR:', '').strip()
-                    year = year_str if year_str != 'N/A' else None
-                elif line.startswith('SELECTED_GENRE:'):
-                    genre = line.replace('SELECTED_GENRE:', '').strip()
-                elif line.startswith('CONFIDENCE:'):
-                    confidence = line.replace('CONFIDENCE:', '').strip()
-            
-            # If OpenAI couldn't determine genre but gave us a clean title, try TMDB
-            if (not genre or genre.upper() == 'N/A') and self.tmdb_suggester and clean_title:
-                logger.debug(f"Trying TMDB with cleaned title: {clean_title}")
-                tmdb_suggestion = self.tmdb_suggester.suggest_genre(clean_title, valid_genres)
-                if tmdb_suggestion.genre:
-                    # Add the clean title info to TMDB's message
-                    title_info = f"'{clean_title}" + (f" ({year})" if year else "") + "'"
-                    tmdb_suggestion.message = f"Using TMDB data for {title_info}: " + (tmdb_suggestion.message or "")
-                    return tmdb_suggestion
-            
-            if not genre or genre.upper() == 'N/A':
-                title_info = f"'{clean_title}" + (f" ({year})" if year else "") + "'"
-                return GenreSuggestion(
-                    genre=None,
-                    confidence=confidence,
-                    status="undetermined",
-                    message=message or f"Unable to determine genre for {title_info}"
-                )
-                
-            # Check if the suggested genre matches any of our valid genres (case-insensitive)
-            for valid_genre in valid_genres:
-                if valid_genre.lower() == genre.lower():
-                    return GenreSuggestion(
-                        genre=valid_genre,  # Use our casing
-                        confidence=confidence,
-                        status="success",
-                        message=message
-                    )
-                    
-            # If no match, return the suggested genre as a new genre
-            return GenreSuggestion(
-                genre=genre,
-                confidence=confidence,
-                status="success",
-                message=message
-            )
+            clean_title, year, genre, confidence = parse_response(response_text)
+            return make_suggestion(clean_title, year, genre, confidence, valid_genres)
             
         except Exception as e:
+            SUGGESTER_ERRORS.inc(backend='openai')
             logger.error("Error in OpenAI API call", exc_info=True)
             return GenreSuggestion(
                 genre=None,
@@ -159,3 +229,88 @@ Please clean up this movie title and determine its genre from the available genr
                 status="error",
                 message=str(e)
             )
+
+    def suggest_genres(self, titles: List[str], valid_genres: List[str],
+                       batch_size: int = DEFAULT_BATCH_SIZE) -> List[GenreSuggestion]:
+        """Get genre suggestions for many titles, packing several into each OpenAI call.
+
+        Titles are split into batches by count and by estimated prompt tokens.
+        Any title whose entry is missing or unparseable in the batch response
+        is retried on its own with suggest_genre.
+        """
+        if not self.client:
+            raise ValueError("Client not initialized. Call initialize() first")
+
+        suggestions: List[Optional[GenreSuggestion]] = [None] * len(titles)
+        for batch in self._split_batches(titles, valid_genres, batch_size):
+            results = self._classify_batch([titles[i] for i in batch], valid_genres)
+            for position, index in enumerate(batch):
+                if position in results:
+                    suggestions[index] = results[position]
+
+        missing = [i for i, suggestion in enumerate(suggestions) if suggestion is None]
+        if missing:
+            SUGGESTER_FALLBACKS.inc(len(missing), backend='openai_batch', to='openai')
+            logger.info(f"Falling back to single-title calls for {len(missing)} of {len(titles)} titles")
+        for index in missing:
+            suggestions[index] = self.suggest_genre(titles[index], valid_genres)
+        return suggestions
+
+    def _split_batches(self, titles: List[str], valid_genres: List[str], batch_size: int) -> List[List[int]]:
+        """Group title indexes into batches that fit the size and token budgets"""
+        system_tokens = sum(estimate_tokens(message["content"]) for message in build_batch_messages([], valid_genres))
+        max_titles = min(batch_size, BATCH_MAX_COMPLETION_TOKENS // BATCH_COMPLETION_TOKENS_PER_TITLE)
+        batches = []
+        current = []
+        current_tokens = system_tokens
+        for index, title in enumerate(titles):
+            title_tokens = estimate_tokens(title) + 4
+            if current and (len(current) >= max_titles or current_tokens + title_tokens > BATCH_PROMPT_TOKEN_BUDGET):
+                batches.append(current)
+                current = []
+                current_tokens = system_tokens
+            current.append(index)
+            current_tokens += title_tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _classify_batch(self, titles: List[str], valid_genres: List[str]) -> Dict[int, GenreSuggestion]:
+        """Classify one batch in a single call. Returns suggestions keyed by position in the batch."""
+        messages = build_batch_messages(titles, valid_genres)
+
+        try:
+            with SUGGESTER_CALL_SECONDS.time(backend='openai', call='batch'):
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=min(BATCH_MAX_COMPLETION_TOKENS, 50 + BATCH_COMPLETION_TOKENS_PER_TITLE * len(titles)),
+                    response_format=BATCH_RESPONSE_FORMAT
+                )
+            self._record_usage(response, 'batch', len(titles))
+            response_text = response.choices[0].message.content
+            logger.debug(f"OpenAI batch response for {len(titles)} titles: {response_text}")
+            entries = json.loads(response_text).get('results', [])
+        except Exception as e:
+            SUGGESTER_ERRORS.inc(backend='openai')
+            logger.error(f"Error in OpenAI batch call for {len(titles)} titles: {e}", exc_info=True)
+            return {}
+
+        results = {}
+        for entry in entries:
+            try:
+                position = int(entry['id']) - 1
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 0 <= position < len(titles) or position in results:
+                continue
+            results[position] = make_suggestion(*parse_entry(entry), valid_genres)
+        return results
+
+    def _record_usage(self, response, call: str, titles: int) -> None:
+        usage = getattr(response, 'usage', None)
+        if usage:
+            details = getattr(usage, 'prompt_tokens_details', None)
+            record_token_usage(self.model, call, titles, usage.prompt_tokens, usage.completion_tokens,
+                               getattr(details, 'cached_tokens', None))
@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from metrics import PIPELINE_TIER_SECONDS, PIPELINE_TITLES, SUGGESTER_SPEND
+from .base_suggester import GenreSuggesterInterface, GenreSuggestion
+from .cached_suggester import SuggestionCache
+from .local_catalog_suggester import CONFIDENCE_RANK
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PipelineTier:
+    """One backend of a pipeline with what it costs to ask"""
+    name: str
+    suggester: GenreSuggesterInterface
+    # Estimated spend per title sent, in dollars; 0 for local and free backends
+    cost_per_title: float = 0.0
+    # Called before every request to this tier, e.g. a rate limiter's acquire
+    throttle: Optional[Callable[[], None]] = None
+    # Asks a network service; its answers are worth keeping in the suggestion cache
+    remote: bool = False
+
+class SuggestionBudget:
+    """Titles, answers, time and spend per tier for one job, with an optional spending limit.
+
+    Spend is reserved before a tier is asked, so batches running in
+    parallel never overshoot the limit between them.
+    """
+
+    def __init__(self, limit: Optional[float] = None):
+        self.limit = limit
+        self.spent = 0.0
+        self.tiers: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.spent >= self.limit
+
+    def reserve(self, cost_per_title: float, titles: int) -> int:
+        """Charge for as many of titles as the budget allows and return that number"""
+        if cost_per_title <= 0:
+            return titles
+        with self._lock:
+            if self.limit is not None:
+                titles = min(titles, max(int((self.limit - self.spent) / cost_per_title + 1e-9), 0))
+            self.spent += titles * cost_per_title
+        return titles
+
+    def record(self, tier: str, titles: int, answered: int, seconds: float, cost: float = 0.0) -> None:
+        with self._lock:
+            stats = self.tiers.setdefault(tier, {'titles': 0, 'answered': 0, 'seconds': 0.0, 'cost': 0.0})
+            stats['titles'] += titles
+            stats['answered'] += answered
+            stats['seconds'] += seconds
+            stats['cost'] += cost
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'spent': round(self.spent, 6),
+                'exhausted': self.exhausted,
+                'tiers': {name: dict(stats, seconds=round(stats['seconds'], 3), cost=round(stats['cost'], 6))
+                          for name, stats in self.tiers.items()}
+            }
+
+def _rank(suggestion: Optional[GenreSuggestion]) -> int:
+    if suggestion is None or suggestion.status != 'success' or not suggestion.genre:
+        return 0
+    return CONFIDENCE_RANK.get(suggestion.confidence, 0)
+
+def _is_configured(suggestion: Optional[GenreSuggestion], valid_genres: List[str]) -> bool:
+    return bool(_rank(suggestion)) and suggestion.genre.lower() in (genre.lower() for genre in valid_genres)
+
+class PipelineGenreSuggester(GenreSuggesterInterface):
+    """Asks an ordered list of backends, cheapest first, until one is confident enough.
+
+    Answers from the suggestion cache are taken as they are. Every other
+    title goes through the tiers in order; an answer at or above
+    min_confidence naming one of the configured genres ends its trip,
+    anything else (including a confident new genre) moves on to the next
+    tier, and a title no tier is sure of gets the best answer seen.
+    Each tier sees all of a batch's unanswered titles in one call, so
+    local tiers clear most of a large run before the slow, paid ones
+    are asked about the remainder. Paid tiers draw on the caller's
+    SuggestionBudget. Answers from remote tiers are written to the cache
+    when they end a title's trip, or when every tier was asked about the
+    title without an error and none was sure.
+    """
+
+    def __init__(self, tiers: List[PipelineTier], cache: Optional[SuggestionCache] = None,
+                 min_confidence: str = 'Medium'):
+        self.tiers = tiers
+        self.cache = cache
+        self.min_confidence = min_confidence
+
+    def initialize(self) -> None:
+        """Initialize every tier, dropping the ones that fail"""
+        ready = []
+        for tier in self.tiers:
+            try:
+                tier.suggester.initialize()
+                ready.append(tier)
+            except Exception as e:
+                logger.error(f"Failed to initialize {tier.name} suggester, leaving it out: {e}", exc_info=True)
+        if not ready:
+            raise ValueError("No genre suggester could be initialized")
+        self.tiers = ready
+        logger.info(f"Genre suggester pipeline: {' -> '.join(tier.name for tier in self.tiers)}")
+
+    def cleanup(self) -> None:
+        """Clean up every tier and close the cache"""
+        for tier in self.tiers:
+            tier.suggester.cleanup()
+        if self.cache:
+            self.cache.close()
+
+    def suggest_genre(self, title: str, valid_genres: List[str],
+                      budget: Optional[SuggestionBudget] = None) -> GenreSuggestion:
+        """Get a genre suggestion from the cheapest tier that is confident enough"""
+        return self.suggest_genres([title], valid_genres, budget)[0]
+
+    def suggest_genres(self, titles: List[str], valid_genres: List[str],
+                       budget: Optional[SuggestionBudget] = None) -> List[GenreSuggestion]:
+        """Send each tier the titles no earlier tier was sure of, in one call per tier"""
+        budget = budget if budget is not None else SuggestionBudget()
+        results: List[Optional[GenreSuggestion]] = [None] * len(titles)
+        best: List[Optional[GenreSuggestion]] = [None] * len(titles)
+        best_tier: List[Optional[PipelineTier]] = [None] * len(titles)
+        # Titles some tier failed on or was not asked about; their best answer may improve on a retry
+        unsettled = set()
+        pending = list(range(len(titles)))
+
+        if self.cache and pending:
+            start = time.perf_counter()
+            for index in pending:
+                results[index] = self.cache.get(titles[index], valid_genres)
+            pending = [index for index in pending if results[index] is None]
+            self._record(budget, 'cache', len(titles), len(titles) - len(pending), time.perf_counter() - start)
+
+        for tier in self.tiers:
+            if not pending:
+                break
+            sent = pending[:budget.reserve(tier.cost_per_title, len(pending))]
+            if len(sent) < len(pending):
+                over_budget = len(pending) - len(sent)
+                PIPELINE_TITLES.inc(over_budget, tier=tier.name, outcome='over_budget')
+                logger.info(f"Budget exhausted; not asking {tier.name} about {over_budget} titles")
+                unsettled.update(pending[len(sent):])
+                for index in pending[len(sent):]:
+                    best[index] = best[index] or GenreSuggestion(
+                        genre=None,
+                        confidence="Low",
+                        status="undetermined",
+                        message=f"Suggestion budget exhausted before asking {tier.name}"
+                    )
+            if not sent:
+                # Later tiers cost at least as much, so nothing more is affordable
+                break
+
+            start = time.perf_counter()
+            answers = self._ask(tier, [titles[index] for index in sent], valid_genres)
+            elapsed = time.perf_counter() - start
+
+            pending = []
+            for index, answer in zip(sent, answers):
+                if (_rank(answer) >= CONFIDENCE_RANK[self.min_confidence]
+                        and _is_configured(answer, valid_genres)):
+                    results[index] = answer
+                    if tier.remote and self.cache:
+                        self.cache.put(titles[index], valid_genres, answer)
+                else:
+                    if answer.status == 'error':
+                        unsettled.add(index)
+                    # Keep the best answer, configured genres first; among failures the latest says the most
+                    if (not _rank(best[index]) or (_is_configured(answer, valid_genres), _rank(answer))
+                            > (_is_configured(best[index], valid_genres), _rank(best[index]))):
+                        best[index] = answer
+                        best_tier[index] = tier
+                    pending.append(index)
+            self._record(budget, tier.name, len(sent), len(sent) - len(pending), elapsed,
+                         len(sent) * tier.cost_per_title)
+
+        if self.cache:
+            for index in pending:
+                if index not in unsettled and best_tier[index] and best_tier[index].remote and _rank(best[index]):
+                    self.cache.put(titles[index], valid_genres, best[index])
+
+        return [result or best[index] or GenreSuggestion(
+            genre=None,
+            confidence="Low",
+            status="undetermined",
+            message="No genre suggester could answer"
+        ) for index, result in enumerate(results)]
+
+    def _ask(self, tier: PipelineTier, titles: List[str], valid_genres: List[str]) -> List[GenreSuggestion]:
+        if tier.throttle:
+            tier.throttle()
+        try:
+            if len(titles) == 1:
+                return [tier.suggester.suggest_genre(titles[0], valid_genres)]
+            return tier.suggester.suggest_genres(titles, valid_genres)
+        except Exception as e:
+            logger.error(f"Error asking {tier.name} about {len(titles)} titles: {e}", exc_info=True)
+            return [GenreSuggestion(genre=None, confidence="Low", status="error", message=str(e))
+                    for _ in titles]
+
+    def _record(self, budget: SuggestionBudget, tier: str, titles: int, answered: int,
+                seconds: float, cost: float = 0.0) -> None:
+        budget.record(tier, titles, answered, seconds, cost)
+        PIPELINE_TIER_SECONDS.observe(seconds, tier=tier)
+        PIPELINE_TITLES.inc(answered, tier=tier, outcome='answered')
+        PIPELINE_TITLES.inc(titles - answered, tier=tier, outcome='unsure')
+        if cost:
+            SUGGESTER_SPEND.inc(cost, tier=tier)
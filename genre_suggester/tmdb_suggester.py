@@ -1,40 +1,117 @@
 import logging
-from typing import List, Optional
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+from metrics import SUGGESTER_CALL_SECONDS, SUGGESTER_ERRORS
 from .base_suggester import GenreSuggesterInterface, GenreSuggestion
+from .http_utils import TokenBucket, create_session, request_with_retries
+from .local_catalog_suggester import NO_YEAR, split_title_year
 
 logger = logging.getLogger(__name__)
 
+# TMDB names for genres that libraries often file under another name
+TMDB_GENRE_ALIASES = {
+    'science fiction': ['sci-fi', 'scifi'],
+    'music': ['musical'],
+    'history': ['historical'],
+    'family': ['kids'],
+}
+
+def match_genre(name: str, valid_genres: List[str]) -> Optional[str]:
+    """The configured genre a TMDB genre name stands for, in our casing"""
+    valid_by_lower = {g.lower(): g for g in valid_genres}
+    for candidate in [name.lower()] + TMDB_GENRE_ALIASES.get(name.lower(), []):
+        if candidate in valid_by_lower:
+            return valid_by_lower[candidate]
+    return None
+
+def suggestion_from_details(title: str, movie: dict, movie_details: dict, valid_genres: List[str]) -> GenreSuggestion:
+    """Build a suggestion from a TMDB search result and its movie details"""
+    # Get genres as strings
+    movie_genres = [g["name"] for g in movie_details.get("genres", [])]
+    
+    if not movie_genres:
+        return GenreSuggestion(
+            genre=None,
+            confidence="Low",
+            status="undetermined",
+            message=f"No genres found for '{title}'"
+        )
+        
+    confidence = "High" if movie.get("popularity", 0) > 10 else "Medium"
+    found = f"Found '{movie_details.get('title')}' ({movie_details.get('release_date', '')[:4]})"
+    
+    # TMDB lists genres in order of relevance; take the first one we have a folder for
+    for name in movie_genres:
+        genre = match_genre(name, valid_genres)
+        if genre:
+            return GenreSuggestion(
+                genre=genre,
+                confidence=confidence,
+                status="success",
+                message=found
+            )
+            
+    # If no match, suggest the TMDB genre
+    return GenreSuggestion(
+        genre=movie_genres[0],
+        confidence=confidence,
+        status="success",
+        message=found
+    )
+
 class TMDBGenreSuggester(GenreSuggesterInterface):
     """Genre suggester that uses TMDB API"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = "https://api.themoviedb.org/3",
+                 timeout: Union[float, Tuple[float, float]] = (3.05, 10), max_retries: int = 4,
+                 requests_per_second: float = 20, pool_size: int = 10,
+                 rate_limiter: Optional[TokenBucket] = None):
         self.api_key = api_key
-        self.base_url = "https://api.themoviedb.org/3"
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        # Shared by every thread using this suggester so bulk lookups stay under TMDB's limit
+        self.rate_limiter = rate_limiter or TokenBucket(requests_per_second)
+        self.session = None
         
     def initialize(self) -> None:
-        """Verify API key works"""
+        """Verify API key works and open a keep-alive session"""
         if not self.api_key:
             raise ValueError("No TMDB API key provided")
+        self.session = create_session(self.pool_size)
         
     def cleanup(self) -> None:
-        """Nothing to clean up"""
-        pass
+        """Close the session and its pooled connections"""
+        if self.session:
+            self.session.close()
+            self.session = None
+
+    def _get(self, path: str, params: dict) -> dict:
+        """GET a TMDB endpoint with rate limiting and retries, returning the JSON body"""
+        if not self.session:
+            raise ValueError("Client not initialized. Call initialize() first")
+        # Label by endpoint kind; movie ids in the path would make a series per movie
+        with SUGGESTER_CALL_SECONDS.time(backend='tmdb', call=path.strip('/').split('/')[0]):
+            response = request_with_retries(
+                self.session, 'GET', f"{self.base_url}{path}",
+                rate_limiter=self.rate_limiter,
+                max_retries=self.max_retries,
+                params={"api_key": self.api_key, **params},
+                timeout=self.timeout
+            )
+        response.raise_for_status()
+        return response.json()
         
     def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
         """Get genre suggestion using TMDB API"""
         try:
-            # Search for the movie
-            response = requests.get(
-                f"{self.base_url}/search/movie",
-                params={
-                    "api_key": self.api_key,
-                    "query": title,
-                    "include_adult": False
-                }
-            )
-            response.raise_for_status()
-            results = response.json().get("results", [])
+            # Search for the movie, with the year clean_movie_title appends as a separate filter
+            name, year = split_title_year(title)
+            params = {"query": name, "include_adult": False}
+            if year != NO_YEAR:
+                params["year"] = year
+            results = self._get("/search/movie", params).get("results", [])
             
             if not results:
                 return GenreSuggestion(
@@ -48,47 +125,12 @@ class TMDBGenreSuggester(GenreSuggesterInterface):
             movie = results[0]
             
             # Get full movie details which includes genres as strings
-            movie_response = requests.get(
-                f"{self.base_url}/movie/{movie['id']}",
-                params={"api_key": self.api_key}
-            )
-            movie_response.raise_for_status()
-            movie_details = movie_response.json()
-            
-            # Get genres as strings
-            movie_genres = [g["name"] for g in movie_details.get("genres", [])]
-            
-            if not movie_genres:
-                return GenreSuggestion(
-                    genre=None,
-                    confidence="Low",
-                    status="undetermined",
-                    message=f"No genres found for '{title}'"
-                )
-                
-            # Try to match with our valid genres
-            primary_genre = movie_genres[0]  # TMDB lists genres in order of relevance
-            confidence = "High" if movie.get("popularity", 0) > 10 else "Medium"
+            movie_details = self._get(f"/movie/{movie['id']}", {})
             
-            # Try to match with our valid genres (case insensitive)
-            for valid_genre in valid_genres:
-                if valid_genre.lower() == primary_genre.lower():
-                    return GenreSuggestion(
-                        genre=valid_genre,  # Use our casing
-                        confidence=confidence,
-                        status="success",
-                        message=f"Found '{movie_details.get('title')}' ({movie_details.get('release_date', '')[:4]})"
-                    )
-                    
-            # If no match, suggest the TMDB genre
-            return GenreSuggestion(
-                genre=primary_genre,
-                confidence=confidence,
-                status="success",
-                message=f"Found '{movie_details.get('title')}' ({movie_details.get('release_date', '')[:4]})"
-            )
+            return suggestion_from_details(title, movie, movie_details, valid_genres)
             
         except Exception as e:
+            SUGGESTER_ERRORS.inc(backend='tmdb')
             logger.error(f"TMDB API error: {e}", exc_info=True)
             return GenreSuggestion(
                 genre=None,
@@ -96,3 +138,10 @@ class TMDBGenreSuggester(GenreSuggesterInterface):
                 status="error",
                 message=str(e)
             )
+
+    def suggest_genres(self, titles: List[str], valid_genres: List[str]) -> List[GenreSuggestion]:
+        """Look up several titles at once over the pooled session; the token bucket still paces them"""
+        if len(titles) <= 1:
+            return [self.suggest_genre(title, valid_genres) for title in titles]
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, len(titles))) as executor:
+            return list(executor.map(lambda title: self.suggest_genre(title, valid_genres), titles))
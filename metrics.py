@@ -0,0 +1,217 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. requests served or tokens used"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{self._labels(key)} {_format_value(value)}"
+
+class Gauge(Counter):
+    """A value that can go up and down, e.g. files in the library"""
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+class Histogram(_Metric):
+    """Counts of observations (usually seconds) in cumulative buckets, plus their sum"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe how long the with-block took, whether or not it raised"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            snapshot = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels(key, (('le', _format_value(bound)),))} {cumulative}"
+            yield f"{self.name}_sum{self._labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{self._labels(key)} {cumulative}"
+
+class MetricsRegistry:
+    """Named metrics plus collectors that refresh gauges from live state when scraped"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, labelnames, **kwargs)
+            elif type(metric) is not metric_class or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered differently")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """Call collect before every render, e.g. to set gauges from a cache's stats"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format"""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for collect in collectors:
+            collect()
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+# Everything the app measures, in one place so names stay consistent
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'movie_organizer_http_request_duration_seconds', 'Time to handle an HTTP request, by route',
+    ('method', 'route', 'status'))
+SCAN_SECONDS = REGISTRY.histogram(
+    'movie_organizer_scan_duration_seconds', 'Time to refresh the library index for a movie folder', ('full',))
+SCAN_DIRECTORIES = REGISTRY.counter(
+    'movie_organizer_scan_directories_total', 'Directories visited and re-listed by library scans', ('kind',))
+LIBRARY_MOVIES = REGISTRY.gauge(
+    'movie_organizer_library_movies', 'Movie files in a movie folder at its last scan', ('root',))
+SUGGESTER_CALL_SECONDS = REGISTRY.histogram(
+    'movie_organizer_suggester_call_duration_seconds', 'Latency of genre suggester backend calls',
+    ('backend', 'call'))
+SUGGESTER_ERRORS = REGISTRY.counter(
+    'movie_organizer_suggester_errors_total', 'Genre suggester backend calls that failed', ('backend',))
+SUGGESTER_FALLBACKS = REGISTRY.counter(
+    'movie_organizer_suggester_fallbacks_total', 'Titles a suggester handed on to another way of answering',
+    ('backend', 'to'))
+PIPELINE_TITLES = REGISTRY.counter(
+    'movie_organizer_pipeline_titles_total', 'Titles each suggester pipeline tier answered, was unsure of or '
+    'skipped for lack of budget', ('tier', 'outcome'))
+PIPELINE_TIER_SECONDS = REGISTRY.histogram(
+    'movie_organizer_pipeline_tier_duration_seconds', 'Time a suggester pipeline tier took per batch', ('tier',))
+SUGGESTER_SPEND = REGISTRY.counter(
+    'movie_organizer_suggester_spend_dollars_total', 'Estimated spend on paid genre suggesters', ('tier',))
+OPENAI_TOKENS = REGISTRY.counter(
+    'movie_organizer_openai_tokens_total', 'Tokens used by OpenAI calls as reported in responses', ('model', 'type'))
+OPENAI_TOKENS_PER_TITLE = REGISTRY.histogram(
+    'movie_organizer_openai_tokens_per_title', 'Tokens each OpenAI call used per title it asked about',
+    ('call', 'type'), buckets=(5, 10, 25, 50, 100, 250, 500, 1000, 2500))
+FINGERPRINT_BYTES_READ = REGISTRY.counter(
+    'movie_organizer_fingerprint_bytes_read_total', 'Bytes read to fingerprint files for duplicate detection',
+    ('stage',))
+FINGERPRINT_CACHE_LOOKUPS = REGISTRY.counter(
+    'movie_organizer_fingerprint_cache_lookups_total', 'Fingerprint cache lookups by result', ('result',))
+MEDIA_PROBES = REGISTRY.counter(
+    'movie_organizer_media_probes_total', 'Container headers probed for title tags, by result', ('result',))
+SUGGESTION_CACHE_LOOKUPS = REGISTRY.counter(
+    'movie_organizer_suggestion_cache_lookups_total', 'Suggestion cache lookups by result', ('result',))
+SUGGESTION_CACHE_ENTRIES = REGISTRY.gauge(
+    'movie_organizer_suggestion_cache_entries', 'Suggestions stored in the on-disk cache')
@@ -0,0 +1,274 @@
+import hashlib
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from metrics import FINGERPRINT_BYTES_READ, FINGERPRINT_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+# Three samples of this size (head, middle, tail) stand in for the whole file at first
+SAMPLE_SIZE = 1 << 20
+FULL_HASH_CHUNK = 8 << 20
+DEFAULT_HASH_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sample_hash TEXT,
+    full_hash TEXT,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (device, inode, mtime_ns, size)
+);
+"""
+
+class MovieFile(NamedTuple):
+    """A file as the library index knows it, enough to fingerprint it without another stat"""
+    root: str
+    relative_path: str
+    path: str
+    size: int
+    mtime_ns: int
+    device: int
+    inode: int
+
+    @property
+    def identity(self):
+        """The file itself rather than its name: every hard link to it shares this"""
+        # Filesystems without inode numbers report 0; only the path tells those files apart
+        return (self.device, self.inode) if self.inode else self.path
+
+    @property
+    def fingerprint_key(self) -> Tuple[int, int, int, int]:
+        return (self.device, self.inode, self.mtime_ns, self.size)
+
+class DuplicateGroup(NamedTuple):
+    """Files with identical content; every copy after the first is wasted space"""
+    size: int
+    full_hash: str
+    files: List[MovieFile]
+
+    @property
+    def wasted_bytes(self) -> int:
+        return self.size * (len(self.files) - 1)
+
+def _sample_offsets(size: int) -> List[int]:
+    if size <= 3 * SAMPLE_SIZE:
+        return [0]
+    # mmap offsets must sit on the allocation granularity
+    granularity = mmap.ALLOCATIONGRANULARITY
+    middle = (size // 2 - SAMPLE_SIZE // 2) // granularity * granularity
+    tail = (size - SAMPLE_SIZE) // granularity * granularity
+    return [0, middle, tail]
+
+def sample_hash(path: str, size: int) -> str:
+    """Hash of the size plus the head, middle and tail of a file, read via mmap.
+
+    Files up to three samples long are hashed whole, so for them the
+    sample hash is already a full hash.
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=20)
+    length = size if size <= 3 * SAMPLE_SIZE else SAMPLE_SIZE
+    with open(path, 'rb') as f:
+        for offset in _sample_offsets(size):
+            with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as mapped:
+                digest.update(mapped)
+            FINGERPRINT_BYTES_READ.inc(length, stage='sample')
+    return digest.hexdigest()
+
+def full_hash(path: str) -> str:
+    """Hash of the whole file, read sequentially"""
+    digest = hashlib.blake2b(digest_size=20)
+    read = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(FULL_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+            read += len(chunk)
+    FINGERPRINT_BYTES_READ.inc(read, stage='full')
+    return digest.hexdigest()
+
+class FingerprintCache:
+    """SQLite store of file fingerprints keyed by device, inode, mtime and size.
+
+    A file that was only renamed or moved within its filesystem keeps its
+    device, inode and mtime, so organizing the library does not invalidate its
+    fingerprint; any rewrite changes the mtime and forces a new read.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(fingerprints)')}
+        if columns and 'device' not in columns:
+            # Keyed without the device, inodes on different filesystems collide; start over
+            logger.info("Fingerprint cache predates device keys, discarding it")
+            self._conn.execute('DROP TABLE fingerprints')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, files: Iterable[MovieFile]) -> Dict[Tuple[int, int, int, int], Tuple[Optional[str], Optional[str]]]:
+        """Known (sample hash, full hash) for each file's (device, inode, mtime_ns, size)"""
+        found = {}
+        with self._lock:
+            for f in files:
+                key = f.fingerprint_key
+                row = self._conn.execute(
+                    'SELECT sample_hash, full_hash FROM fingerprints '
+                    'WHERE device = ? AND inode = ? AND mtime_ns = ? AND size = ?', key).fetchone()
+                if row:
+                    found[key] = row
+        return found
+
+    def put(self, f: MovieFile, sample: Optional[str], full: Optional[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO fingerprints (device, inode, mtime_ns, size, sample_hash, full_hash, checked_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (device, inode, mtime_ns, size) DO UPDATE SET '
+                'sample_hash = COALESCE(excluded.sample_hash, sample_hash), '
+                'full_hash = COALESCE(excluded.full_hash, full_hash), checked_at = excluded.checked_at',
+                (*f.fingerprint_key, sample, full, time.time()))
+            self._conn.commit()
+
+    def prune(self, files: Iterable[MovieFile]) -> int:
+        """Forget fingerprints of files no longer in the library. Returns rows removed."""
+        keep = {f.fingerprint_key for f in files}
+        with self._lock:
+            rows = self._conn.execute('SELECT device, inode, mtime_ns, size FROM fingerprints').fetchall()
+            stale = [row for row in rows if row not in keep]
+            self._conn.executemany(
+                'DELETE FROM fingerprints WHERE device = ? AND inode = ? AND mtime_ns = ? AND size = ?', stale)
+            self._conn.commit()
+        return len(stale)
+
+class DuplicateFinder:
+    """Finds files with identical content in stages that each read more of fewer files.
+
+    1. Group by size, which the library index already has; a unique size
+       cannot be a duplicate. Files that share a size are stat'ed again,
+       since the index only re-reads a file when its directory changes.
+    2. Within a size group, compare sample hashes of the head, middle and
+       tail of each file (3 MB per file).
+    3. Only files whose samples collide are hashed in full.
+
+    Hashes are cached by device, inode, mtime and size, so a rerun reads
+    only the files that are new or changed. Hard links to the same inode
+    on the same device are one file, not duplicates.
+    """
+
+    def __init__(self, cache: FingerprintCache, max_workers: int = DEFAULT_HASH_WORKERS):
+        self.cache = cache
+        self.max_workers = max_workers
+
+    def find(self, files: Iterable[MovieFile], prune: bool = False) -> List[DuplicateGroup]:
+        """Duplicate groups among files, the most wasted space first.
+
+        Pass prune=True when files is the whole library, so fingerprints
+        of files that are gone are dropped from the cache.
+        """
+        files = sorted(files, key=lambda f: f.path)
+        if prune:
+            removed = self.cache.prune(files)
+            if removed:
+                logger.info(f"Pruned {removed} stale fingerprints")
+        by_size: Dict[int, Dict[object, MovieFile]] = {}
+        for f in files:
+            if f.size > 0:
+                by_size.setdefault(f.size, {}).setdefault(f.identity, f)
+        candidates = self._unchanged([f for group in by_size.values() if len(group) > 1 for f in group.values()])
+        sizes = Counter(f.size for f in candidates)
+        candidates = [f for f in candidates if sizes[f.size] > 1]
+        if not candidates:
+            return []
+
+        known = self.cache.get(candidates)
+        FINGERPRINT_CACHE_LOOKUPS.inc(len(known), result='hit')
+        FINGERPRINT_CACHE_LOOKUPS.inc(len(candidates) - len(known), result='miss')
+        samples = {f: known.get(f.fingerprint_key, (None, None))[0] for f in candidates}
+        fulls = {f: known.get(f.fingerprint_key, (None, None))[1] for f in candidates}
+
+        self._fill(samples, lambda f: sample_hash(f.path, f.size), 'sample')
+        for f in candidates:
+            if f.size <= 3 * SAMPLE_SIZE and samples[f]:
+                # Small files were hashed whole by the sample stage
+                fulls[f] = samples[f]
+
+        collisions: Dict[Tuple[int, str], List[MovieFile]] = {}
+        for f in candidates:
+            if samples[f]:
+                collisions.setdefault((f.size, samples[f]), []).append(f)
+        colliding = [f for group in collisions.values() if len(group) > 1 for f in group]
+        self._fill({f: fulls[f] for f in colliding}, lambda f: full_hash(f.path), 'full', fulls)
+
+        groups: Dict[Tuple[int, str], List[MovieFile]] = {}
+        for f in colliding:
+            if fulls[f]:
+                groups.setdefault((f.size, fulls[f]), []).append(f)
+        duplicates = [DuplicateGroup(size, digest, sorted(group, key=lambda f: f.path))
+                      for (size, digest), group in groups.items() if len(group) > 1]
+        duplicates.sort(key=lambda group: (-group.wasted_bytes, group.files[0].path))
+        logger.info(f"Checked {len(candidates)} files with shared sizes: {len(colliding)} sample collisions, "
+                    f"{len(duplicates)} duplicate groups")
+        return duplicates
+
+    @staticmethod
+    def _unchanged(files: List[MovieFile]) -> List[MovieFile]:
+        """Files whose size, mtime, device and inode are still what the index says.
+
+        A file rewritten in place, or still being written at the last scan,
+        would otherwise be matched by stale keys to fingerprints of its old
+        content. Such files are left out until the index catches up.
+        """
+        unchanged = []
+        for f in files:
+            try:
+                st = os.stat(f.path)
+            except OSError as e:
+                logger.info(f"Skipping {f.path}: {e}")
+                continue
+            if (st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino) == (f.size, f.mtime_ns, f.device, f.inode):
+                unchanged.append(f)
+            else:
+                logger.info(f"Skipping {f.path}: changed since the library was last scanned")
+        return unchanged
+
+    def _fill(self, hashes: Dict[MovieFile, Optional[str]], compute, stage: str,
+              into: Optional[Dict[MovieFile, Optional[str]]] = None) -> None:
+        """Compute the missing hashes on a thread pool and cache each as it arrives"""
+        into = hashes if into is None else into
+        missing = [f for f, digest in hashes.items() if not digest]
+        if not missing:
+            return
+
+        def compute_one(f: MovieFile) -> Optional[str]:
+            try:
+                return compute(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cannot fingerprint {f.path}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for f, digest in zip(missing, executor.map(compute_one, missing)):
+                into[f] = digest
+                if digest:
+                    small = f.size <= 3 * SAMPLE_SIZE
+                    if stage == 'sample':
+                        self.cache.put(f, digest, digest if small else None)
+                    else:
+                        self.cache.put(f, None, digest)
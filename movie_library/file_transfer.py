@@ -0,0 +1,245 @@
+import ctypes
+import ctypes.util
+import errno
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024 * 1024
+# fsync and record a resume point this often while copying
+CHECKPOINT_BYTES = 512 * 1024 * 1024
+PARTIAL_SUFFIX = '.partial'
+STATE_SUFFIX = '.partial.json'
+
+ProgressCallback = Callable[[int, int], None]
+
+AT_FDCWD = -100
+RENAME_NOREPLACE = 1
+# macOS's flag for the same thing
+RENAME_EXCL = 0x4
+# errno values meaning the filesystem cannot refuse atomically or cannot hard-link
+UNSUPPORTED_ERRNOS = {errno.EINVAL, errno.ENOSYS, errno.ENOTSUP, errno.EOPNOTSUPP}
+NO_LINK_ERRNOS = {errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+def _load_libc_function(platform: str, name: str, argtypes):
+    """A C library function by name, or None off platform or where the C library lacks it"""
+    if not sys.platform.startswith(platform):
+        return None
+    try:
+        function = getattr(ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True), name)
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = argtypes
+    function.restype = ctypes.c_int
+    return function
+
+_renameat2 = _load_libc_function('linux', 'renameat2', [ctypes.c_int, ctypes.c_char_p, ctypes.c_int,
+                                                        ctypes.c_char_p, ctypes.c_uint])
+_renamex_np = _load_libc_function('darwin', 'renamex_np', [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint])
+
+def _native_no_replace(src: str, dest: str) -> bool:
+    """Rename through the C library's no-replace call; False if there is none or the filesystem lacks it"""
+    if _renameat2 is not None:
+        result = _renameat2(AT_FDCWD, os.fsencode(src), AT_FDCWD, os.fsencode(dest), RENAME_NOREPLACE)
+    elif _renamex_np is not None:
+        result = _renamex_np(os.fsencode(src), os.fsencode(dest), RENAME_EXCL)
+    else:
+        return False
+    if result == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in UNSUPPORTED_ERRNOS:
+        return False
+    raise OSError(err, os.strerror(err), src, None, dest)
+
+def _checked_rename(src: str, dest: str) -> None:
+    """Rename after checking dest is free; only for filesystems that offer nothing atomic"""
+    if os.path.lexists(dest):
+        raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dest)
+    os.rename(src, dest)
+
+def rename_no_replace(src: str, dest: str) -> None:
+    """Rename src to dest, raising FileExistsError rather than replacing whatever is at dest.
+
+    Checking first and then renaming would clobber a file that appears in
+    between, so the refusal is atomic where the platform allows:
+    renameat2(RENAME_NOREPLACE) on Linux, renamex_np(RENAME_EXCL) on macOS,
+    a plain rename on Windows (which never replaces), and otherwise a hard
+    link plus unlink. Directories, and filesystems without hard links such
+    as SMB or exFAT, get a rename checked just before. Raises OSError with
+    errno EXDEV when src and dest are on different devices.
+    """
+    if os.name == 'nt':
+        os.rename(src, dest)
+        return
+    if _native_no_replace(src, dest):
+        return
+    if os.path.isdir(src):
+        _checked_rename(src, dest)
+        return
+    try:
+        os.link(src, dest)
+    except OSError as e:
+        if e.errno not in NO_LINK_ERRNOS:
+            raise
+        _checked_rename(src, dest)
+        return
+    os.unlink(src)
+
+class TransferMonitor:
+    """Bytes copied so far for every cross-device move in flight"""
+
+    def __init__(self):
+        self._transfers: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def start(self, src: str, dest: str, total: int, resumed_from: int) -> None:
+        with self._lock:
+            self._transfers[dest] = {'source': src, 'destination': dest, 'total': total,
+                                     'done': resumed_from, 'resumed_from': resumed_from,
+                                     'started_at': time.time()}
+
+    def update(self, dest: str, done: int) -> None:
+        with self._lock:
+            if dest in self._transfers:
+                self._transfers[dest]['done'] = done
+
+    def finish(self, dest: str) -> None:
+        with self._lock:
+            self._transfers.pop(dest, None)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return [dict(t, progress=t['done'] / t['total'] if t['total'] else 1.0)
+                    for t in self._transfers.values()]
+
+transfer_monitor = TransferMonitor()
+
+def _partial_paths(dest: str):
+    directory, name = os.path.split(dest)
+    return (os.path.join(directory, f".{name}{PARTIAL_SUFFIX}"),
+            os.path.join(directory, f".{name}{STATE_SUFFIX}"))
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_state(state_path: str, state: Dict) -> None:
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, state_path)
+
+def _resume_offset(src_stat: os.stat_result, src: str, partial_path: str, state_path: str) -> int:
+    """Bytes of a previous attempt that can be kept, or 0 to start over"""
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        partial_size = os.path.getsize(partial_path)
+    except (OSError, ValueError):
+        return 0
+    if (state.get('source') != src or state.get('size') != src_stat.st_size
+            or state.get('mtime_ns') != src_stat.st_mtime_ns):
+        return 0
+    return min(int(state.get('copied', 0)), partial_size)
+
+def _copy_range(src_fd: int, dest_fd: int, offset: int, count: int) -> int:
+    """Copy up to count bytes at offset in the kernel where possible; returns bytes copied"""
+    if hasattr(os, 'copy_file_range'):
+        try:
+            return os.copy_file_range(src_fd, dest_fd, count, offset, offset)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    if hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dest_fd, offset, os.SEEK_SET)
+            return os.sendfile(dest_fd, src_fd, offset, count)
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                raise
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    os.lseek(dest_fd, offset, os.SEEK_SET)
+    return os.write(dest_fd, os.read(src_fd, count))
+
+def copy_file_resumable(src: str, dest: str, progress: Optional[ProgressCallback] = None,
+                        chunk_size: int = CHUNK_SIZE, checkpoint_bytes: int = CHECKPOINT_BYTES) -> None:
+    """Copy src to dest through a hidden temp file that survives interruptions.
+
+    Data goes to '.<name>.partial' next to dest, with a small JSON state file
+    recording how far the copy got at the last fsync. Calling this again for
+    the same unchanged source picks up from that point. The finished file is
+    fsynced, gets the source's timestamps and permissions, and is renamed
+    into place, so dest never appears half-written. If something else took
+    dest meanwhile, FileExistsError is raised and the copy is kept.
+    """
+    src_stat = os.stat(src)
+    total = src_stat.st_size
+    partial_path, state_path = _partial_paths(dest)
+    offset = _resume_offset(src_stat, src, partial_path, state_path)
+    if offset:
+        logger.info(f"Resuming copy of '{src}' at {offset}/{total} bytes")
+
+    state = {'source': src, 'size': total, 'mtime_ns': src_stat.st_mtime_ns, 'copied': offset}
+    _write_state(state_path, state)
+    transfer_monitor.start(src, dest, total, offset)
+    try:
+        with open(src, 'rb') as src_file, open(partial_path, 'r+b' if offset else 'wb') as dest_file:
+            src_fd, dest_fd = src_file.fileno(), dest_file.fileno()
+            os.ftruncate(dest_fd, offset)
+            last_checkpoint = offset
+            while offset < total:
+                copied = _copy_range(src_fd, dest_fd, offset, min(chunk_size, total - offset))
+                if copied == 0:
+                    raise IOError(f"Unexpected end of file copying '{src}' at {offset}/{total} bytes")
+                offset += copied
+                transfer_monitor.update(dest, offset)
+                if progress:
+                    progress(offset, total)
+                if offset - last_checkpoint >= checkpoint_bytes:
+                    os.fsync(dest_fd)
+                    state['copied'] = last_checkpoint = offset
+                    _write_state(state_path, state)
+            os.fsync(dest_fd)
+
+        shutil.copystat(src, partial_path)
+        rename_no_replace(partial_path, dest)
+        _fsync_directory(os.path.dirname(dest) or '.')
+        os.remove(state_path)
+    finally:
+        transfer_monitor.finish(dest)
+
+def move_file(src: str, dest: str, progress: Optional[ProgressCallback] = None) -> None:
+    """Move a file, renaming on the same device and copying resumably across devices.
+
+    Never replaces an existing dest; raises FileExistsError instead.
+    """
+    if os.path.abspath(src) == os.path.abspath(dest):
+        return
+    try:
+        rename_no_replace(src, dest)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    logger.info(f"'{src}' and '{dest}' are on different devices; copying")
+    copy_file_resumable(src, dest, progress)
+    os.remove(src)
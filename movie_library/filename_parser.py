@@ -0,0 +1,155 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+PARSE_CACHE_SIZE = 200000
+
+# Word boundaries that treat '_' as a separator, unlike \b
+_START = r'(?<![0-9A-Za-z])'
+_END = r'(?![0-9A-Za-z])'
+
+# One alternation for every tag we recognise; finditer walks the name once.
+# The word-boundary check is factored out so positions inside a word fail fast.
+TOKEN_PATTERN = re.compile(
+    r'\(\s*(?P<paren_year>(?:19|20)\d{2})\s*\)'
+    r'|(?P<bracket>\[[^\]]*\]|\([^)]*\)|\{[^}]*\})'
+    fr'|{_START}(?:'
+    r'(?P<year>(?:19|20)\d{2})'
+    r'|(?P<resolution>\d{3,4}[pi]|4k|uhd)'
+    r'|(?P<source>blu-?ray|bdrip|brrip|bdremux|remux|web-?dl|webrip|web|hdtv|hdrip|dvdrip|dvdscr|dvd|hdcam|cam|telesync|ts)'
+    r'|(?P<codec>[xh]\.?26[45]|hevc|avc|xvid|divx|av1|vp9)'
+    r'|(?P<audio>aac(?:\d(?:\.\d)?)?|ac3|eac3|dd\+?(?:\d\.\d)?|ddp(?:\d\.\d)?|dts(?:-?hd)?|truehd|atmos|flac|mp3)'
+    r'|(?P<size>\d+(?:\.\d+)?\s?[mg]b)'
+    fr'){_END}'
+    r'|(?<=[0-9A-Za-z\]\)])-(?P<group>[0-9A-Za-z]+)$',
+    re.IGNORECASE
+)
+
+WORD_PATTERN = re.compile(r'[0-9A-Za-z]')
+MAX_EXTENSION_LENGTH = 5
+
+# Tags after which everything else in the name is release metadata
+_BOUNDARY_GROUPS = ('paren_year', 'year', 'resolution', 'source', 'codec', 'audio', 'size')
+# Sources that are also ordinary words ("Charlotte's Web", "Cam"); only trusted after the title
+AMBIGUOUS_SOURCES = {'web', 'cam', 'ts', 'dvd'}
+
+SOURCE_NAMES = {
+    'bluray': 'BluRay', 'blu-ray': 'BluRay', 'bdrip': 'BDRip', 'brrip': 'BRRip',
+    'bdremux': 'Remux', 'remux': 'Remux', 'webdl': 'WEB-DL', 'web-dl': 'WEB-DL',
+    'webrip': 'WEBRip', 'web': 'WEB', 'hdtv': 'HDTV', 'hdrip': 'HDRip', 'dvdrip': 'DVDRip',
+    'dvdscr': 'DVDScr', 'dvd': 'DVD', 'hdcam': 'HDCAM', 'cam': 'CAM', 'telesync': 'TS', 'ts': 'TS',
+}
+
+class ParsedName(NamedTuple):
+    """Fields parsed from a release-style movie filename"""
+    title: str
+    year: Optional[int] = None
+    resolution: Optional[str] = None
+    source: Optional[str] = None
+    codec: Optional[str] = None
+    release_group: Optional[str] = None
+
+    @property
+    def display_title(self) -> str:
+        """Title with the year appended as 'Name (2002)', the form the suggesters expect"""
+        return f"{self.title} ({self.year})" if self.year else self.title
+
+    @property
+    def cache_key(self) -> Tuple[str, Optional[int]]:
+        """Casefolded title and year; identical for every release of the same movie"""
+        return ' '.join(self.title.casefold().split()), self.year
+
+def _normalize_resolution(value: str) -> str:
+    value = value.lower()
+    return '2160p' if value in ('4k', 'uhd') else value
+
+def _normalize_codec(value: str) -> str:
+    value = value.lower().replace('.', '')
+    if value in ('x265', 'h265', 'hevc'):
+        return 'x265' if value == 'x265' else 'HEVC'
+    if value in ('x264', 'h264', 'avc'):
+        return 'x264' if value == 'x264' else 'H.264'
+    return value.upper()
+
+def _tidy(text: str) -> str:
+    return ' '.join(text.replace('.', ' ').replace('_', ' ').split()).strip(' -')
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_stem(stem: str) -> ParsedName:
+    fields = {}
+    pieces = []
+    position = 0
+    boundary = None
+    year_end = None
+    title_started = False
+    scanners = [TOKEN_PATTERN.finditer(stem)]
+
+    while scanners:
+        match = next(scanners[-1], None)
+        if match is None:
+            scanners.pop()
+            continue
+        kind = match.lastgroup
+        if boundary is None:
+            if kind == 'bracket':
+                piece = stem[position:match.start()]
+                pieces.append(piece)
+                title_started = title_started or WORD_PATTERN.search(piece) is not None
+                position = match.end()
+                continue
+            if kind not in _BOUNDARY_GROUPS:
+                continue
+            # A leading tag is the title itself, as in 1917.2019.1080p
+            if not title_started and not WORD_PATTERN.search(stem, position, match.start()):
+                continue
+            if kind == 'source' and match.group(kind).lower() in AMBIGUOUS_SOURCES:
+                continue
+            boundary = match.start()
+        elif kind == 'bracket':
+            # Tags inside brackets after the title, as in "[1080p] [WEBRip]"
+            scanners.append(TOKEN_PATTERN.finditer(stem, match.start() + 1, match.end() - 1))
+            continue
+        elif kind in ('year', 'paren_year') and year_end is not None and not WORD_PATTERN.search(stem, year_end, match.start()):
+            # Two years in a row: the first belongs to the title, as in Blade.Runner.2049.2017
+            boundary = match.start()
+            fields.pop('year')
+            year_end = None
+
+        value = match.group(kind)
+        if kind in ('year', 'paren_year'):
+            if 'year' not in fields:
+                fields['year'] = int(value)
+                year_end = match.end()
+            continue
+        year_end = None
+        if kind == 'resolution':
+            fields.setdefault('resolution', _normalize_resolution(value))
+        elif kind == 'source':
+            fields.setdefault('source', SOURCE_NAMES.get(value.lower(), value))
+        elif kind == 'codec':
+            fields.setdefault('codec', _normalize_codec(value))
+        elif kind == 'group':
+            fields['release_group'] = value
+
+    pieces.append(stem[position:boundary])
+    return ParsedName(_tidy(''.join(pieces)), **fields)
+
+def parse_filename(filename: str) -> ParsedName:
+    """Parse a movie filename or path into title, year and release details"""
+    name = filename[max(filename.rfind('/'), filename.rfind('\\')) + 1:]
+    dot = name.rfind('.')
+    if 0 < dot and len(name) - dot <= MAX_EXTENSION_LENGTH:
+        name = name[:dot]
+    return _parse_stem(name)
+
+def parse_title(text: str) -> ParsedName:
+    """Parse a release-style title that has no file extension, e.g. one from container tags"""
+    return _parse_stem(text)
+
+def parse_filenames(filenames: Iterable[str]) -> List[ParsedName]:
+    """Parse a whole scan result; repeated names are answered from the parse cache"""
+    return [parse_filename(filename) for filename in filenames]
+
+def clean_title(filename: str) -> str:
+    """Title and year of a movie file formatted as 'Name (2002)'"""
+    return parse_filename(filename).display_title
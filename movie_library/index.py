@@ -0,0 +1,523 @@
+import heapq
+import itertools
+import os
+import sqlite3
+import logging
+import threading
+import time
+from concurrent.futures import Executor
+from typing import List, Dict, NamedTuple, Optional, Iterable, Sequence, Tuple
+from metrics import MEDIA_PROBES
+from .duplicates import MovieFile
+from .media_probe import MediaTags, best_title, probe_file
+from .scanner import scan_directories, is_recycle_path, DirectoryListing, DEFAULT_SCAN_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Bump when the schema changes; the index is a cache, so old tables are simply rebuilt
+SCHEMA_VERSION = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    parent TEXT,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_directories_root ON directories(root);
+
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    relative_path TEXT NOT NULL,
+    folder_name TEXT NOT NULL,
+    title TEXT NOT NULL,
+    sort_title TEXT NOT NULL,
+    sort_path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_root ON files(root);
+CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir);
+CREATE INDEX IF NOT EXISTS idx_files_root_title ON files(root, sort_title);
+CREATE INDEX IF NOT EXISTS idx_files_inode ON files(inode);
+
+-- Container tags of each file, kept while the file's device, inode, mtime and size stay the same
+CREATE TABLE IF NOT EXISTS media_tags (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    title TEXT,
+    year INTEGER,
+    probed_at REAL NOT NULL,
+    PRIMARY KEY (device, inode, mtime_ns, size)
+);
+
+CREATE TABLE IF NOT EXISTS suggestions (
+    path TEXT PRIMARY KEY,
+    genre TEXT,
+    confidence TEXT,
+    status TEXT NOT NULL,
+    message TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+# Below this many new files a probe runs inline; a warm header parse takes well under a
+# millisecond, so starting worker processes only pays off for a large batch
+PROBE_INLINE_LIMIT = 256
+
+UNCATEGORIZED = 'Uncategorized'
+
+class MovieRecord:
+    """One movie of a library listing.
+
+    A listing of a large archive holds hundreds of thousands of these, so
+    they have slots rather than a dict each, share one string per genre and
+    folder, and derive the title from the path instead of storing both.
+    Listings come ordered by the casefolded title the index stores at scan
+    time, so nothing is lowercased per comparison.
+    """
+    __slots__ = ('path', 'base_folder', 'current_genre', 'suggested_genre')
+
+    def __init__(self, path: str, base_folder: str, current_genre: str, suggested_genre: Optional[str]):
+        self.path = path
+        self.base_folder = base_folder
+        self.current_genre = current_genre
+        self.suggested_genre = suggested_genre
+
+    @property
+    def title(self) -> str:
+        """The filename without its extension, as stored in the index"""
+        return os.path.splitext(os.path.basename(self.path))[0]
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {
+            'title': self.title,
+            'path': self.path,
+            'base_folder': self.base_folder,
+            'current_genre': self.current_genre,
+            'suggested_genre': self.suggested_genre
+        }
+
+SORT_COLUMNS = {
+    'title': 'sort_title, relative_path',
+    'genre': 'current_genre, sort_title, relative_path',
+    'path': 'sort_path, relative_path',
+}
+
+class MoviePage(NamedTuple):
+    """One page of a movie listing.
+
+    next_cursor is the sort key of the page's last movie plus its root;
+    passing it back as after fetches the page that follows. It is None
+    when nothing follows.
+    """
+    total: int
+    movies: List[MovieRecord]
+    next_cursor: Optional[List[str]]
+
+class LibraryIndex:
+    """On-disk SQLite index of the movie files under each configured folder.
+
+    Directories are stored with their mtime so that a refresh only re-lists
+    the directories whose contents changed since the previous scan.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._root_locks: Dict[str, threading.Lock] = {}
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            logger.info(f"Rebuilding library index schema in {db_path}")
+            self._conn.executescript('DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS directories; '
+                                      'DROP TABLE IF EXISTS media_tags;')
+            self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def refresh(self, root: str, full: bool = False,
+                max_workers: int = DEFAULT_SCAN_WORKERS) -> Dict[str, int]:
+        """Bring the index for root up to date.
+
+        Unchanged directories (same mtime as last time) are not re-listed;
+        their known subdirectories are visited instead. Pass full=True to
+        re-list every directory regardless of its mtime.
+
+        Returns counts of directories visited and re-listed.
+        """
+        counts, _ = self._refresh(root, full, max_workers)
+        return counts
+
+    def apply_changes(self, root: str, directories: Optional[Iterable[str]] = None,
+                      max_workers: int = DEFAULT_SCAN_WORKERS) -> Dict[str, list]:
+        """Re-list the given directories under root and report which movies changed.
+
+        Meant for filesystem events: only those directories are re-listed,
+        plus any subdirectory that is new or whose mtime changed. Without
+        directories, the whole root is refreshed incrementally as in refresh.
+
+        Returns {'added': [{'title', 'path', 'folder_name'}], 'removed': [relative paths]}.
+        """
+        _, changes = self._refresh(root, False, max_workers, directories)
+        return changes
+
+    def _refresh(self, root: str, full: bool, max_workers: int,
+                 directories: Optional[Iterable[str]] = None) -> Tuple[Dict[str, int], Dict[str, list]]:
+        start = None
+        if directories is not None:
+            start = self._start_directories(root, directories)
+            if not start:
+                return {'directories': 0, 'rescanned': 0}, {'added': [], 'removed': []}
+
+        # Refreshes of one root are serialized; other roots scan alongside, since the
+        # shared lock is only held to read what is known and to write what changed
+        with self._root_lock(root):
+            with self._lock:
+                known_mtimes = {}
+                known_children = {}
+                for path, parent, mtime_ns in self._conn.execute(
+                        'SELECT path, parent, mtime_ns FROM directories WHERE root = ?', (root,)):
+                    known_mtimes[path] = mtime_ns
+                    known_children.setdefault(parent, []).append(path)
+
+            # Directories we were told about are re-listed even if their mtime looks the same
+            in_scope = set(known_mtimes)
+            if start is not None:
+                for directory in start:
+                    known_mtimes.pop(directory, None)
+                in_scope = {path for path in in_scope
+                            if any(path == d or path.startswith(os.path.join(d, '')) for d in start)}
+
+            listings = list(scan_directories(root, max_workers=max_workers,
+                                             known_mtimes=None if full else known_mtimes,
+                                             known_children=known_children, start=start))
+
+            with self._lock:
+                visited = set()
+                rescanned = 0
+                added: Dict[str, Dict] = {}
+                removed: Dict[str, str] = {}
+                try:
+                    for listing in listings:
+                        visited.add(listing.path)
+                        if listing.changed:
+                            self._store_listing(root, listing, added, removed)
+                            rescanned += 1
+
+                    # Anything we knew about but did not reach has been removed
+                    for path in in_scope - visited:
+                        for file_path, relative_path in self._conn.execute(
+                                'SELECT path, relative_path FROM files WHERE dir = ?', (path,)).fetchall():
+                            removed[file_path] = relative_path
+                        self._conn.execute('DELETE FROM files WHERE dir = ?', (path,))
+                        self._conn.execute('DELETE FROM directories WHERE path = ?', (path,))
+                    self._conn.commit()
+                except Exception:
+                    self._conn.rollback()
+                    raise
+
+        logger.info(f"Refreshed index for {root}: {len(visited)} directories, {rescanned} re-listed")
+
+        changes = {'added': list(added.values()), 'removed': list(removed.values())}
+        return {'directories': len(visited), 'rescanned': rescanned}, changes
+
+    def _root_lock(self, root: str) -> threading.Lock:
+        with self._lock:
+            return self._root_locks.setdefault(root, threading.Lock())
+
+    def _start_directories(self, root: str, directories: Iterable[str]) -> List[str]:
+        """Existing, non-nested directories inside root to re-list for a set of changed paths"""
+        root = os.path.normpath(root)
+        prefix = os.path.join(root, '')
+        candidates = set()
+        for directory in directories:
+            directory = os.path.normpath(directory)
+            if directory != root and not directory.startswith(prefix):
+                continue
+            # A deleted directory is handled by re-listing its closest surviving parent
+            while directory != root and not os.path.isdir(directory):
+                directory = os.path.dirname(directory)
+            if not is_recycle_path(directory[len(prefix):]):
+                candidates.add(directory)
+        return sorted(d for d in candidates
+                      if not any(d != other and d.startswith(os.path.join(other, '')) for other in candidates))
+
+    def _store_listing(self, root: str, listing: DirectoryListing,
+                       added: Optional[Dict[str, Dict]] = None, removed: Optional[Dict[str, str]] = None) -> None:
+        """Replace the rows for a directory that was re-listed"""
+        directory = listing.path
+        parent = os.path.dirname(directory) if directory != root else None
+        if removed is not None:
+            previous = dict(self._conn.execute(
+                'SELECT path, relative_path FROM files WHERE dir = ?', (directory,)).fetchall())
+        self._conn.execute('DELETE FROM files WHERE dir = ?', (directory,))
+        folder_name = os.path.basename(directory) if directory != root else ''
+        rows = []
+        for f in listing.files:
+            title = os.path.splitext(f.name)[0]
+            rows.append((f.path, root, directory, f.relative_path, folder_name,
+                         title, title.casefold(), f.relative_path.casefold(), f.size, f.mtime_ns, f.device, f.inode))
+            if removed is not None and previous.pop(f.path, None) is None:
+                added[f.path] = {'title': title, 'path': f.relative_path, 'folder_name': folder_name}
+        if removed is not None:
+            for file_path, relative_path in previous.items():
+                removed[file_path] = relative_path
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO files (path, root, dir, relative_path, folder_name, title, sort_title, '
+            'sort_path, size, mtime_ns, device, inode) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        self._conn.execute(
+            'INSERT OR REPLACE INTO directories (path, root, parent, mtime_ns) VALUES (?, ?, ?, ?)',
+            (directory, root, parent, listing.mtime_ns))
+
+    def has_root(self, root: str) -> bool:
+        """Check if root has been scanned into the index before"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM directories WHERE path = ?', (root,)).fetchone() is not None
+
+    def movie_counts(self) -> Dict[str, int]:
+        """Number of indexed movie files under every root"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT root, COUNT(*) FROM files GROUP BY root').fetchall())
+
+    def list_movies(self, root: str, genres: Iterable[str]) -> List[MovieRecord]:
+        """Every indexed movie under root, ordered by title"""
+        # Rows come back with a new string per genre; map them onto one object each
+        genre_names = {genre: genre for genre in genres}
+        suggested_names: Dict[str, str] = {}
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT f.relative_path, f.folder_name, s.genre FROM files f '
+                "LEFT JOIN suggestions s ON s.path = f.path AND s.status = 'success' "
+                'WHERE f.root = ? ORDER BY f.sort_title', (root,))
+            # Built straight from the cursor, so the rows are never all held as tuples too
+            return [MovieRecord(relative_path, root, genre_names.get(folder_name, UNCATEGORIZED),
+                                suggested and suggested_names.setdefault(suggested, suggested))
+                    for relative_path, folder_name, suggested in cursor]
+
+    def labeled_movies(self, root: str, genres: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """Movies already in a genre folder under root, as {relative path: (clean title, genre)}"""
+        genres = list(genres)
+        if not genres:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT f.relative_path, f.folder_name, t.title, t.year FROM files f "
+                f"LEFT JOIN media_tags t ON t.device = f.device AND t.inode = f.inode AND t.mtime_ns = f.mtime_ns AND t.size = f.size "
+                f"WHERE f.root = ? AND f.folder_name IN ({', '.join('?' * len(genres))})",
+                [root] + genres).fetchall()
+        return {relative_path: (best_title(relative_path, MediaTags(title, year)).display_title, folder_name)
+                for relative_path, folder_name, title, year in rows}
+
+    def probe_media(self, root: str, executor: Optional[Executor] = None) -> Dict[str, int]:
+        """Read the container tags of files under root that have not been probed as they are now.
+
+        Probing is CPU-bound header parsing, so with an executor (meant to
+        be a ProcessPoolExecutor) large batches are spread over its workers;
+        a handful of new files is probed inline. Files without usable tags
+        are remembered too, so each file is read once until it changes.
+
+        Returns counts of files probed and of those that had a title tag.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT f.path, f.device, f.inode, f.mtime_ns, f.size FROM files f '
+                'LEFT JOIN media_tags t ON t.device = f.device AND t.inode = f.inode AND t.mtime_ns = f.mtime_ns AND t.size = f.size '
+                'WHERE f.root = ? AND t.inode IS NULL', (root,)).fetchall()
+        if not rows:
+            return {'probed': 0, 'tagged': 0}
+
+        paths = [row[0] for row in rows]
+        if executor is None or len(paths) < PROBE_INLINE_LIMIT:
+            results = map(probe_file, paths)
+        else:
+            results = executor.map(probe_file, paths, chunksize=16)
+
+        now = time.time()
+        stored = []
+        tagged = 0
+        for (_, device, inode, mtime_ns, size), tags in zip(rows, results):
+            result = 'error' if tags is None else 'tagged' if tags.title else 'untagged'
+            MEDIA_PROBES.inc(result=result)
+            tagged += result == 'tagged'
+            tags = tags or MediaTags()
+            stored.append((device, inode, mtime_ns, size, tags.title, tags.year, now))
+
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO media_tags (device, inode, mtime_ns, size, title, year, probed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', stored)
+            # Tags of files that were rewritten or deleted since are never looked up again
+            self._conn.execute(
+                'DELETE FROM media_tags WHERE NOT EXISTS (SELECT 1 FROM files f WHERE f.device = media_tags.device '
+                'AND f.inode = media_tags.inode '
+                'AND f.mtime_ns = media_tags.mtime_ns AND f.size = media_tags.size)')
+            self._conn.commit()
+        logger.info(f"Probed container tags of {len(stored)} files under {root}: {tagged} had a title")
+        return {'probed': len(stored), 'tagged': tagged}
+
+    def movie_titles(self, root: str, relative_paths: Iterable[str]) -> Dict[str, str]:
+        """Clean display title of each movie under root, preferring its container tags to its filename"""
+        relative_paths = list(relative_paths)
+        tags: Dict[str, MediaTags] = {}
+        with self._lock:
+            # Stay well under SQLite's limit on query parameters
+            for i in range(0, len(relative_paths), 500):
+                chunk = relative_paths[i:i + 500]
+                for relative_path, title, year in self._conn.execute(
+                        f"SELECT f.relative_path, t.title, t.year FROM files f "
+                        f"JOIN media_tags t ON t.device = f.device AND t.inode = f.inode AND t.mtime_ns = f.mtime_ns AND t.size = f.size "
+                        f"WHERE f.root = ? AND f.relative_path IN ({', '.join('?' * len(chunk))})",
+                        [root] + chunk):
+                    tags[relative_path] = MediaTags(title, year)
+        return {relative_path: best_title(relative_path, tags.get(relative_path)).display_title
+                for relative_path in relative_paths}
+
+    def movie_files(self, roots: Iterable[str]) -> List[MovieFile]:
+        """Every indexed file under roots with the size, mtime, device and inode seen at its last scan"""
+        roots = list(roots)
+        if not roots:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT root, relative_path, path, size, mtime_ns, device, inode FROM files "
+                f"WHERE root IN ({', '.join('?' * len(roots))})", roots).fetchall()
+        return [MovieFile(*row) for row in rows]
+
+    def query_movies(self, root: str, genres: Iterable[str], sort: str = 'title',
+                     descending: bool = False, genre: Optional[str] = None,
+                     uncategorized: bool = False, search: Optional[str] = None,
+                     offset: int = 0, limit: int = 100, after: Optional[Sequence[str]] = None) -> MoviePage:
+        """Return one page of movies under root, sorted and filtered in SQL.
+
+        The page starts after the cursor when after is given (see
+        MoviePage), otherwise offset movies in.
+        """
+        total, rows = self._query_movies(root, list(genres), sort, descending, genre, uncategorized,
+                                         search, 0 if after else offset, limit + 1, after)
+        return self._page(total, rows, limit)
+
+    def query_libraries(self, roots: Iterable[str], genres: Iterable[str], sort: str = 'title',
+                        descending: bool = False, genre: Optional[str] = None,
+                        uncategorized: bool = False, search: Optional[str] = None,
+                        limit: int = 100, after: Optional[Sequence[str]] = None) -> MoviePage:
+        """One page of movies across several roots, in the same order query_movies uses.
+
+        Movies that sort equal in several roots are ordered by root. Each
+        root's query seeks past the cursor and returns at most limit + 1
+        movies already sorted, and the streams are merged k ways on the
+        SQL sort key, so no root's movies are sorted twice and deep pages
+        cost no more than the first. Every movie carries its base_folder.
+        """
+        genres = list(genres)
+        total = 0
+        streams = []
+        for root in roots:
+            root_total, rows = self._query_movies(root, genres, sort, descending, genre, uncategorized,
+                                                  search, 0, limit + 1, after)
+            total += root_total
+            streams.append(rows)
+        merged = heapq.merge(*streams, key=lambda row: row[0], reverse=descending)
+        return self._page(total, list(itertools.islice(merged, limit + 1)), limit)
+
+    @staticmethod
+    def _page(total: int, rows: List[Tuple[tuple, MovieRecord]], limit: int) -> MoviePage:
+        """A page of the first limit rows; one row more means another page follows"""
+        cursor = list(rows[limit - 1][0]) if len(rows) > limit else None
+        return MoviePage(total, [movie for _, movie in rows[:limit]], cursor)
+
+    def _query_movies(self, root: str, genres: List[str], sort: str, descending: bool, genre: Optional[str],
+                      uncategorized: bool, search: Optional[str], offset: int, limit: int,
+                      after: Optional[Sequence[str]] = None) -> Tuple[int, List[Tuple[tuple, MovieRecord]]]:
+        """Total matching and a page of (sort key + root, movie) rows under root"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        columns = SORT_COLUMNS[sort].split(', ')
+
+        placeholders = ', '.join('?' * len(genres))
+        genre_expr = (f"CASE WHEN folder_name IN ({placeholders}) THEN folder_name ELSE '{UNCATEGORIZED}' END"
+                      if genres else f"'{UNCATEGORIZED}'")
+        query = (f"SELECT f.title, f.relative_path, f.sort_title, f.sort_path, {genre_expr} AS current_genre, "
+                 f"s.genre AS suggested_genre FROM files f "
+                 f"LEFT JOIN suggestions s ON s.path = f.path AND s.status = 'success' "
+                 f"WHERE f.root = ?")
+        params = genres + [root]
+
+        conditions = []
+        if uncategorized:
+            genre = UNCATEGORIZED
+        if genre:
+            conditions.append('current_genre = ?')
+            params.append(genre)
+        if search:
+            # Both columns were casefolded in Python at scan time; SQLite's lower() only folds ASCII
+            conditions.append('(instr(sort_title, ?) > 0 OR instr(sort_path, ?) > 0)')
+            params.extend([search.casefold()] * 2)
+        if conditions:
+            query = f"SELECT * FROM ({query}) WHERE " + ' AND '.join(conditions)
+
+        page_query, page_params = query, list(params)
+        if after:
+            if len(after) != len(columns) + 1 or not all(isinstance(value, str) for value in after):
+                raise ValueError("Cursor does not match the sort order")
+            *after_key, after_root = after
+            # Past the cursor's key, or at it in a root that sorts after the cursor's
+            at_key_too = root > after_root if not descending else root < after_root
+            comparison = ('<' if descending else '>') + ('=' if at_key_too else '')
+            page_query = (f"SELECT * FROM ({query}) WHERE ({', '.join(columns)}) {comparison} "
+                          f"({', '.join('?' * len(columns))})")
+            page_params += after_key
+
+        direction = 'DESC' if descending else 'ASC'
+        order_by = ', '.join(f"{column} {direction}" for column in columns)
+
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+            # The sort key comes back from SQL too, so merging roots compares exactly what SQLite did
+            rows = self._conn.execute(f"SELECT {', '.join(columns)}, * FROM ({page_query}) "
+                                      f"ORDER BY {order_by} LIMIT ? OFFSET ?",
+                                      page_params + [limit, offset]).fetchall()
+
+        genre_names = {genre: genre for genre in genres}
+        movies = []
+        for row in rows:
+            _, relative_path, _, _, current_genre, suggested_genre = row[len(columns):]
+            movies.append((row[:len(columns)] + (root,), MovieRecord(
+                relative_path, root, genre_names.get(current_genre, UNCATEGORIZED), suggested_genre)))
+        return total, movies
+
+    def save_suggestion(self, root: str, relative_path: str, genre: Optional[str], confidence: str,
+                        status: str, message: Optional[str] = None) -> None:
+        """Remember the genre suggested for a movie so the table can show it"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO suggestions (path, genre, confidence, status, message, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (os.path.join(root, relative_path), genre, confidence, status, message, time.time()))
+            self._conn.commit()
+
+    def clear_suggestion(self, root: str, relative_path: str) -> None:
+        """Forget the stored suggestion for a movie"""
+        with self._lock:
+            self._conn.execute('DELETE FROM suggestions WHERE path = ?', (os.path.join(root, relative_path),))
+            self._conn.commit()
+
+    def clear(self, root: str) -> None:
+        """Drop everything indexed under root"""
+        with self._lock:
+            self._conn.execute('DELETE FROM files WHERE root = ?', (root,))
+            self._conn.execute('DELETE FROM directories WHERE root = ?', (root,))
+            self._conn.commit()
@@ -0,0 +1,270 @@
+import logging
+import mmap
+import re
+import struct
+from typing import Iterator, NamedTuple, Optional, Tuple
+from .filename_parser import ParsedName, parse_filename, parse_title
+
+logger = logging.getLogger(__name__)
+
+# Container headers sit in the first few hundred KB; elements found through an
+# index (MKV SeekHead, an MP4 moov at the end) are read only up to this size
+MAX_ELEMENT_BYTES = 4 << 20
+PREFIX_BYTES = 1 << 20
+
+YEAR_PATTERN = re.compile(r'(?<!\d)(19\d\d|20\d\d)(?!\d)')
+# Tag titles that are really an advert for where the file came from
+JUNK_TITLE_PATTERN = re.compile(r'https?://|www\.|\.(com|net|org|to)\b', re.IGNORECASE)
+# Muxers often copy the release name into the title: words joined by dots or underscores
+RELEASE_NAME_PATTERN = re.compile(r'^[^\s._]+([._][^\s._]+)+$')
+
+# Matroska element ids
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+INFO_TITLE = 0x7BA9
+TAGS = 0x1254C367
+TAG = 0x7373
+SIMPLE_TAG = 0x67C8
+TAG_NAME = 0x45A3
+TAG_STRING = 0x4487
+CLUSTER = 0x1F43B675
+
+MP4_TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot'}
+
+class MediaTags(NamedTuple):
+    """Title and year embedded in a movie file's container tags"""
+    title: Optional[str] = None
+    year: Optional[int] = None
+
+def _text(data) -> Optional[str]:
+    text = bytes(data).split(b'\x00', 1)[0].decode('utf-8', errors='replace').strip()
+    return text or None
+
+def _year(text: Optional[str]) -> Optional[int]:
+    match = YEAR_PATTERN.search(text or '')
+    return int(match.group(1)) if match else None
+
+def _read_vint(buf, pos: int, end: int, keep_marker: bool) -> Tuple[int, int]:
+    """An EBML variable-length integer at pos as (value, length); sizes of all ones mean unknown (-1)"""
+    if pos >= end:
+        raise ValueError("EBML element runs past its parent")
+    first = buf[pos]
+    if not first:
+        raise ValueError("Invalid EBML variable-length integer")
+    length = 9 - first.bit_length()
+    if pos + length > end:
+        raise ValueError("EBML element runs past its parent")
+    value = first if keep_marker else first & (0xFF >> length)
+    for i in range(1, length):
+        value = (value << 8) | buf[pos + i]
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return -1, length
+    return value, length
+
+def _ebml_elements(buf, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(id, data start, data end) of the EBML elements between start and end"""
+    pos = start
+    while pos < end:
+        element_id, id_length = _read_vint(buf, pos, end, keep_marker=True)
+        size, size_length = _read_vint(buf, pos + id_length, end, keep_marker=False)
+        data = pos + id_length + size_length
+        data_end = end if size < 0 else min(data + size, end)
+        yield element_id, data, data_end
+        pos = data_end
+
+def _mkv_tags(buf, start: int, end: int) -> Tuple[Optional[str], Optional[str]]:
+    """TITLE and release date from a Tags element"""
+    title = date = None
+    for tag_id, tag_start, tag_end in _ebml_elements(buf, start, end):
+        if tag_id != TAG:
+            continue
+        for simple_id, simple_start, simple_end in _ebml_elements(buf, tag_start, tag_end):
+            if simple_id != SIMPLE_TAG:
+                continue
+            name = value = None
+            for field_id, field_start, field_end in _ebml_elements(buf, simple_start, simple_end):
+                if field_id == TAG_NAME:
+                    name = (_text(buf[field_start:field_end]) or '').upper()
+                elif field_id == TAG_STRING:
+                    value = _text(buf[field_start:field_end])
+            if name == 'TITLE':
+                title = title or value
+            elif name in ('DATE_RELEASED', 'DATE_RECORDED'):
+                date = date or value
+    return title, date
+
+def _probe_mkv(buf, size: int) -> MediaTags:
+    end = min(size, PREFIX_BYTES)
+    elements = _ebml_elements(buf, 0, end)
+    header_id, _, _ = next(elements)
+    if header_id != EBML_HEADER:
+        raise ValueError("Not an EBML file")
+    segment_id, segment_start, _ = next(elements)
+    if segment_id != SEGMENT:
+        raise ValueError("No Matroska segment")
+
+    info_title = tag_title = date = None
+    seeks = {}
+    visited = set()
+    try:
+        for element_id, data, data_end in _ebml_elements(buf, segment_start, end):
+            if element_id == CLUSTER:
+                break
+            visited.add(element_id)
+            if element_id == INFO:
+                for field_id, field_start, field_end in _ebml_elements(buf, data, data_end):
+                    if field_id == INFO_TITLE:
+                        info_title = _text(buf[field_start:field_end])
+            elif element_id == TAGS:
+                tag_title, date = _mkv_tags(buf, data, data_end)
+            elif element_id == SEEK_HEAD:
+                for seek_id, seek_start, seek_end in _ebml_elements(buf, data, data_end):
+                    if seek_id != SEEK:
+                        continue
+                    target = position = None
+                    for field_id, field_start, field_end in _ebml_elements(buf, seek_start, seek_end):
+                        if field_id == SEEK_ID:
+                            target = int.from_bytes(buf[field_start:field_end], 'big')
+                        elif field_id == SEEK_POSITION:
+                            position = int.from_bytes(buf[field_start:field_end], 'big')
+                    if target in (INFO, TAGS) and position is not None:
+                        seeks.setdefault(target, segment_start + position)
+    except ValueError:
+        # The prefix ended partway through an element; what came before it is enough
+        pass
+
+    # Tags are usually written after the clusters; the SeekHead says where
+    for target, position in seeks.items():
+        if target in visited or position >= size:
+            continue
+        element_id, data, data_end = next(_ebml_elements(buf, position, min(size, position + MAX_ELEMENT_BYTES)))
+        if element_id == TAGS:
+            tag_title, date = _mkv_tags(buf, data, data_end)
+        elif element_id == INFO:
+            for field_id, field_start, field_end in _ebml_elements(buf, data, data_end):
+                if field_id == INFO_TITLE:
+                    info_title = _text(buf[field_start:field_end])
+    return MediaTags(tag_title or info_title, _year(date))
+
+def _atoms(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(type, data start, data end) of the MP4/QuickTime atoms between start and end"""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from('>I4s', buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                break
+            size = struct.unpack_from('>Q', buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError(f"Invalid atom size {size}")
+        yield bytes(kind), pos + header, min(pos + size, end)
+        pos += size
+
+def _child(buf, start: int, end: int, kind: bytes) -> Optional[Tuple[int, int]]:
+    for child_kind, data, data_end in _atoms(buf, start, end):
+        if child_kind == kind:
+            return data, data_end
+    return None
+
+def _probe_mp4(buf, size: int) -> MediaTags:
+    moov = None
+    for kind, data, data_end in _atoms(buf, 0, size):
+        if kind == b'moov':
+            # Files not written for streaming keep moov after the media data; it is small either way
+            moov = data, min(data_end, data + MAX_ELEMENT_BYTES)
+            break
+    udta = moov and _child(buf, moov[0], moov[1], b'udta')
+    if not udta:
+        return MediaTags()
+
+    title = date = None
+    meta = _child(buf, udta[0], udta[1], b'meta')
+    if meta:
+        meta_start = meta[0]
+        # iTunes-style meta is a full box (version and flags first); QuickTime's is not
+        if buf[meta_start + 4:meta_start + 8] != b'hdlr':
+            meta_start += 4
+        ilst = _child(buf, meta_start, meta[1], b'ilst')
+        for kind, data, data_end in _atoms(buf, ilst[0], ilst[1]) if ilst else ():
+            if kind in (b'\xa9nam', b'\xa9day'):
+                value = _child(buf, data, data_end, b'data')
+                # data atoms start with a type indicator and a locale
+                text = _text(buf[value[0] + 8:value[1]]) if value else None
+                if kind == b'\xa9nam':
+                    title = title or text
+                else:
+                    date = date or text
+    # Older QuickTime files put text atoms straight into udta, after a length and language code
+    for kind, data, data_end in _atoms(buf, udta[0], udta[1]):
+        if kind == b'\xa9nam' and not title:
+            title = _text(buf[data + 4:data_end])
+        elif kind == b'\xa9day' and not date:
+            date = _text(buf[data + 4:data_end])
+    return MediaTags(title, _year(date))
+
+def _probe_avi(buf, size: int) -> MediaTags:
+    title = date = None
+    pos = 12
+    while pos + 8 <= size:
+        chunk_id, chunk_size = struct.unpack_from('<4sI', buf, pos)
+        data = pos + 8
+        if chunk_id == b'LIST' and buf[data:data + 4] == b'INFO':
+            info_end = min(data + chunk_size, size, data + MAX_ELEMENT_BYTES)
+            info_pos = data + 4
+            while info_pos + 8 <= info_end:
+                sub_id, sub_size = struct.unpack_from('<4sI', buf, info_pos)
+                value = _text(buf[info_pos + 8:min(info_pos + 8 + sub_size, info_end)])
+                if sub_id == b'INAM':
+                    title = value
+                elif sub_id == b'ICRD':
+                    date = value
+                info_pos += 8 + sub_size + (sub_size & 1)
+            break
+        pos = data + chunk_size + (chunk_size & 1)
+    return MediaTags(title, _year(date))
+
+def probe_file(path: str) -> Optional[MediaTags]:
+    """Title and year from the container tags of an MKV, MP4/MOV or AVI file.
+
+    The file is memory-mapped and only its headers are touched: the first
+    megabyte, plus the element an index points to when tags live at the
+    end. Returns None if the file cannot be read or parsed.
+    """
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                size = len(buf)
+                if buf[:4] == b'\x1a\x45\xdf\xa3':
+                    return _probe_mkv(buf, size)
+                if buf[:4] == b'RIFF' and buf[8:12] == b'AVI ':
+                    return _probe_avi(buf, size)
+                if buf[4:8] in MP4_TOP_LEVEL:
+                    return _probe_mp4(buf, size)
+                return MediaTags()
+    except (OSError, ValueError, IndexError, StopIteration, struct.error) as e:
+        logger.debug(f"Cannot read container tags of {path}: {e}")
+        return None
+
+def best_title(filename: str, tags: Optional[MediaTags]) -> ParsedName:
+    """The parsed filename, with its title and year replaced by embedded tags that look trustworthy"""
+    parsed = parse_filename(filename)
+    if (not tags or not tags.title or JUNK_TITLE_PATTERN.search(tags.title)
+            or RELEASE_NAME_PATTERN.match(tags.title)):
+        return parsed
+    # Tag titles are sometimes just the release name, so they get the same clean-up
+    tagged = parse_title(tags.title)
+    if tags.year and tagged.year and tagged.year != tags.year:
+        # The number taken for a year belongs to the title, as in "Blade Runner 2049"
+        tagged = tagged._replace(title=' '.join(tags.title.split()), year=tags.year)
+    if not tagged.title:
+        return parsed
+    return parsed._replace(title=tagged.title, year=tags.year or tagged.year or parsed.year)
@@ -0,0 +1,290 @@
+import os
+import socket
+import sqlite3
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry INTEGER,
+    batch_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    action TEXT NOT NULL,
+    error TEXT,
+    at REAL NOT NULL,
+    owner TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_journal_entry ON journal(entry);
+CREATE INDEX IF NOT EXISTS idx_journal_batch ON journal(batch_id);
+"""
+
+# Journal actions: an intent is written (and committed) before the filesystem
+# is touched, and its outcome afterwards
+MOVE, MOVED, FAILED = 'move', 'moved', 'failed'
+UNDO, UNDONE, UNDO_FAILED = 'undo', 'undone', 'undo_failed'
+
+# Entries are movie files or leftover folders set aside in #recycle
+FILE, DIRECTORY = 'file', 'directory'
+
+MoveFunction = Callable[[str, str], None]
+
+HOSTNAME = socket.gethostname()
+
+# Copies an entry's paths into a new row for it; the parameters are action, error, at, owner and seq
+APPEND_SQL = ('INSERT INTO journal (entry, batch_id, kind, source, destination, action, error, at, owner) '
+              'SELECT entry, batch_id, kind, source, destination, ?, ?, ?, ? FROM journal WHERE seq = ?')
+
+def new_batch_id() -> str:
+    return time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+
+def _process_start(pid: int) -> Optional[str]:
+    """When a process started (Linux only), to tell it from a later process given the same pid"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Field 22; the fields after the parenthesized command name start at field 3
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+_owners: Dict[int, str] = {}
+
+def current_owner() -> str:
+    """This process as the owner of journal rows: host, pid and start time"""
+    pid = os.getpid()
+    # Looked up per pid, so a forked worker does not pass for its parent
+    if pid not in _owners:
+        _owners[pid] = f"{HOSTNAME}:{pid}:{_process_start(pid) or ''}"
+    return _owners[pid]
+
+def owner_is_dead(owner: Optional[str]) -> bool:
+    """True only if the process that wrote a journal row has certainly exited"""
+    if not owner:
+        # Written before rows recorded their owner
+        return True
+    host, pid, start = owner.rsplit(':', 2)
+    pid = int(pid)
+    # Processes on other hosts cannot be checked, and on Windows os.kill would terminate the process
+    if host != HOSTNAME or pid == os.getpid() or os.name == 'nt':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    # The pid is in use; by the owner unless it started at another time
+    current_start = _process_start(pid)
+    return bool(start) and current_start is not None and current_start != start
+
+def _finish_link_move(entry: Dict) -> bool:
+    """Complete a move that stopped with both names linked to the file; False if they are different files"""
+    try:
+        if not os.path.samefile(entry['source'], entry['destination']):
+            return False
+        os.unlink(entry['destination'] if entry['state'] == UNDO else entry['source'])
+    except OSError as e:
+        logger.error(f"Could not finish interrupted move of {entry['source']}: {e}")
+        return False
+    return True
+
+class MoveJournal:
+    """Append-only SQLite log of every move, for crash recovery and batch undo.
+
+    Each move appends a 'move' row that is committed before the file is
+    touched, then a 'moved' or 'failed' row. The latest row of an entry is
+    its state. Undo appends 'undo' rows for a whole batch in one transaction,
+    reverses the moves newest first, and records the outcomes in one more.
+    Every row records the process that wrote it, so recovery leaves alone
+    the moves of a process that is still running, such as the web app
+    while a CLI run starts.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(journal)')}
+        if 'owner' not in columns:
+            self._conn.execute('ALTER TABLE journal ADD COLUMN owner TEXT')
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def begin(self, batch_id: str, kind: str, source: str, destination: str) -> int:
+        """Durably record the intent to move source to destination; returns the entry id"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO journal (batch_id, kind, source, destination, action, at, owner) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (batch_id, kind, source, destination, MOVE, time.time(), current_owner()))
+            entry = cursor.lastrowid
+            self._conn.execute('UPDATE journal SET entry = ? WHERE seq = ?', (entry, entry))
+            self._conn.commit()
+            return entry
+
+    def finish(self, entry: int, error: Optional[str] = None) -> None:
+        """Record the outcome of a move started with begin"""
+        self._append([(entry, MOVED if error is None else FAILED, error)])
+
+    def _append(self, outcomes: List[Tuple[int, str, Optional[str]]]) -> None:
+        """Append (entry, action, error) rows, copying the entry's paths, in one transaction"""
+        if not outcomes:
+            return
+        now = time.time()
+        owner = current_owner()
+        with self._lock:
+            self._conn.executemany(APPEND_SQL, [(action, error, now, owner, entry) for entry, action, error in outcomes])
+            self._conn.commit()
+
+    def _latest(self, batch_id: Optional[str] = None, actions: Tuple[str, ...] = ()) -> List[Dict]:
+        """Current state of every entry, optionally of one batch or in some states, oldest first"""
+        batch_filter = 'WHERE batch_id = ?' if batch_id else ''
+        action_filter = f"WHERE j.action IN ({', '.join('?' * len(actions))})" if actions else ''
+        params = ((batch_id,) if batch_id else ()) + tuple(actions)
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT j.entry, j.batch_id, j.kind, j.source, j.destination, j.action, j.error, j.at, j.seq, j.owner
+                FROM (SELECT MAX(seq) AS seq FROM journal {batch_filter} GROUP BY entry) latest
+                JOIN journal j ON j.seq = latest.seq
+                {action_filter}
+                ORDER BY j.entry""", params).fetchall()
+        return [{'entry': r[0], 'batch_id': r[1], 'kind': r[2], 'source': r[3], 'destination': r[4],
+                 'state': r[5], 'error': r[6], 'at': r[7], 'seq': r[8], 'owner': r[9]} for r in rows]
+
+    def entries(self, batch_id: str) -> List[Dict]:
+        """Every move in a batch with its current state"""
+        return self._latest(batch_id=batch_id)
+
+    def batches(self, limit: int = 20) -> List[Dict]:
+        """Most recent batches with how many of their moves are in each state"""
+        with self._lock:
+            batch_ids = [row[0] for row in self._conn.execute(
+                'SELECT batch_id FROM journal GROUP BY batch_id ORDER BY MAX(seq) DESC LIMIT ?', (limit,))]
+        batches = []
+        for batch_id in batch_ids:
+            entries = self.entries(batch_id)
+            counts: Dict[str, int] = {}
+            for entry in entries:
+                if entry['kind'] == FILE:
+                    counts[entry['state']] = counts.get(entry['state'], 0) + 1
+            batches.append({
+                'batch_id': batch_id,
+                'files': sum(counts.values()),
+                'states': counts,
+                'started_at': min(e['at'] for e in entries),
+                'undoable': counts.get(MOVED, 0) > 0
+            })
+        return batches
+
+    def undo_batch(self, batch_id: str, move: MoveFunction) -> Dict[str, int]:
+        """Move everything in a batch back where it came from, newest move first.
+
+        Uses only the journal, so no library rescan is needed. Entries whose
+        destination is gone or whose source path is taken again are skipped
+        and reported as failed.
+        """
+        done = [e for e in self.entries(batch_id) if e['state'] == MOVED]
+        self._append([(e['entry'], UNDO, None) for e in done])
+
+        outcomes = []
+        for entry in reversed(done):
+            try:
+                if not os.path.exists(entry['destination']):
+                    raise FileNotFoundError(f"No longer at {entry['destination']}")
+                if os.path.exists(entry['source']):
+                    raise FileExistsError(f"Something else is now at {entry['source']}")
+                os.makedirs(os.path.dirname(entry['source']), exist_ok=True)
+                move(entry['destination'], entry['source'])
+                outcomes.append((entry['entry'], UNDONE, None))
+            except Exception as e:
+                logger.error(f"Could not undo move of {entry['source']}: {e}")
+                outcomes.append((entry['entry'], UNDO_FAILED, str(e)))
+        self._append(outcomes)
+
+        # Report movie files only; restored leftover folders are bookkeeping
+        files = {e['entry'] for e in done if e['kind'] == FILE}
+        undone = sum(1 for entry, action, _ in outcomes if entry in files and action == UNDONE)
+        logger.info(f"Undid batch {batch_id}: {undone} of {len(files)} moves reversed")
+        return {'undone': undone, 'failed': len(files) - undone}
+
+    def recover(self, move: Optional[MoveFunction] = None) -> Dict[str, int]:
+        """Settle moves and undos that were in flight when the process stopped.
+
+        The filesystem says how far each one got. Moves that never happened
+        are replayed with move (which resumes partial cross-device copies)
+        when given, otherwise recorded as failed. An undo that left the file
+        in both places or in neither is recorded as undo_failed, never as
+        a success. Only entries whose process
+        has exited are touched; they are claimed first, so two processes
+        recovering at once do not both replay them.
+        """
+        pending = self._latest(actions=(MOVE, UNDO))
+        orphaned = [entry for entry in pending if owner_is_dead(entry['owner'])]
+        if len(orphaned) < len(pending):
+            logger.info(f"Leaving {len(pending) - len(orphaned)} moves in flight in running processes alone")
+        outcomes = []
+        for entry in self._claim(orphaned):
+            source_exists = os.path.exists(entry['source'])
+            destination_exists = os.path.exists(entry['destination'])
+            if source_exists and destination_exists and _finish_link_move(entry):
+                # Stopped between linking the new name and unlinking the old one
+                outcomes.append((entry['entry'], UNDONE if entry['state'] == UNDO else MOVED, None))
+            elif entry['state'] == UNDO:
+                if source_exists and not destination_exists:
+                    outcomes.append((entry['entry'], UNDONE, None))
+                elif destination_exists and not source_exists:
+                    # Never moved back, so the move still stands and can be undone again
+                    outcomes.append((entry['entry'], MOVED, None))
+                else:
+                    # Both paths or neither: the file's whereabouts are unknown, so it is not moved
+                    outcomes.append((entry['entry'], UNDO_FAILED, 'Interrupted; file not found in one place'))
+            elif destination_exists and not source_exists:
+                outcomes.append((entry['entry'], MOVED, None))
+            elif source_exists and not destination_exists and move:
+                try:
+                    move(entry['source'], entry['destination'])
+                    outcomes.append((entry['entry'], MOVED, None))
+                except Exception as e:
+                    outcomes.append((entry['entry'], FAILED, f"Replay failed: {e}"))
+            else:
+                outcomes.append((entry['entry'], FAILED, 'Interrupted before completing'))
+        self._append(outcomes)
+
+        if outcomes:
+            logger.info(f"Recovered {len(outcomes)} interrupted moves from the journal")
+        return {action: sum(1 for _, a, _ in outcomes if a == action)
+                for action in (MOVED, UNDONE, FAILED, UNDO_FAILED)}
+
+    def _claim(self, entries: List[Dict]) -> List[Dict]:
+        """Take over pending entries from exited processes; returns those no one else changed meanwhile"""
+        owner = current_owner()
+        now = time.time()
+        claimed = []
+        with self._lock:
+            # An immediate transaction holds the write lock while checking, so claims cannot interleave
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for entry in entries:
+                    latest = self._conn.execute('SELECT MAX(seq) FROM journal WHERE entry = ?',
+                                                (entry['entry'],)).fetchone()[0]
+                    if latest == entry['seq']:
+                        self._conn.execute(APPEND_SQL, (entry['state'], None, now, owner, entry['seq']))
+                        claimed.append(entry)
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return claimed
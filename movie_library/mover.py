@@ -0,0 +1,166 @@
+import logging
+import os
+import shutil
+from concurrent.futures import Executor, as_completed
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+from .file_transfer import move_file
+from .move_journal import DIRECTORY, FILE, MoveJournal
+from .scanner import MOVIE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MOVE_WORKERS = 8
+# Leftover folders go here instead of being deleted when moves are journaled,
+# so undo can bring back their .nfo/.srt files; the scanner already skips it
+RECYCLE_FOLDER = '#recycle'
+
+def ensure_genre_folder(base_folder, genre):
+    """Create genre folder if it doesn't exist"""
+    genre_folder = Path(base_folder) / genre
+    if not genre_folder.exists():
+        genre_folder.mkdir(parents=True, exist_ok=True)
+    return str(genre_folder)
+
+def has_movies_or_subdirs(directory: Path) -> bool:
+    """Check if directory contains any movie files or subdirectories"""
+    try:
+        for item in directory.iterdir():
+            if item.is_dir():
+                return True  # Has subdirectory
+            if item.is_file() and item.suffix.lower() in MOVIE_EXTENSIONS:
+                return True  # Has movie file
+        return False
+    except Exception as e:
+        logger.error(f"Error checking directory {directory}: {e}", exc_info=True)
+        return True  # Assume it has content if we can't check
+
+def remove_leftover_directory(directory: Path, base_folder: Optional[Path] = None,
+                              journal: Optional[MoveJournal] = None, batch_id: Optional[str] = None) -> None:
+    """Clear out a movie's old folder once nothing but sidecar files are left in it.
+
+    With a journal the folder is moved into base_folder/#recycle and the move
+    recorded, so undoing the batch restores it; without one it is deleted.
+    """
+    if not directory.exists() or has_movies_or_subdirs(directory):
+        return
+    try:
+        if journal is None or base_folder is None:
+            logger.info(f"Removing directory and contents: {directory}")
+            shutil.rmtree(str(directory))
+            return
+
+        recycled = base_folder / RECYCLE_FOLDER / directory.relative_to(base_folder)
+        if recycled.exists():
+            recycled = recycled.with_name(f"{recycled.name} ({batch_id})")
+        recycled.parent.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Moving leftover directory {directory} to {recycled}")
+        entry = journal.begin(batch_id, DIRECTORY, str(directory), str(recycled))
+        try:
+            os.rename(directory, recycled)
+        except OSError as e:
+            journal.finish(entry, str(e))
+            raise
+        journal.finish(entry)
+    except Exception as e:
+        logger.error(f"Error removing directory {directory}: {e}", exc_info=True)
+
+def move_movie_file(src_path, dest_folder, cleanup_source: bool = True,
+                    journal: Optional[MoveJournal] = None, batch_id: Optional[str] = None):
+    """Move a movie file to destination folder and clean up empty source directory"""
+    # Convert relative path to absolute path if needed
+    src = Path(src_path)
+    if not src.is_absolute():
+        # Get the base folder from the path components before the movie file
+        # e.g., "Evil.Dead.Rise.2023.../movie.mkv" -> need to prepend base folder
+        base_folder = Path(dest_folder).parent
+        src = base_folder / src
+
+    src_dir = src.parent
+    dest = Path(dest_folder) / src.name
+
+    logger.info(f"Moving movie from '{src}' to '{dest}'")
+
+    # Ensure source file exists
+    if not src.exists():
+        raise FileNotFoundError(f"Source file not found: {src}")
+    if dest.exists() and dest != src:
+        raise FileExistsError(f"Destination already exists: {dest}")
+
+    # Rename on the same device, resumable copy across devices
+    if journal:
+        entry = journal.begin(batch_id, FILE, str(src), str(dest))
+        try:
+            move_file(str(src), str(dest))
+        except Exception as e:
+            journal.finish(entry, str(e))
+            raise
+        journal.finish(entry)
+    else:
+        move_file(str(src), str(dest))
+
+    # Check if source directory should be cleaned up
+    if cleanup_source and src_dir != Path(dest_folder) and src_dir != Path(dest_folder).parent:
+        remove_leftover_directory(src_dir, Path(dest_folder).parent, journal, batch_id)
+
+    return dest
+
+def execute_move_plan(base_folder: str, plan: List[Dict], executor: Executor,
+                      journal: Optional[MoveJournal] = None, batch_id: Optional[str] = None) -> Iterator[Dict]:
+    """Move every movie in plan, yielding one result per item as it finishes.
+
+    Each plan item has a movie_path relative to base_folder and a target
+    genre. Genre folders are created once up front, moves run concurrently
+    on executor, and emptied source folders are removed after all moves,
+    so two movies leaving the same folder never race over deleting it.
+    """
+    base = Path(base_folder)
+    seen_sources: Set[str] = set()
+    seen_destinations: Set[Path] = set()
+    genre_folders: Dict[str, str] = {}
+    futures = {}
+
+    for index, item in enumerate(plan):
+        movie_path = item.get('movie_path')
+        genre = item.get('genre')
+        result = {'index': index, 'movie_path': movie_path, 'genre': genre}
+        if not movie_path or not genre:
+            yield dict(result, success=False, error='movie_path and genre are required')
+            continue
+        if movie_path in seen_sources:
+            yield dict(result, success=False, error='Duplicate entry in move plan')
+            continue
+        seen_sources.add(movie_path)
+
+        try:
+            if genre not in genre_folders:
+                genre_folders[genre] = ensure_genre_folder(base_folder, genre)
+        except OSError as e:
+            yield dict(result, success=False, error=str(e))
+            continue
+
+        destination = Path(genre_folders[genre]) / os.path.basename(movie_path)
+        if destination in seen_destinations:
+            yield dict(result, success=False, error=f'Another movie in the plan is also moving to {destination}')
+            continue
+        seen_destinations.add(destination)
+
+        future = executor.submit(move_movie_file, base / movie_path, genre_folders[genre], False, journal, batch_id)
+        futures[future] = result
+
+    moved_from: Set[Path] = set()
+    for future in as_completed(futures):
+        result = futures[future]
+        try:
+            new_path = future.result()
+        except Exception as e:
+            logger.error(f"Error moving {result['movie_path']}: {e}")
+            yield dict(result, success=False, error=str(e))
+            continue
+        moved_from.add((base / result['movie_path']).parent)
+        yield dict(result, success=True, new_path=str(new_path))
+
+    genre_paths = {Path(folder) for folder in genre_folders.values()}
+    for directory in moved_from:
+        if directory != base and directory not in genre_paths:
+            remove_leftover_directory(directory, base, journal, batch_id)
@@ -0,0 +1,117 @@
+import os
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MOVIE_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov')
+DEFAULT_SCAN_WORKERS = 8
+
+ScannedFile = namedtuple('ScannedFile', ['path', 'relative_path', 'name', 'size', 'mtime_ns', 'inode', 'device'])
+
+class DirectoryListing:
+    """Result of visiting one directory during a scan"""
+    __slots__ = ('path', 'mtime_ns', 'changed', 'files', 'subdirs')
+
+    def __init__(self, path: str, mtime_ns: Optional[int], changed: bool,
+                 files: List[ScannedFile], subdirs: List[str]):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.changed = changed
+        self.files = files
+        self.subdirs = subdirs
+
+def is_recycle_path(path: str) -> bool:
+    """Check if a path is inside a #recycle folder"""
+    return '#recycle' in path.lower()
+
+def _visit_directory(directory: str, prefix_len: int,
+                     known_mtimes: Optional[Dict[str, int]],
+                     known_children: Optional[Dict[str, List[str]]]) -> Optional[DirectoryListing]:
+    """Stat a directory and list it unless its mtime matches what we already know"""
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError as e:
+        logger.warning(f"Cannot stat directory {directory}: {e}")
+        return None
+
+    if known_mtimes is not None and known_mtimes.get(directory) == mtime_ns:
+        return DirectoryListing(directory, mtime_ns, False, [], list(known_children.get(directory, [])))
+
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    # is_dir() and is_symlink() use the d_type cached on the entry
+                    if entry.is_dir():
+                        # Prune #recycle subtrees before descending into them
+                        if not entry.is_symlink() and '#recycle' not in entry.name.lower():
+                            subdirs.append(entry.path)
+                    elif entry.name.lower().endswith(MOVIE_EXTENSIONS):
+                        st = entry.stat()
+                        files.append(ScannedFile(
+                            entry.path,
+                            entry.path[prefix_len:],
+                            entry.name,
+                            st.st_size,
+                            st.st_mtime_ns,
+                            st.st_ino,
+                            st.st_dev,
+                        ))
+                except OSError as e:
+                    logger.warning(f"Cannot stat {entry.path}: {e}")
+    except OSError as e:
+        logger.warning(f"Cannot list directory {directory}: {e}")
+
+    subdirs.sort()
+    files.sort(key=lambda f: f.name)
+    return DirectoryListing(directory, mtime_ns, True, files, subdirs)
+
+def scan_directories(root: str, max_workers: int = DEFAULT_SCAN_WORKERS,
+                     known_mtimes: Optional[Dict[str, int]] = None,
+                     known_children: Optional[Dict[str, List[str]]] = None,
+                     start: Optional[List[str]] = None) -> Iterator[DirectoryListing]:
+    """Walk root with directory listings fanned out over a bounded thread pool.
+
+    As soon as a directory has been listed its subdirectories are queued on
+    the pool, so many listings are in flight at once, but listings are still
+    yielded in a stable depth-first order.
+
+    When known_mtimes/known_children are given, directories whose mtime is
+    unchanged are not listed again; their listing comes back with
+    changed=False and the known subdirectories.
+
+    start limits the walk to those subtrees of root; relative paths are
+    still relative to root.
+    """
+    if is_recycle_path(root):
+        return
+    if known_mtimes is not None and known_children is None:
+        known_children = {}
+
+    prefix_len = len(os.path.join(root, ''))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan') as executor:
+        def submit(directory):
+            return executor.submit(_visit_directory, directory, prefix_len, known_mtimes, known_children)
+
+        stack = [submit(directory) for directory in reversed(start or [root])]
+        try:
+            while stack:
+                listing = stack.pop().result()
+                if listing is None:
+                    continue
+                # Queue children first so they are listed while the caller consumes this one
+                stack.extend(reversed([submit(subdir) for subdir in listing.subdirs]))
+                yield listing
+        finally:
+            for future in stack:
+                future.cancel()
+
+def scan_movie_files(root: str, max_workers: int = DEFAULT_SCAN_WORKERS) -> Iterator[ScannedFile]:
+    """Stream every movie file under root, in directory order"""
+    for listing in scan_directories(root, max_workers=max_workers):
+        yield from listing.files
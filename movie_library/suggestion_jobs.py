@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional
+from genre_suggester.base_suggester import GenreSuggestion
+from genre_suggester.pipeline_suggester import SuggestionBudget
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 20
+# Finished jobs stay listed this long so the page can show their outcome
+DEFAULT_JOB_TTL = 3600
+
+class SuggestionJob:
+    """Progress of one bulk suggestion run over a movie folder"""
+
+    def __init__(self, folder: str, movie_paths: List[str], budget: Optional[float] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.folder = folder
+        self.movie_paths = movie_paths
+        self.total = len(movie_paths)
+        self.completed = 0
+        self.suggested = 0
+        self.failed = 0
+        self.state = 'queued'
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        self.pending_batches = 0
+        # Spend and per-tier counts of this job's suggestions, capped at budget dollars if given
+        self.budget = SuggestionBudget(budget)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'folder': self.folder,
+            'state': self.state,
+            'total': self.total,
+            'completed': self.completed,
+            'suggested': self.suggested,
+            'failed': self.failed,
+            'progress': self.completed / self.total if self.total else 1.0,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'spend': self.budget.to_dict()
+        }
+
+class SuggestionJobRunner:
+    """Runs bulk genre suggestion jobs on a shared worker pool.
+
+    Movies are suggested in batches; each batch is one call to suggest_batch
+    (which can pack several titles into one API request). Rate limits are
+    the suggesters' business, so batches answered locally are not held
+    back. Every batch of a job draws on the job's SuggestionBudget, which
+    holds at most budget dollars of paid calls. Every result is handed to
+    store_result so it survives after the job is gone; finished jobs are
+    forgotten job_ttl seconds after they end.
+    """
+
+    def __init__(self, executor: Executor,
+                 suggest_batch: Callable[[str, List[str], SuggestionBudget], List[GenreSuggestion]],
+                 store_result: Callable[[str, str, GenreSuggestion], None],
+                 batch_size: int = DEFAULT_BATCH_SIZE, budget: Optional[float] = None,
+                 job_ttl: float = DEFAULT_JOB_TTL):
+        self.executor = executor
+        self.suggest_batch = suggest_batch
+        self.store_result = store_result
+        self.batch_size = batch_size
+        self.budget = budget
+        self.job_ttl = job_ttl
+        self._jobs: Dict[str, SuggestionJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, folder: str, movie_paths: List[str]) -> SuggestionJob:
+        """Queue suggestions for every movie path and return the job tracking them"""
+        job = SuggestionJob(folder, movie_paths, self.budget)
+        batches = [movie_paths[i:i + self.batch_size] for i in range(0, len(movie_paths), self.batch_size)]
+        with self._lock:
+            self._evict_finished()
+            self._jobs[job.id] = job
+            job.pending_batches = len(batches)
+            if not batches:
+                job.state = 'completed'
+                job.finished_at = time.time()
+
+        logger.info(f"Starting suggestion job {job.id} for {job.total} movies in {folder}")
+        for batch in batches:
+            self.executor.submit(self._run_batch, job, batch)
+        return job
+
+    def get(self, job_id: str) -> Optional[SuggestionJob]:
+        with self._lock:
+            self._evict_finished()
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[SuggestionJob]:
+        with self._lock:
+            self._evict_finished()
+            return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[SuggestionJob]:
+        """Stop a job; batches already running finish, queued ones are skipped"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job.state in ('queued', 'running'):
+                job.cancel_requested = True
+                job.state = 'cancelling'
+            return job
+
+    def _evict_finished(self) -> None:
+        """Drop jobs that finished more than job_ttl seconds ago; call with the lock held"""
+        cutoff = time.time() - self.job_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run_batch(self, job: SuggestionJob, movie_paths: List[str]) -> None:
+        try:
+            if job.cancel_requested:
+                return
+            with self._lock:
+                if job.state == 'queued':
+                    job.state = 'running'
+
+            try:
+                suggestions = self.suggest_batch(job.folder, movie_paths, job.budget)
+            except Exception as e:
+                logger.error(f"Suggestion job {job.id} batch failed: {e}", exc_info=True)
+                suggestions = [GenreSuggestion(genre=None, confidence="Low", status="error", message=str(e))
+                               for _ in movie_paths]
+
+            for movie_path, suggestion in zip(movie_paths, suggestions):
+                try:
+                    self.store_result(job.folder, movie_path, suggestion)
+                except Exception as e:
+                    logger.error(f"Failed to store suggestion for {movie_path}: {e}", exc_info=True)
+                with self._lock:
+                    job.completed += 1
+                    if suggestion.status == 'success' and suggestion.genre:
+                        job.suggested += 1
+                    elif suggestion.status == 'error':
+                        job.failed += 1
+        finally:
+            with self._lock:
+                job.pending_batches -= 1
+                if job.pending_batches == 0:
+                    job.state = 'cancelled' if job.cancel_requested else 'completed'
+                    job.finished_at = time.time()
+                    logger.info(f"Suggestion job {job.id} {job.state}: {job.completed}/{job.total} processed, "
+                                f"${job.budget.spent:.4f} spent")
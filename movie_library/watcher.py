@@ -0,0 +1,207 @@
+import logging
+import os
+import queue
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Set
+from .index import LibraryIndex
+from .scanner import MOVIE_EXTENSIONS, is_recycle_path
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog is optional; polling works everywhere
+    FileSystemEventHandler = object
+    Observer = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 30.0
+DEFAULT_DEBOUNCE = 1.0
+WATCH_MODES = ('auto', 'inotify', 'poll')
+# Filesystems where inotify sees only local changes, if any; auto mode polls roots on them
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'afs', '9p', 'ceph', 'glusterfs',
+                       'fuse.sshfs', 'fuse.rclone', 'davfs', 'fuse.davfs2'}
+MOUNTS_FILE = '/proc/mounts'
+
+ChangesCallback = Callable[[str, Dict[str, list]], None]
+
+def filesystem_type(path: str) -> Optional[str]:
+    """Type of the filesystem path is on, from the mount table (Linux only; None elsewhere)"""
+    try:
+        with open(MOUNTS_FILE) as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, best_type = '', None
+    for mount_point, fs_type in mounts:
+        # Spaces and other odd characters come octal-escaped, e.g. \040
+        mount_point = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), mount_point)
+        if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) >= len(best):
+            best, best_type = mount_point, fs_type
+    return best_type
+
+class ChangeBroadcaster:
+    """Fans library change events out to every connected listener (e.g. SSE streams)"""
+
+    def __init__(self, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._subscribers: Set[queue.Queue] = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue(self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: Dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A listener that stopped reading should not hold up the others
+                logger.warning("Dropping library event for a slow listener")
+
+class _EventCollector(FileSystemEventHandler):
+    """Records which directories under a root saw movie file or folder events"""
+
+    def __init__(self, watcher: 'LibraryWatcher', root: str):
+        self.watcher = watcher
+        self.root = root
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed', 'closed_no_write'):
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if not path or is_recycle_path(path):
+                continue
+            if event.is_directory:
+                self.watcher.mark_changed(self.root, path)
+            elif path.lower().endswith(MOVIE_EXTENSIONS):
+                self.watcher.mark_changed(self.root, os.path.dirname(path))
+
+class LibraryWatcher:
+    """Keeps the library index current from filesystem events and reports what changed.
+
+    In inotify mode (watchdog's native observer) events are collected and
+    the affected directories re-listed after a short debounce. In poll mode,
+    for network mounts where no events arrive, every root is refreshed
+    incrementally every poll_interval seconds. In inotify mode, roots that
+    cannot be watched are polled instead, as are roots on network
+    filesystems when the mode was chosen automatically. Either way,
+    on_changes gets (root, {'added': [...], 'removed': [...]}) whenever
+    movies appear or go.
+    """
+
+    def __init__(self, index: LibraryIndex, get_roots: Callable[[], List[str]], on_changes: ChangesCallback,
+                 mode: str = 'auto', poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 debounce: float = DEFAULT_DEBOUNCE):
+        if mode not in WATCH_MODES:
+            raise ValueError(f"Unknown watch mode: {mode}")
+        if mode == 'inotify' and Observer is None:
+            raise ValueError("inotify watch mode needs the watchdog package")
+        self.index = index
+        self.get_roots = get_roots
+        self.on_changes = on_changes
+        self.mode = 'inotify' if mode == 'auto' and Observer is not None else ('poll' if mode == 'auto' else mode)
+        self.poll_network_roots = mode == 'auto'
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._pending: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._watches: Dict[str, object] = {}
+        # Roots polled in inotify mode because watching them fails or would miss changes
+        self._polled: Set[str] = set()
+
+    def start(self) -> None:
+        """Start watching in a background thread"""
+        if self._thread:
+            return
+        if self.mode == 'inotify':
+            self._observer = Observer()
+            self._observer.daemon = True
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name='library-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"Library watcher started in {self.mode} mode")
+
+    def stop(self) -> None:
+        """Stop watching and wait for the background threads"""
+        self._stop.set()
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def mark_changed(self, root: str, directory: str) -> None:
+        """Queue a directory to be re-listed at the next flush"""
+        with self._lock:
+            self._pending.setdefault(root, set()).add(directory)
+
+    def _sync_watches(self, roots: List[str]) -> None:
+        for root in set(self._watches) - set(roots):
+            self._observer.unschedule(self._watches.pop(root))
+        self._polled &= set(roots)
+        for root in set(roots) - set(self._watches) - self._polled:
+            if not os.path.isdir(root):
+                continue
+            if self.poll_network_roots and filesystem_type(root) in NETWORK_FILESYSTEMS:
+                logger.info(f"{root} is on a network filesystem; polling it every {self.poll_interval:g}s")
+                self._polled.add(root)
+                continue
+            try:
+                self._watches[root] = self._observer.schedule(_EventCollector(self, root), root, recursive=True)
+            except OSError as e:
+                logger.warning(f"Cannot watch {root} ({e}); polling it every {self.poll_interval:g}s")
+                self._polled.add(root)
+
+    def _flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for root, directories in pending.items():
+            self._apply(root, directories)
+
+    def _apply(self, root: str, directories: Optional[Set[str]] = None) -> None:
+        try:
+            changes = self.index.apply_changes(root, directories)
+        except Exception as e:
+            logger.error(f"Error applying library changes under {root}: {e}", exc_info=True)
+            return
+        if changes['added'] or changes['removed']:
+            logger.info(f"Library changed under {root}: {len(changes['added'])} added, "
+                        f"{len(changes['removed'])} removed")
+            self.on_changes(root, changes)
+
+    def _run(self) -> None:
+        next_poll = 0.0
+        while not self._stop.wait(self.debounce):
+            roots = list(self.get_roots())
+            if self.mode == 'inotify':
+                self._sync_watches(roots)
+                self._flush()
+                roots = [root for root in roots if root in self._polled]
+
+            next_poll -= self.debounce
+            if next_poll <= 0:
+                next_poll = self.poll_interval
+                for root in roots:
+                    if os.path.isdir(root):
+                        self._apply(root)
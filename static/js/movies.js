@@ -14,36 +14,293 @@ window.handleFolderChange = function(event) {
     window.location.href = `?selected_folder=${encodeURIComponent(event.target.value)}`;
 }
 
+// Server-side paging state for the movies table
+const SORT_KEYS = ['title', 'genre'];
+// selectedFolder value of the view that merges every configured movie folder
+const ALL_LIBRARIES = '__all__';
+
+window.movieListState = {
+    selectedFolder: null,
+    sort: 'title',
+    order: 'asc',
+    genre: '',
+    uncategorized: false,
+    search: '',
+    page: 1,
+    perPage: 100,
+    // Sort key of the last loaded movie; the server continues the listing after it
+    cursor: null,
+    total: 0,
+    loaded: 0,
+    hasMore: false,
+    loading: false,
+    requestId: 0
+};
+
+window.initializeMovieList = function(initialState) {
+    Object.assign(movieListState, { cursor: null }, initialState);
+    movieListState.hasMore = movieListState.cursor !== null;
+    updateMovieCount();
+}
+
+window.escapeHtml = function(value) {
+    return String(value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+window.buildMoviesQuery = function(state, page) {
+    const params = new URLSearchParams({
+        selected_folder: state.selectedFolder || '',
+        page: page,
+        per_page: state.perPage,
+        sort: state.sort,
+        order: state.order
+    });
+    if (state.genre) params.set('genre', state.genre);
+    if (state.uncategorized) params.set('uncategorized', '1');
+    if (state.search) params.set('q', state.search);
+    if (state.cursor) params.set('after', JSON.stringify(state.cursor));
+    return params.toString();
+}
+
+window.createMovieRow = function(movie, index) {
+    const baseFolder = movie.base_folder;
+    const row = document.createElement('tr');
+    row.dataset.path = movie.path;
+    row.dataset.baseFolder = baseFolder;
+    row.innerHTML = `
+        <td class="movie-title">
+            <div class="d-flex align-items-center">
+                <span class="me-2">${escapeHtml(movie.title)}</span>
+                <button type="button"
+                    class="btn btn-link btn-sm p-0 info-button"
+                    data-bs-toggle="tooltip"
+                    data-bs-placement="right"
+                    data-bs-title="${escapeHtml(movie.path)}"
+                    aria-label="Show file path">
+                    <i class="bi bi-info-circle"></i>
+                </button>
+            </div>
+        </td>
+        <td class="current-genre" id="current-genre-${index}">${escapeHtml(movie.current_genre)}</td>
+        <td class="suggestion-cell" id="suggestion-${index}">
+            <div class="d-flex align-items-center suggestion-container" style="width: 100%; overflow: hidden;">
+                <button type="button"
+                    class="btn btn-outline-primary btn-sm suggestion-button"
+                    data-path="${escapeHtml(movie.path)}"
+                    data-base-folder="${escapeHtml(baseFolder)}">
+                    <span class="button-text">Get Suggestion</span>
+                    <div class="spinner-border spinner-border-sm d-none" role="status">
+                        <span class="visually-hidden">Loading...</span>
+                    </div>
+                    <span class="retry-text d-none">Try again</span>
+                </button>
+            </div>
+        </td>
+        <td class="actions-cell text-end" id="actions-${index}"></td>`;
+
+    if (movie.suggested_genre) {
+        renderSuggestion(row.querySelector('.suggestion-container'), movie.path, baseFolder, movie.suggested_genre);
+        if (typeof configuredGenres !== 'undefined' && configuredGenres.includes(movie.suggested_genre)) {
+            updateMoveAction(row, movie.path, baseFolder, movie.suggested_genre);
+        }
+    } else {
+        row.querySelector('.suggestion-button').addEventListener('click', function() {
+            getGenreSuggestion(this);
+        });
+    }
+    if (typeof bootstrap !== 'undefined') {
+        new bootstrap.Tooltip(row.querySelector('.info-button'), {
+            trigger: 'click',
+            html: true
+        });
+    }
+    return row;
+}
+
+window.updateMovieCount = function() {
+    const counter = document.getElementById('movieCount');
+    if (counter) {
+        counter.textContent = `Showing ${movieListState.loaded} of ${movieListState.total} movies`;
+    }
+    const spinner = document.getElementById('moviesLoading');
+    if (spinner) {
+        spinner.classList.toggle('d-none', !movieListState.loading);
+    }
+}
+
+window.loadMoreMovies = async function() {
+    const state = movieListState;
+    if (state.loading || !state.hasMore) return;
+
+    const requestId = state.requestId;
+    const nextPage = Math.floor(state.loaded / state.perPage) + 1;
+    state.loading = true;
+    updateMovieCount();
+
+    try {
+        const response = await fetch(`/api/movies?${buildMoviesQuery(state, nextPage)}`);
+        if (!response.ok) {
+            throw new Error(`Server error: ${response.status}`);
+        }
+        const data = await response.json();
+
+        // Ignore pages for a sort or filter that has since been replaced
+        if (requestId !== state.requestId) return;
+
+        const tbody = document.querySelector('#moviesTable tbody') || document.querySelector('tbody');
+        const fragment = document.createDocumentFragment();
+        data.movies.forEach((movie, offset) => {
+            // Rows pushed live by the library watcher may come round again in a later page
+            if (!findMovieRow(movie.path, mergedFolder(state, movie.base_folder))) {
+                fragment.appendChild(createMovieRow(movie, state.loaded + offset + 1));
+            }
+        });
+        tbody.appendChild(fragment);
+
+        state.loaded += data.movies.length;
+        state.total = data.total;
+        state.cursor = data.next_cursor;
+        state.hasMore = data.has_more;
+    } catch (error) {
+        console.error('Error loading movies:', error);
+    } finally {
+        if (requestId === state.requestId) {
+            state.loading = false;
+            updateMovieCount();
+        }
+    }
+}
+
+// Paths are relative to their movie folder, so only the merged view needs the folder to tell rows apart
+window.mergedFolder = function(state, baseFolder) {
+    return state.selectedFolder === ALL_LIBRARIES ? baseFolder : null;
+}
+
+window.findMovieRow = function(moviePath, baseFolder) {
+    const escape = value => typeof CSS !== 'undefined' ? CSS.escape(value) : value;
+    const folderSelector = baseFolder ? `[data-base-folder="${escape(baseFolder)}"]` : '';
+    return document.querySelector(`tr[data-path="${escape(moviePath)}"]${folderSelector}`);
+}
+
+window.movieMatchesFilters = function(movie, state) {
+    const genre = state.uncategorized ? 'Uncategorized' : state.genre;
+    if (genre && movie.current_genre !== genre) return false;
+    if (state.search) {
+        const needle = state.search.toLowerCase();
+        return movie.title.toLowerCase().includes(needle) || movie.path.toLowerCase().includes(needle);
+    }
+    return true;
+}
+
+// Apply movies added or removed on disk, as pushed by the server's library watcher
+window.applyLibraryChanges = function(changes) {
+    const state = movieListState;
+    if (state.selectedFolder !== ALL_LIBRARIES && changes.root !== state.selectedFolder) return;
+
+    changes.removed.forEach(moviePath => {
+        const row = findMovieRow(moviePath, mergedFolder(state, changes.root));
+        if (row) {
+            row.remove();
+            // Keep the next page's offset in step with the server
+            state.loaded = Math.max(0, state.loaded - 1);
+        }
+        state.total = Math.max(0, state.total - 1);
+    });
+
+    const tbody = document.querySelector('#moviesTable tbody') || document.querySelector('tbody');
+    changes.added.forEach(movie => {
+        state.total++;
+        if (findMovieRow(movie.path, mergedFolder(state, movie.base_folder)) || !movieMatchesFilters(movie, state)) return;
+        const row = createMovieRow(movie, `live-${state.total}`);
+        row.classList.add('table-success');
+        tbody.insertBefore(row, tbody.firstChild);
+    });
+    updateMovieCount();
+}
+
+window.connectLibraryEvents = function() {
+    if (typeof EventSource === 'undefined' || !movieListState.selectedFolder) return null;
+    const source = new EventSource(`/events?selected_folder=${encodeURIComponent(movieListState.selectedFolder)}`);
+    source.addEventListener('library', event => applyLibraryChanges(JSON.parse(event.data)));
+    return source;
+}
+
+window.reloadMovies = function() {
+    const tbody = document.querySelector('#moviesTable tbody') || document.querySelector('tbody');
+    tbody.innerHTML = '';
+    movieListState.requestId++;
+    movieListState.loading = false;
+    movieListState.loaded = 0;
+    movieListState.cursor = null;
+    movieListState.hasMore = true;
+    return loadMoreMovies();
+}
+
+window.applyMovieFilters = function() {
+    const search = document.getElementById('movieSearch');
+    const genre = document.getElementById('genreFilter');
+    const uncategorized = document.getElementById('uncategorizedOnly');
+
+    movieListState.search = search ? search.value.trim() : '';
+    movieListState.genre = genre ? genre.value : '';
+    movieListState.uncategorized = uncategorized ? uncategorized.checked : false;
+    return reloadMovies();
+}
+
+let filterTimer = null;
+window.handleSearchInput = function() {
+    clearTimeout(filterTimer);
+    filterTimer = setTimeout(applyMovieFilters, 300);
+}
+
+window.setupLazyLoading = function() {
+    const sentinel = document.getElementById('moviesSentinel');
+    if (!sentinel || typeof IntersectionObserver === 'undefined') return;
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadMoreMovies();
+        }
+    }, { rootMargin: '600px' });
+    observer.observe(sentinel);
+}
+
+window.updateSortIndicators = function() {
+    document.querySelectorAll('#moviesTable th.sortable').forEach((header, index) => {
+        header.classList.remove('asc', 'desc');
+        if (SORT_KEYS[index] === movieListState.sort) {
+            header.classList.add(movieListState.order);
+        }
+    });
+}
+
 window.sortTable = function(columnIndex) {
-    const table = document.querySelector('table');
-    const tbody = table.querySelector('tbody');
-    const rows = Array.from(tbody.querySelectorAll('tr'));
-    
+    const tbody = document.querySelector('#moviesTable tbody') || document.querySelector('tbody');
+
     // Get current sort direction
     const currentDirection = tbody.getAttribute('data-sort-direction') === 'asc' ? 1 : -1;
     const currentColumn = parseInt(tbody.getAttribute('data-sort-column'));
-    
+
     // Determine new sort direction
     const newDirection = (columnIndex === currentColumn) ? -currentDirection : 1;
-    
-    // Sort the rows
-    rows.sort((a, b) => {
-        const aValue = a.children[columnIndex].textContent.trim();
-        const bValue = b.children[columnIndex].textContent.trim();
-        
-        if (aValue === bValue) return 0;
-        return aValue > bValue ? newDirection : -newDirection;
-    });
-    
-    // Update the table
-    rows.forEach(row => tbody.appendChild(row));
-    
+
     // Update sort indicators
     tbody.setAttribute('data-sort-direction', newDirection === 1 ? 'asc' : 'desc');
     tbody.setAttribute('data-sort-column', columnIndex);
-    
+
     // Save sort state
     saveTableState();
+
+    // Sorting happens on the server, so reload from the first page
+    movieListState.sort = SORT_KEYS[columnIndex] || 'title';
+    movieListState.order = newDirection === 1 ? 'asc' : 'desc';
+    updateSortIndicators();
+    return reloadMovies();
 }
 
 // Save table sort state
@@ -61,11 +318,20 @@ window.restoreTableState = function() {
     const savedState = localStorage.getItem('tableSortState');
     if (savedState) {
         const state = JSON.parse(savedState);
+        const column = parseInt(state.column);
+        const direction = state.direction === 'desc' ? 'desc' : 'asc';
         const tbody = document.querySelector('tbody');
-        tbody.setAttribute('data-sort-column', state.column);
-        tbody.setAttribute('data-sort-direction', state.direction);
-        sortTable(parseInt(state.column));
+        tbody.setAttribute('data-sort-column', column);
+        tbody.setAttribute('data-sort-direction', direction);
+
+        const sort = SORT_KEYS[column] || 'title';
+        if (sort !== movieListState.sort || direction !== movieListState.order) {
+            movieListState.sort = sort;
+            movieListState.order = direction;
+            reloadMovies();
+        }
     }
+    updateSortIndicators();
 }
 
 window.moveMovie = async function(moviePath, baseFolder, genre) {
@@ -89,7 +355,7 @@ window.moveMovie = async function(moviePath, baseFolder, genre) {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
-                path: moviePath,
+                movie_path: moviePath,
                 base_folder: baseFolder,
                 genre: genre
             })
@@ -213,6 +479,59 @@ window.handleGenreSelection = async function(event, moviePath, baseFolder, genre
     }
 }
 
+window.renderSuggestion = function(container, path, baseFolder, genre) {
+    // Update genre text and create dropdown
+    container.innerHTML = `
+        <span class="me-2 text-truncate">${genre}</span>
+        <div class="dropdown">
+            <button type="button" class="btn btn-link btn-sm p-0 edit-suggestion-button" data-bs-toggle="dropdown">
+                <i class="bi bi-pencil-square"></i>
+            </button>
+            <ul class="dropdown-menu p-2" style="min-width: 200px;" data-bs-popper="static">
+                <li>
+                    <button class="dropdown-item" onclick="handleGenreSelection(event, '${path}', '${baseFolder}', '${genre}', 'add')">
+                        Add "${genre}" as new genre
+                    </button>
+                </li>
+                <li>
+                    <button class="dropdown-item" onclick="handleGenreSelection(event, '${path}', '${baseFolder}', '', 'custom')">
+                        Add custom genre...
+                    </button>
+                </li>
+                <li><hr class="dropdown-divider"></li>
+                <li><h6 class="dropdown-header">Existing Genres</h6></li>
+                ${configuredGenres.map(genre => `
+                    <li>
+                        <button class="dropdown-item" onclick="handleGenreSelection(event, '${path}', '${baseFolder}', '${genre}', 'select')">
+                            ${genre}
+                        </button>
+                    </li>
+                `).join('')}
+            </ul>
+        </div>`;
+}
+
+window.updateMoveAction = function(row, path, baseFolder, genre) {
+    // Get the current genre and update action cell if different
+    const currentGenreCell = row.querySelector('.current-genre');
+    if (!currentGenreCell) {
+        throw new Error('Could not find current genre cell');
+    }
+    
+    const currentGenre = currentGenreCell.textContent.trim();
+    if (currentGenre.toLowerCase() !== genre.toLowerCase()) {
+        const actionCell = row.querySelector('.actions-cell');
+        if (!actionCell) {
+            throw new Error('Could not find action cell');
+        }
+
+        // Clear the action cell and append the new move button
+        actionCell.innerHTML = '';
+        const moveButton = createMoveButton(path, baseFolder, genre);
+        actionCell.appendChild(moveButton);
+    }
+}
+
 window.getGenreSuggestion = async function(button) {
     const cell = button.closest('.suggestion-cell');
     if (!cell) {
@@ -270,54 +589,8 @@ window.getGenreSuggestion = async function(button) {
             throw new Error(data.error);
         }
 
-        // Update genre text and create dropdown
-        container.innerHTML = `
-            <span class="me-2 text-truncate">${data.genre}</span>
-            <div class="dropdown">
-                <button type="button" class="btn btn-link btn-sm p-0 edit-suggestion-button" data-bs-toggle="dropdown">
-                    <i class="bi bi-pencil-square"></i>
-                </button>
-                <ul class="dropdown-menu p-2" style="min-width: 200px;" data-bs-popper="static">
-                    <li>
-                        <button class="dropdown-item" onclick="handleGenreSelection(event, '${path}', '${baseFolder}', '${data.genre}', 'add')">
-                            Add "${data.genre}" as new genre
-                        </button>
-                    </li>
-                    <li>
-                        <button class="dropdown-item" onclick="handleGenreSelection(event, '${path}', '${baseFolder}', '', 'custom')">
-                            Add custom genre...
-                        </button>
-                    </li>
-                    <li><hr class="dropdown-divider"></li>
-                    <li><h6 class="dropdown-header">Existing Genres</h6></li>
-                    ${configuredGenres.map(genre => `
-                        <li>
-                            <button class="dropdown-item" onclick="handleGenreSelection(event, '${path}', '${baseFolder}', '${genre}', 'select')">
-                                ${genre}
-                            </button>
-                        </li>
-                    `).join('')}
-                </ul>
-            </div>`;
-
-        // Get the current genre and update action cell if different
-        const currentGenreCell = row.querySelector('.current-genre');
-        if (!currentGenreCell) {
-            throw new Error('Could not find current genre cell');
-        }
-        
-        const currentGenre = currentGenreCell.textContent.trim();
-        if (currentGenre.toLowerCase() !== data.genre.toLowerCase()) {
-            const actionCell = row.querySelector('.actions-cell');
-            if (!actionCell) {
-                throw new Error('Could not find action cell');
-            }
-
-            // Clear the action cell and append the new move button
-            actionCell.innerHTML = '';
-            const moveButton = createMoveButton(path, baseFolder, data.genre);
-            actionCell.appendChild(moveButton);
-        }
+        renderSuggestion(container, path, baseFolder, data.genre);
+        updateMoveAction(row, path, baseFolder, data.genre);
         
     } catch (error) {
         console.error('Error getting suggestion:', error);
@@ -334,9 +607,158 @@ window.getGenreSuggestion = async function(button) {
     }
 }
 
+// Bulk suggestion job for every Uncategorized movie in the selected folder
+let suggestionJobId = null;
+let suggestionJobTimer = null;
+
+window.setSuggestionButtons = function(running) {
+    const startButton = document.getElementById('getUncategorizedSuggestionsButton');
+    const stopButton = document.getElementById('stopSuggestionsButton');
+    if (startButton) startButton.classList.toggle('d-none', running);
+    if (stopButton) stopButton.classList.toggle('d-none', !running);
+}
+
+window.showJobProgress = function(job) {
+    let progressAlert = document.getElementById('suggestionJobProgress');
+    if (!progressAlert) {
+        progressAlert = document.createElement('div');
+        progressAlert.id = 'suggestionJobProgress';
+        progressAlert.className = 'alert alert-info position-fixed bottom-0 end-0 m-3';
+        progressAlert.style.minWidth = '300px';
+        document.body.appendChild(progressAlert);
+    }
+    const percent = Math.round(job.progress * 100);
+    progressAlert.innerHTML = `
+        <div class="d-flex justify-content-between align-items-center mb-2">
+            <strong>Suggesting genres (${job.state})...</strong>
+            <span>${job.completed}/${job.total}</span>
+        </div>
+        <div class="progress">
+            <div class="progress-bar" role="progressbar" style="width: ${percent}%"></div>
+        </div>`;
+    return progressAlert;
+}
+
+window.pollSuggestionJob = async function() {
+    if (!suggestionJobId) return;
+    try {
+        const response = await fetch(`/jobs/${suggestionJobId}`);
+        if (!response.ok) {
+            throw new Error(`Server error: ${response.status}`);
+        }
+        const job = await response.json();
+        const progressAlert = showJobProgress(job);
+
+        if (job.state === 'completed' || job.state === 'cancelled') {
+            suggestionJobId = null;
+            setSuggestionButtons(false);
+            progressAlert.className = 'alert alert-success position-fixed bottom-0 end-0 m-3';
+            progressAlert.innerHTML = `
+                <strong>${job.state === 'completed' ? 'Complete!' : 'Stopped.'}</strong>
+                Suggested genres for ${job.suggested} of ${job.total} movies.
+                ${job.failed > 0 ? `<br>${job.failed} suggestions failed.` : ''}`;
+            setTimeout(() => progressAlert.remove(), 5000);
+            reloadMovies();
+            return;
+        }
+    } catch (error) {
+        console.error('Error polling suggestion job:', error);
+    }
+    suggestionJobTimer = setTimeout(pollSuggestionJob, 2000);
+}
+
+window.getUncategorizedSuggestions = async function() {
+    try {
+        const response = await fetch('/jobs/suggest', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                selected_folder: movieListState.selectedFolder
+            })
+        });
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || `Server error: ${response.status}`);
+        }
+
+        suggestionJobId = job.id;
+        setSuggestionButtons(true);
+        showJobProgress(job);
+        pollSuggestionJob();
+    } catch (error) {
+        console.error('Error starting suggestion job:', error);
+        if (typeof alert === 'function') {
+            alert(`Failed to start suggestions: ${error.message}`);
+        }
+    }
+}
+
+window.stopGettingSuggestions = async function() {
+    if (!suggestionJobId) return;
+    try {
+        await fetch(`/jobs/${suggestionJobId}/cancel`, { method: 'POST' });
+    } catch (error) {
+        console.error('Error stopping suggestion job:', error);
+    }
+}
+
+// Read a newline-delimited JSON response, calling onItem for each line as it arrives
+window.readJsonLines = async function(response, onItem) {
+    const handleLines = (text) => {
+        const lines = text.split('\n');
+        const rest = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => onItem(JSON.parse(line)));
+        return rest;
+    };
+
+    if (!response.body || typeof response.body.getReader !== 'function') {
+        handleLines(await response.text() + '\n');
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer = handleLines(buffer + decoder.decode(value, { stream: true }));
+    }
+    handleLines(buffer + decoder.decode() + '\n');
+}
+
+window.setMoveButtonState = function(button, state) {
+    button.querySelector('.button-text').classList.toggle('d-none', state !== 'idle');
+    button.querySelector('.spinner-border').classList.toggle('d-none', state !== 'moving');
+    button.querySelector('.retry-text').classList.toggle('d-none', state !== 'failed');
+}
+
+window.pollTransferProgress = async function(progressAlert) {
+    try {
+        const response = await fetch('/moves/progress');
+        if (!response.ok) return;
+        const { transfers } = await response.json();
+        let details = progressAlert.querySelector('.transfer-progress');
+        if (!details) {
+            details = document.createElement('div');
+            details.className = 'transfer-progress small mt-2';
+            progressAlert.appendChild(details);
+        }
+        details.innerHTML = transfers.map(transfer => {
+            const name = escapeHtml(transfer.destination.split(/[\\/]/).pop());
+            return `<div>Copying ${name}: ${Math.round(transfer.progress * 100)}%</div>`;
+        }).join('');
+    } catch (error) {
+        console.error('Error polling move progress:', error);
+    }
+}
+
 window.applyAllActions = async function() {
-    const moveButtons = document.querySelectorAll('.move-button');
+    const moveButtons = Array.from(document.querySelectorAll('.move-button'));
     const total = moveButtons.length;
+    if (total === 0) return;
     let completed = 0;
     let failed = 0;
 
@@ -354,23 +776,65 @@ window.applyAllActions = async function() {
         </div>`;
     document.body.appendChild(progressAlert);
 
-    // Process each move button
-    for (const button of moveButtons) {
-        const { path, baseFolder, genre } = button.dataset;
-        try {
-            await moveMovie(path, baseFolder, genre);
+    // The whole plan goes to the server in one request; results stream back per movie
+    const moves = moveButtons.map(button => ({
+        movie_path: button.dataset.path,
+        genre: button.dataset.genre
+    }));
+    moveButtons.forEach(button => setMoveButtonState(button, 'moving'));
+
+    let batchId = null;
+    const handleResult = (result) => {
+        if (result.done) {
+            batchId = result.batch_id;
+            return;
+        }
+        const button = moveButtons[result.index];
+        if (result.success) {
             completed++;
-        } catch (error) {
-            console.error('Failed to move movie:', error);
+            const row = button && button.closest('tr');
+            if (row) row.remove();
+        } else {
             failed++;
+            console.error(`Failed to move ${result.movie_path}: ${result.error}`);
+            if (button) setMoveButtonState(button, 'failed');
         }
 
         // Update progress
         const progress = ((completed + failed) / total) * 100;
-        const progressBar = progressAlert.querySelector('.progress-bar');
-        progressBar.style.width = `${progress}%`;
-        const progressText = progressAlert.querySelector('span');
-        progressText.textContent = `${completed}/${total}`;
+        progressAlert.querySelector('.progress-bar').style.width = `${progress}%`;
+        progressAlert.querySelector('span').textContent = `${completed}/${total}`;
+    };
+
+    // Large files moving to another volume are copied; show how far those copies are
+    const transferTimer = setInterval(() => pollTransferProgress(progressAlert), 2000);
+
+    try {
+        const response = await fetch('/move_movies', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                base_folder: moveButtons[0].dataset.baseFolder,
+                moves: moves
+            })
+        });
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.error || `Server error: ${response.status}`);
+        }
+        await readJsonLines(response, handleResult);
+    } catch (error) {
+        console.error('Failed to move movies:', error);
+        moveButtons.forEach(button => {
+            if (button.isConnected && !button.querySelector('.spinner-border').classList.contains('d-none')) {
+                setMoveButtonState(button, 'failed');
+            }
+        });
+        failed = total - completed;
+    } finally {
+        clearInterval(transferTimer);
     }
 
     // Show completion alert
@@ -379,10 +843,84 @@ window.applyAllActions = async function() {
         <strong>Complete!</strong> Successfully moved ${completed} movies.
         ${failed > 0 ? `<br>Failed to move ${failed} movies.` : ''}`;
 
-    // Remove alert after 5 seconds
+    if (batchId && completed > 0) {
+        const undoButton = document.createElement('button');
+        undoButton.type = 'button';
+        undoButton.className = 'btn btn-outline-secondary btn-sm ms-2';
+        undoButton.textContent = 'Undo';
+        undoButton.addEventListener('click', () => {
+            progressAlert.remove();
+            undoMoveBatch(batchId);
+        });
+        progressAlert.appendChild(undoButton);
+    }
+
+    // Remove alert after 10 seconds
     setTimeout(() => {
         progressAlert.remove();
-    }, 5000);
+    }, 10000);
+}
+
+window.undoMoveBatch = async function(batchId) {
+    try {
+        const response = await fetch(`/moves/batches/${encodeURIComponent(batchId)}/undo`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                base_folder: movieListState.selectedFolder
+            })
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.error || `Server error: ${response.status}`);
+        }
+        if (result.failed > 0 && typeof alert === 'function') {
+            alert(`Moved ${result.undone} movies back; ${result.failed} could not be restored.`);
+        }
+        await reloadMovies();
+    } catch (error) {
+        console.error('Error undoing moves:', error);
+        if (typeof alert === 'function') {
+            alert(`Failed to undo moves: ${error.message}`);
+        }
+    }
+}
+
+window.rescanLibrary = async function(selectedFolder) {
+    const button = document.getElementById('rescanButton');
+    if (button) {
+        button.disabled = true;
+        button.textContent = 'Rescanning...';
+    }
+
+    try {
+        const response = await fetch('/rescan', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                selected_folder: selectedFolder
+            })
+        });
+
+        if (!response.ok) {
+            throw new Error(`Server error: ${response.status}`);
+        }
+
+        window.location.reload();
+    } catch (error) {
+        console.error('Error rescanning folder:', error);
+        if (button) {
+            button.disabled = false;
+            button.textContent = 'Rescan Folder';
+        }
+        if (typeof alert === 'function') {
+            alert('Failed to rescan folder. Please try again.');
+        }
+    }
 }
 
 window.initializeTooltips = function() {
@@ -444,6 +982,13 @@ if (typeof module !== 'undefined' && module.exports) {
         createTimeoutController,
         sleep,
         handleFolderChange,
+        initializeMovieList,
+        buildMoviesQuery,
+        createMovieRow,
+        loadMoreMovies,
+        reloadMovies,
+        applyMovieFilters,
+        applyLibraryChanges,
         sortTable,
         saveTableState,
         restoreTableState,
@@ -451,6 +996,13 @@ if (typeof module !== 'undefined' && module.exports) {
         createMoveButton,
         handleGenreSelection,
         getGenreSuggestion,
-        applyAllActions
+        renderSuggestion,
+        updateMoveAction,
+        getUncategorizedSuggestions,
+        stopGettingSuggestions,
+        readJsonLines,
+        applyAllActions,
+        undoMoveBatch,
+        rescanLibrary
     };
 }
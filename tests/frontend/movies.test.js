@@ -5,7 +5,13 @@
 const {
     createMoveButton,
     handleGenreSelection,
-    moveMovie
+    moveMovie,
+    applyAllActions,
+    undoMoveBatch,
+    initializeMovieList,
+    buildMoviesQuery,
+    loadMoreMovies,
+    applyLibraryChanges
 } = require('../../static/js/movies.js');
 
 // Mock data
@@ -42,6 +48,41 @@ global.fetch = jest.fn((url) => {
             json: () => Promise.resolve({ success: true })
         });
     }
+    if (url.startsWith('/api/movies')) {
+        return Promise.resolve({
+            ok: true,
+            json: () => Promise.resolve({
+                movies: [{
+                    title: "Test Movie 3",
+                    path: "Incoming/test3.mkv",
+                    base_folder: "/movies",
+                    current_genre: "Uncategorized",
+                    suggested_genre: null
+                }],
+                total: 3,
+                page: 2,
+                per_page: 2,
+                next_cursor: null,
+                has_more: false
+            })
+        });
+    }
+    if (url === '/move_movies') {
+        return Promise.resolve({
+            ok: true,
+            text: () => Promise.resolve([
+                JSON.stringify({ index: 0, movie_path: 'Incoming/a.mkv', genre: 'Action', success: true }),
+                JSON.stringify({ index: 1, movie_path: 'Incoming/b.mkv', genre: 'Drama', success: false, error: 'Source file not found' }),
+                JSON.stringify({ done: true, total: 2, moved: 1, failed: 1 })
+            ].join('\n') + '\n')
+        });
+    }
+    if (url.startsWith('/moves/batches/')) {
+        return Promise.resolve({
+            ok: true,
+            json: () => Promise.resolve({ batch_id: 'batch-1', undone: 2, failed: 0 })
+        });
+    }
     if (url === '/move_movie') {
         return Promise.resolve({
             ok: true,
@@ -146,5 +187,113 @@ describe('Movies Page Functionality', () => {
 
         // Verify move request was made
         expect(fetch).toHaveBeenCalledWith('/move_movie', expect.any(Object));
+        const body = JSON.parse(fetch.mock.calls[0][1].body);
+        expect(body.movie_path).toBe('/test/path');
+    });
+
+    test('should submit all moves in one request and apply streamed results', async () => {
+        const cells = document.querySelectorAll('.actions-cell');
+        cells[0].appendChild(createMoveButton('Incoming/a.mkv', '/movies', 'Action'));
+        cells[1].appendChild(createMoveButton('Incoming/b.mkv', '/movies', 'Drama'));
+
+        await applyAllActions();
+
+        expect(fetch).toHaveBeenCalledTimes(1);
+        const [url, options] = fetch.mock.calls[0];
+        expect(url).toBe('/move_movies');
+        expect(JSON.parse(options.body).moves).toEqual([
+            { movie_path: 'Incoming/a.mkv', genre: 'Action' },
+            { movie_path: 'Incoming/b.mkv', genre: 'Drama' }
+        ]);
+        expect(document.querySelectorAll('tbody tr').length).toBe(1);
+        const failedButton = document.querySelector('.move-button');
+        expect(failedButton.querySelector('.retry-text').classList.contains('d-none')).toBe(false);
+    });
+
+    test('should undo a move batch and reload the list', async () => {
+        initializeMovieList({ selectedFolder: '/movies', perPage: 2, total: 0, loaded: 0 });
+
+        await undoMoveBatch('batch-1');
+
+        const [url, options] = fetch.mock.calls[0];
+        expect(url).toBe('/moves/batches/batch-1/undo');
+        expect(JSON.parse(options.body).base_folder).toBe('/movies');
+        expect(fetch.mock.calls.some(([next]) => next.startsWith('/api/movies'))).toBe(true);
+    });
+
+    test('should build movies query from list state', () => {
+        const query = new URLSearchParams(buildMoviesQuery({
+            selectedFolder: '/movies',
+            perPage: 50,
+            sort: 'genre',
+            order: 'desc',
+            genre: '',
+            uncategorized: true,
+            search: 'alien'
+        }, 3));
+
+        expect(query.get('page')).toBe('3');
+        expect(query.has('after')).toBe(false);
+        expect(query.get('per_page')).toBe('50');
+        expect(query.get('sort')).toBe('genre');
+        expect(query.get('order')).toBe('desc');
+        expect(query.get('uncategorized')).toBe('1');
+        expect(query.get('q')).toBe('alien');
+        expect(query.has('genre')).toBe(false);
+    });
+
+    test('should append the next page of movies', async () => {
+        const cursor = ['test2', 'Drama/test2.mp4', '/movies'];
+        initializeMovieList({ selectedFolder: '/movies', perPage: 2, total: 3, loaded: 2, cursor });
+
+        await loadMoreMovies();
+
+        const [url] = fetch.mock.calls[0];
+        const query = new URLSearchParams(url.split('?')[1]);
+        expect(JSON.parse(query.get('after'))).toEqual(cursor);
+        const rows = document.querySelectorAll('tbody tr');
+        expect(rows.length).toBe(3);
+        expect(rows[2].textContent).toContain('Test Movie 3');
+        expect(window.movieListState.hasMore).toBe(false);
+    });
+
+    test('should apply library changes pushed by the server', () => {
+        initializeMovieList({ selectedFolder: '/movies', perPage: 2, total: 2, loaded: 2 });
+        document.querySelector('tbody tr').dataset.path = 'Drama/test1.mp4';
+
+        applyLibraryChanges({
+            root: '/movies',
+            added: [{
+                title: 'New Arrival',
+                path: 'Incoming/new.mkv',
+                base_folder: '/movies',
+                current_genre: 'Uncategorized',
+                suggested_genre: null
+            }],
+            removed: ['Drama/test1.mp4']
+        });
+
+        const rows = document.querySelectorAll('tbody tr');
+        expect(rows.length).toBe(2);
+        expect(rows[0].dataset.path).toBe('Incoming/new.mkv');
+        expect(rows[0].classList.contains('table-success')).toBe(true);
+        expect(document.body.textContent).not.toContain('Test Movie 1');
+        expect(window.movieListState.loaded).toBe(1);
+        expect(window.movieListState.total).toBe(2);
+    });
+
+    test('should tell movies of different folders apart in the all libraries view', () => {
+        initializeMovieList({ selectedFolder: '__all__', perPage: 2, total: 2, loaded: 2 });
+        const rows = document.querySelectorAll('tbody tr');
+        rows.forEach(row => { row.dataset.path = 'Drama/test1.mp4'; });
+        rows[0].dataset.baseFolder = '/movies';
+        rows[1].dataset.baseFolder = '/nas/movies';
+
+        applyLibraryChanges({ root: '/nas/movies', added: [], removed: ['Drama/test1.mp4'] });
+
+        const remaining = document.querySelectorAll('tbody tr');
+        expect(remaining.length).toBe(1);
+        expect(remaining[0].dataset.baseFolder).toBe('/movies');
+        expect(window.movieListState.total).toBe(1);
     });
 });
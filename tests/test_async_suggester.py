@@ -0,0 +1,165 @@
+import asyncio
+import json
+import time
+from aiohttp import web
+from genre_suggester.http_utils import TokenBucket
+from genre_suggester.async_suggester import (AsyncOpenAIGenreSuggester, AsyncTMDBGenreSuggester,
+                                             ConcurrentGenreSuggester)
+from metrics import OPENAI_TOKENS
+
+GENRES = ['Action', 'Drama', 'Horror', 'Sci-Fi']
+
+def openai_app(answers, requests, delay=0.0):
+    """A chat completions endpoint answering {filename: answer} in the JSON schema format"""
+    async def completions(request):
+        body = await request.json()
+        requests.append((request.headers.get('Authorization'), body))
+        await asyncio.sleep(delay)
+        filename = body['messages'][-1]['content'].split('"')[1]
+        return web.json_response({
+            'choices': [{'message': {'content': json.dumps(answers[filename])}}],
+            'usage': {'prompt_tokens': 500, 'completion_tokens': 20, 'prompt_tokens_details': {'cached_tokens': 384}}
+        })
+    app = web.Application()
+    app.router.add_post('/chat/completions', completions)
+    return app
+
+def tmdb_app(movies, requests, in_flight=None, delay=0.0, failures=None):
+    """TMDB search and movie endpoints over {title: (id, popularity, [genre names])}.
+
+    Searches answer with the queued (status, headers) failures first.
+    """
+    by_id = {movie_id: (title, genres) for title, (movie_id, _, genres) in movies.items()}
+
+    async def search(request):
+        requests.append(dict(request.query))
+        if failures:
+            status, headers = failures.pop(0)
+            return web.json_response({'status_message': 'busy'}, status=status, headers=headers)
+        if in_flight is not None:
+            in_flight['now'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['now'])
+        await asyncio.sleep(delay)
+        if in_flight is not None:
+            in_flight['now'] -= 1
+        match = movies.get(request.query['query'])
+        results = [{'id': match[0], 'popularity': match[1]}] if match else []
+        return web.json_response({'results': results})
+
+    async def movie(request):
+        title, genres = by_id[int(request.match_info['movie_id'])]
+        return web.json_response({'title': title, 'release_date': '1979-05-25',
+                                  'genres': [{'name': name} for name in genres]})
+
+    app = web.Application()
+    app.router.add_get('/search/movie', search)
+    app.router.add_get('/movie/{movie_id}', movie)
+    return app
+
+async def ask(suggester, title):
+    await suggester.initialize()
+    try:
+        return await suggester.suggest_genre(title, GENRES)
+    finally:
+        await suggester.cleanup()
+
+def test_openai_request_and_answer(stub_server):
+    requests = []
+    base_url = stub_server.serve(openai_app(
+        {'Alien.1979.1080p': {'title': 'Alien', 'year': '1979', 'genre': 'sci-fi', 'confidence': 'High'}}, requests))
+    cached_before = OPENAI_TOKENS.value(model='test-model', type='cached_prompt')
+
+    suggester = AsyncOpenAIGenreSuggester('key', model='test-model', base_url=base_url)
+    suggestion = asyncio.run(ask(suggester, 'Alien.1979.1080p'))
+
+    assert (suggestion.genre, suggestion.confidence, suggestion.status) == ('Sci-Fi', 'High', 'success')
+    authorization, body = requests[0]
+    assert authorization == 'Bearer key'
+    assert body['model'] == 'test-model'
+    assert body['response_format']['json_schema']['strict'] is True
+    assert OPENAI_TOKENS.value(model='test-model', type='cached_prompt') - cached_before == 384
+
+def test_openai_error_becomes_error_suggestion(stub_server):
+    async def failing(request):
+        return web.json_response({'error': 'overloaded'}, status=500)
+    app = web.Application()
+    app.router.add_post('/chat/completions', failing)
+    suggester = AsyncOpenAIGenreSuggester('key', base_url=stub_server.serve(app))
+    assert asyncio.run(ask(suggester, 'Alien.1979.1080p')).status == 'error'
+
+def test_tmdb_searches_with_year_and_maps_genres(stub_server):
+    requests = []
+    base_url = stub_server.serve(tmdb_app({'Alien': (348, 80.0, ['Science Fiction', 'Horror'])}, requests))
+    suggestion = asyncio.run(ask(AsyncTMDBGenreSuggester('key', base_url=base_url), 'Alien (1979)'))
+    assert (suggestion.genre, suggestion.confidence) == ('Sci-Fi', 'High')
+    assert requests[0]['query'] == 'Alien' and requests[0]['year'] == '1979'
+
+def test_tmdb_without_results_is_undetermined(stub_server):
+    base_url = stub_server.serve(tmdb_app({}, []))
+    assert asyncio.run(ask(AsyncTMDBGenreSuggester('key', base_url=base_url), 'Nothing (2001)')).status == 'undetermined'
+
+def test_tmdb_retries_after_rate_limit_and_pauses_the_limiter(stub_server):
+    requests = []
+    failures = [(429, {'Retry-After': '0.3'}), (503, {})]
+    base_url = stub_server.serve(tmdb_app({'Alien': (348, 80.0, ['Science Fiction'])}, requests, failures=failures))
+    limiter = TokenBucket(rate=100)
+    suggester = AsyncTMDBGenreSuggester('key', base_url=base_url, rate_limiter=limiter)
+
+    start = time.perf_counter()
+    suggestion = asyncio.run(ask(suggester, 'Alien (1979)'))
+    assert suggestion.genre == 'Sci-Fi'
+    assert len(requests) == 3
+    assert time.perf_counter() - start >= 0.3
+
+def test_tmdb_gives_up_after_max_retries(stub_server):
+    base_url = stub_server.serve(tmdb_app({}, [], failures=[(503, {})] * 2))
+    suggester = AsyncTMDBGenreSuggester('key', base_url=base_url, max_retries=1,
+                                        rate_limiter=TokenBucket(rate=0))
+    assert asyncio.run(ask(suggester, 'Alien (1979)')).status == 'error'
+
+def test_tmdb_lookups_in_flight_share_the_rate_limiter(stub_server):
+    movies = {f'Movie {i}': (i, 50.0, ['Drama']) for i in range(4)}
+    tmdb_url = stub_server.serve(tmdb_app(movies, []))
+    suggester = ConcurrentGenreSuggester([AsyncTMDBGenreSuggester(
+        'key', base_url=tmdb_url, rate_limiter=TokenBucket(rate=20, capacity=1))])
+
+    async def run():
+        await suggester.initialize()
+        try:
+            return await suggester.suggest_genres(list(movies), GENRES)
+        finally:
+            await suggester.cleanup()
+
+    start = time.perf_counter()
+    assert [s.genre for s in asyncio.run(run())] == ['Drama'] * 4
+    # Eight requests at 20 a second: one token up front, then one every 50 ms
+    assert time.perf_counter() - start >= 0.35
+
+def test_concurrent_suggester_takes_first_confident_answer(stub_server):
+    openai_url = stub_server.serve(openai_app(
+        {'Alien (1979)': {'title': 'Alien', 'year': '1979', 'genre': 'Horror', 'confidence': 'Low'}}, [], delay=1.0))
+    tmdb_url = stub_server.serve(tmdb_app({'Alien': (348, 80.0, ['Science Fiction'])}, []))
+    suggester = ConcurrentGenreSuggester([AsyncOpenAIGenreSuggester('key', base_url=openai_url),
+                                          AsyncTMDBGenreSuggester('key', base_url=tmdb_url)])
+    start = time.perf_counter()
+    suggestion = asyncio.run(ask(suggester, 'Alien (1979)'))
+    assert suggestion.genre == 'Sci-Fi'
+    # TMDB answered confidently, so the slow OpenAI call was not waited for
+    assert time.perf_counter() - start < 0.8
+
+def test_concurrent_suggester_caps_lookups_in_flight(stub_server):
+    in_flight = {'now': 0, 'max': 0}
+    movies = {f'Movie {i}': (i, 50.0, ['Drama']) for i in range(12)}
+    tmdb_url = stub_server.serve(tmdb_app(movies, [], in_flight, delay=0.05))
+    suggester = ConcurrentGenreSuggester([AsyncTMDBGenreSuggester('key', base_url=tmdb_url)], max_concurrency=3)
+
+    async def run():
+        await suggester.initialize()
+        try:
+            return await suggester.suggest_genres(list(movies), GENRES)
+        finally:
+            await suggester.cleanup()
+
+    suggestions = asyncio.run(run())
+    assert [s.genre for s in suggestions] == ['Drama'] * len(movies)
+    assert in_flight['max'] == 3
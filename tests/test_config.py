@@ -0,0 +1,31 @@
+import json
+import os
+import stat
+import sys
+import pytest
+from config import ConfigStore
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='POSIX permission bits')
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_save_keeps_the_file_mode(tmp_path):
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps({'base_folders': []}))
+    os.chmod(path, 0o640)
+
+    ConfigStore(str(path), defaults={}).save({'base_folders': ['/movies']})
+
+    assert mode(path) == 0o640
+    assert json.loads(path.read_text()) == {'base_folders': ['/movies']}
+
+def test_new_file_gets_the_umask_mode(tmp_path):
+    path = tmp_path / 'config.json'
+    umask = os.umask(0o027)
+    try:
+        ConfigStore(str(path), defaults={}).save({'base_folders': []})
+    finally:
+        os.umask(umask)
+
+    assert mode(path) == 0o640
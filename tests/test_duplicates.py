@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import pytest
+from movie_library.duplicates import DuplicateFinder, FingerprintCache, MovieFile
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FingerprintCache(str(tmp_path / 'fingerprints.db'))
+    yield cache
+    cache.close()
+
+def movie_file(root, relative_path, **overrides):
+    path = os.path.join(root, relative_path)
+    st = os.stat(path)
+    fields = dict(root=str(root), relative_path=relative_path, path=path, size=st.st_size,
+                  mtime_ns=st.st_mtime_ns, device=st.st_dev, inode=st.st_ino)
+    fields.update(overrides)
+    return MovieFile(**fields)
+
+def write(root, relative_path, content):
+    path = root / relative_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+
+def test_identical_files_are_duplicates(tmp_path, cache):
+    write(tmp_path, 'Alien (1979).mkv', b'alien' * 100)
+    write(tmp_path, 'Sci-Fi/Alien (1979).mkv', b'alien' * 100)
+    write(tmp_path, 'Aliens (1986).mkv', b'ALIEN' * 100)
+    files = [movie_file(tmp_path, p) for p in ('Alien (1979).mkv', 'Sci-Fi/Alien (1979).mkv', 'Aliens (1986).mkv')]
+
+    groups = DuplicateFinder(cache, max_workers=1).find(files)
+
+    assert [[f.relative_path for f in group.files] for group in groups] == [
+        ['Alien (1979).mkv', 'Sci-Fi/Alien (1979).mkv']]
+    assert groups[0].wasted_bytes == 500
+
+def test_hard_links_are_one_file(tmp_path, cache):
+    write(tmp_path, 'Alien (1979).mkv', b'alien' * 100)
+    os.link(tmp_path / 'Alien (1979).mkv', tmp_path / 'Alien link.mkv')
+    files = [movie_file(tmp_path, 'Alien (1979).mkv'), movie_file(tmp_path, 'Alien link.mkv')]
+
+    assert DuplicateFinder(cache, max_workers=1).find(files) == []
+
+def test_same_inode_on_another_device_is_another_file(tmp_path, cache, monkeypatch):
+    # The devices below are made up, so the files cannot be stat'ed again
+    monkeypatch.setattr(DuplicateFinder, '_unchanged', staticmethod(lambda files: files))
+    write(tmp_path, 'Alien (1979).mkv', b'alien' * 100)
+    write(tmp_path, 'backup/Alien (1979).mkv', b'alien' * 100)
+    # Two filesystems can hand out the same inode number
+    files = [movie_file(tmp_path, 'Alien (1979).mkv', device=1, inode=42),
+             movie_file(tmp_path, 'backup/Alien (1979).mkv', device=2, inode=42)]
+
+    groups = DuplicateFinder(cache, max_workers=1).find(files)
+
+    assert len(groups) == 1 and len(groups[0].files) == 2
+    assert set(cache.get(files)) == {(1, 42, files[0].mtime_ns, 500), (2, 42, files[1].mtime_ns, 500)}
+
+def test_files_changed_since_the_scan_are_skipped(tmp_path, cache):
+    write(tmp_path, 'Alien (1979).mkv', b'alien' * 100)
+    write(tmp_path, 'Sci-Fi/Alien (1979).mkv', b'alien' * 100)
+    indexed = [movie_file(tmp_path, 'Alien (1979).mkv'), movie_file(tmp_path, 'Sci-Fi/Alien (1979).mkv')]
+    finder = DuplicateFinder(cache, max_workers=1)
+    assert len(finder.find(indexed)) == 1
+
+    # Rewritten in place with the same size; the index has not seen it yet
+    path = tmp_path / 'Sci-Fi' / 'Alien (1979).mkv'
+    path.write_bytes(b'ALIEN' * 100)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, indexed[1].mtime_ns + 1_000_000_000))
+
+    assert finder.find(indexed) == []
+
+def test_prune_forgets_files_that_are_gone(tmp_path, cache):
+    write(tmp_path, 'Alien (1979).mkv', b'alien' * 100)
+    write(tmp_path, 'Sci-Fi/Alien (1979).mkv', b'alien' * 100)
+    files = [movie_file(tmp_path, 'Alien (1979).mkv'), movie_file(tmp_path, 'Sci-Fi/Alien (1979).mkv')]
+    finder = DuplicateFinder(cache, max_workers=1)
+    finder.find(files)
+    assert len(cache.get(files)) == 2
+
+    finder.find(files[:1])
+    assert len(cache.get(files)) == 2
+    finder.find(files[:1], prune=True)
+    assert set(cache.get(files)) == {files[0].fingerprint_key}
+
+def test_cache_without_device_column_is_discarded(tmp_path):
+    path = str(tmp_path / 'fingerprints.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE fingerprints (inode INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, '
+                 'sample_hash TEXT, full_hash TEXT, checked_at REAL NOT NULL, PRIMARY KEY (inode, mtime_ns, size))')
+    conn.execute("INSERT INTO fingerprints VALUES (42, 1, 500, 'abc', 'abc', 0)")
+    conn.commit()
+    conn.close()
+
+    cache = FingerprintCache(path)
+    try:
+        assert cache.get([MovieFile('/', 'a.mkv', '/a.mkv', 500, 1, 7, 42)]) == {}
+    finally:
+        cache.close()
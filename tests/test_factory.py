@@ -0,0 +1,12 @@
+import pytest
+from genre_suggester.factory import SuggesterSettings
+
+@pytest.mark.parametrize('value, expected', [('high', 'High'), (' MEDIUM ', 'Medium'), ('Low', 'Low')])
+def test_min_confidence_from_env(monkeypatch, value, expected):
+    monkeypatch.setenv('MOVIE_ORGANIZER_MIN_CONFIDENCE', value)
+    assert SuggesterSettings.from_env().min_confidence == expected
+
+def test_unknown_min_confidence_is_rejected_up_front(monkeypatch):
+    monkeypatch.setenv('MOVIE_ORGANIZER_MIN_CONFIDENCE', 'med')
+    with pytest.raises(ValueError, match='MOVIE_ORGANIZER_MIN_CONFIDENCE'):
+        SuggesterSettings.from_env()
@@ -0,0 +1,84 @@
+import errno
+import os
+import pytest
+from movie_library import file_transfer
+from movie_library.file_transfer import copy_file_resumable, move_file, rename_no_replace
+
+@pytest.fixture
+def files(tmp_path):
+    source, destination = tmp_path / 'Alien (1979).mkv', tmp_path / 'Sci-Fi' / 'Alien (1979).mkv'
+    source.write_bytes(b'alien')
+    destination.parent.mkdir()
+    return source, destination
+
+@pytest.fixture
+def no_native_rename(monkeypatch):
+    monkeypatch.setattr(file_transfer, '_renameat2', None)
+    monkeypatch.setattr(file_transfer, '_renamex_np', None)
+
+def test_move_file_renames(files):
+    source, destination = files
+    move_file(str(source), str(destination))
+    assert not source.exists() and destination.read_bytes() == b'alien'
+
+@pytest.mark.parametrize('renameat2', ['native', 'missing'])
+def test_move_file_never_replaces_destination(files, monkeypatch, renameat2):
+    if renameat2 == 'missing':
+        monkeypatch.setattr(file_transfer, '_renameat2', None)
+        monkeypatch.setattr(file_transfer, '_renamex_np', None)
+    source, destination = files
+    destination.write_bytes(b'other')
+    with pytest.raises(FileExistsError):
+        move_file(str(source), str(destination))
+    assert source.read_bytes() == b'alien' and destination.read_bytes() == b'other'
+
+def test_move_file_onto_itself_is_a_no_op(files):
+    source, _ = files
+    move_file(str(source), str(source))
+    assert source.read_bytes() == b'alien'
+
+def test_rename_without_renameat2_links_and_unlinks(files, no_native_rename):
+    source, destination = files
+    rename_no_replace(str(source), str(destination))
+    assert not source.exists() and destination.read_bytes() == b'alien'
+
+def test_fallback_moves_directories(tmp_path, no_native_rename):
+    source, destination = tmp_path / 'Alien (1979)', tmp_path / '#recycle' / 'Alien (1979)'
+    source.mkdir()
+    (source / 'sample.mkv').write_bytes(b'sample')
+    destination.parent.mkdir()
+    move_file(str(source), str(destination))
+    assert not source.exists() and (destination / 'sample.mkv').read_bytes() == b'sample'
+
+    source.mkdir()
+    with pytest.raises(FileExistsError):
+        move_file(str(source), str(destination))
+    assert source.is_dir()
+
+def test_fallback_renames_where_hard_links_are_not_supported(files, no_native_rename, monkeypatch):
+    def no_links(src, dest):
+        raise OSError(errno.EPERM, os.strerror(errno.EPERM))
+    monkeypatch.setattr(file_transfer.os, 'link', no_links)
+    source, destination = files
+    move_file(str(source), str(destination))
+    assert not source.exists() and destination.read_bytes() == b'alien'
+
+def test_cross_device_move_copies_and_removes_source(files, monkeypatch):
+    source, destination = files
+    rename = file_transfer.rename_no_replace
+
+    def exdev(src, dest):
+        # Pretend the source is on another device; the copy's final rename is local
+        if src == str(source):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        rename(src, dest)
+    monkeypatch.setattr(file_transfer, 'rename_no_replace', exdev)
+    move_file(str(source), str(destination))
+    assert not source.exists() and destination.read_bytes() == b'alien'
+
+def test_copy_keeps_a_destination_that_appeared_meanwhile(files):
+    source, destination = files
+    destination.write_bytes(b'other')
+    with pytest.raises(FileExistsError):
+        copy_file_resumable(str(source), str(destination))
+    assert destination.read_bytes() == b'other'
@@ -0,0 +1,39 @@
+import pytest
+from movie_library.filename_parser import ParsedName, clean_title, parse_filename, parse_title
+
+@pytest.mark.parametrize('filename, expected', [
+    ('The.Matrix.1999.1080p.BluRay.x264-GROUP.mkv',
+     ParsedName('The Matrix', 1999, '1080p', 'BluRay', 'x264', 'GROUP')),
+    ('Movie_Name_2010_DVDRip_XviD.avi', ParsedName('Movie Name', 2010, source='DVDRip', codec='XVID')),
+    ('[YTS.MX] Alien (1979) [720p].mp4', ParsedName('Alien', 1979, '720p')),
+    ('Heat.mkv', ParsedName('Heat')),
+    ('movies/Sci-Fi/Alien (1979).mkv', ParsedName('Alien', 1979)),
+    ('C:\\Movies\\Alien (1979).mkv', ParsedName('Alien', 1979)),
+])
+def test_release_names(filename, expected):
+    assert parse_filename(filename) == expected
+
+@pytest.mark.parametrize('filename, title, year', [
+    # A number in the title is not the year
+    ('Blade.Runner.2049.2017.2160p.mkv', 'Blade Runner 2049', 2017),
+    ('2001.A.Space.Odyssey.1968.720p.mkv', '2001 A Space Odyssey', 1968),
+    ('1917.2019.1080p.WEB-DL.DDP5.1.H.264.mkv', '1917', 2019),
+    # Sources that are ordinary words only end the title after it started
+    ("Charlotte's Web (2006).avi", "Charlotte's Web", 2006),
+    ('Cam.2018.WEB.h264.mkv', 'Cam', 2018),
+])
+def test_titles_that_look_like_tags(filename, title, year):
+    parsed = parse_filename(filename)
+    assert (parsed.title, parsed.year) == (title, year)
+
+def test_clean_title_appends_year():
+    assert clean_title('The.Matrix.1999.1080p.BluRay.x264-GROUP.mkv') == 'The Matrix (1999)'
+    assert clean_title('Heat.mkv') == 'Heat'
+
+def test_parse_title_has_no_extension_to_strip():
+    # As a filename, '.1979' would pass for the extension
+    assert parse_title('Alien.1979') == ParsedName('Alien', 1979)
+
+def test_cache_key_matches_every_release_of_a_movie():
+    assert (parse_filename('The.Matrix.1999.1080p.BluRay.x264-GROUP.mkv').cache_key
+            == parse_filename('the matrix (1999).avi').cache_key == ('the matrix', 1999))
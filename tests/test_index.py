@@ -0,0 +1,112 @@
+import sqlite3
+import pytest
+from movie_library import index as library_index
+from movie_library.index import LibraryIndex
+
+GENRES = ['Drama', 'Sci-Fi']
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path / 'library_index.db'))
+    yield index
+    index.close()
+
+def make_library(root, relative_paths):
+    for relative_path in relative_paths:
+        path = root / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'movie')
+    return str(root)
+
+def titles(movies):
+    return [movie.title for movie in movies]
+
+def test_search_folds_non_ascii_case(tmp_path, index):
+    root = make_library(tmp_path / 'movies', ['Drama/Ámélie (2001).mkv', 'ÉCOLE/Être et avoir (2002).mkv',
+                                              'Drama/Die Straße (1954).mkv'])
+    index.refresh(root)
+
+    assert titles(index.query_movies(root, GENRES, search='ámé').movies) == ['Ámélie (2001)']
+    # Matches the folder part of the path, which has no lowercase in it
+    assert titles(index.query_movies(root, GENRES, search='école').movies) == ['Être et avoir (2002)']
+    # Casefolding, unlike lowercasing, matches ß with ss
+    assert titles(index.query_movies(root, GENRES, search='STRASSE').movies) == ['Die Straße (1954)']
+
+def test_cursor_pages_through_one_root(tmp_path, index):
+    root = make_library(tmp_path / 'movies', [f'Drama/Movie {i} (2000).mkv' for i in range(5)])
+    index.refresh(root)
+
+    seen, cursor = [], None
+    while True:
+        page = index.query_movies(root, GENRES, limit=2, after=cursor)
+        assert page.total == 5
+        seen += titles(page.movies)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert seen == [f'Movie {i} (2000)' for i in range(5)]
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('sort', ['title', 'genre', 'path'])
+def test_cursor_pages_through_merged_roots(tmp_path, index, sort, descending):
+    # The same relative path in both roots sorts equal on every column but the root
+    first = make_library(tmp_path / 'a', ['Drama/Alien (1979).mkv', 'Sci-Fi/Brazil (1985).mkv', 'Heat (1995).mkv'])
+    second = make_library(tmp_path / 'b', ['Drama/Alien (1979).mkv', 'Drama/Casino (1995).mkv'])
+    for root in (first, second):
+        index.refresh(root)
+    everything = index.query_libraries([first, second], GENRES, sort=sort, descending=descending, limit=100)
+
+    seen, cursor = [], None
+    while True:
+        page = index.query_libraries([first, second], GENRES, sort=sort, descending=descending,
+                                     limit=2, after=cursor)
+        seen += [(movie.base_folder, movie.path) for movie in page.movies]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    assert everything.total == 5 and everything.next_cursor is None
+    assert seen == [(movie.base_folder, movie.path) for movie in everything.movies]
+
+def test_each_root_reads_one_page_past_the_cursor(tmp_path, index, monkeypatch):
+    roots = [make_library(tmp_path / name, [f'Movie {name}{i:02d}.mkv' for i in range(20)]) for name in 'ab']
+    for root in roots:
+        index.refresh(root)
+    limits = []
+    query = LibraryIndex._query_movies
+
+    def recording(self, *args):
+        limits.append(args[-2])
+        return query(self, *args)
+    monkeypatch.setattr(LibraryIndex, '_query_movies', recording)
+
+    page = index.query_libraries(roots, GENRES, limit=5)
+    page = index.query_libraries(roots, GENRES, limit=5, after=page.next_cursor)
+    page = index.query_libraries(roots, GENRES, limit=5, after=page.next_cursor)
+    assert titles(page.movies) == ['Movie a10', 'Movie a11', 'Movie a12', 'Movie a13', 'Movie a14']
+    assert set(limits) == {6}
+
+def test_cursor_for_another_sort_is_rejected(tmp_path, index):
+    root = make_library(tmp_path / 'movies', ['Heat (1995).mkv'])
+    index.refresh(root)
+    with pytest.raises(ValueError):
+        index.query_movies(root, GENRES, sort='genre', after=['heat (1995)', 'Heat (1995).mkv', root])
+
+def test_old_schema_is_rebuilt(tmp_path):
+    db_path = str(tmp_path / 'library_index.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE files (path TEXT PRIMARY KEY, root TEXT NOT NULL)')
+    conn.execute("INSERT INTO files VALUES ('/movies/stale.mkv', '/movies')")
+    conn.execute(f'PRAGMA user_version = {library_index.SCHEMA_VERSION - 1}')
+    conn.commit()
+    conn.close()
+
+    index = LibraryIndex(db_path)
+    try:
+        assert index.movie_counts() == {}
+        root = make_library(tmp_path / 'movies', ['Heat (1995).mkv'])
+        index.refresh(root)
+        assert titles(index.query_movies(root, GENRES, search='heat').movies) == ['Heat (1995)']
+    finally:
+        index.close()
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == library_index.SCHEMA_VERSION
@@ -0,0 +1,39 @@
+import itertools
+import pytest
+from genre_suggester.local_model_suggester import LocalModelGenreSuggester
+
+DRAMA_WORDS = ['Letters', 'Silence', 'Daughter', 'River', 'Winter', 'Promise', 'Story', 'Father', 'Home', 'Life']
+ACTION_WORDS = ['Strike', 'Force', 'Mission', 'Fury', 'Assault', 'Hard', 'Fast', 'Explosive', 'Target', 'Agent']
+GENRES = ['Action', 'Drama']
+
+def titles(words, count):
+    pairs = itertools.cycle(itertools.permutations(words, 2))
+    return [f"{first} {second} ({1980 + i % 40})" for i, (first, second) in zip(range(count), pairs)]
+
+@pytest.fixture
+def suggester(tmp_path):
+    """A model trained on a library that is 70% Drama"""
+    labeled = {}
+    for genre, words, count in (('Drama', DRAMA_WORDS, 70), ('Action', ACTION_WORDS, 30)):
+        for i, title in enumerate(titles(words, count)):
+            labeled[f"{genre}/{i}"] = (title, genre)
+    suggester = LocalModelGenreSuggester(str(tmp_path / 'genre_model.json'))
+    suggester.initialize()
+    suggester.sync('/movies', labeled)
+    return suggester
+
+@pytest.mark.parametrize('title', ['Zzyzx Qwv', 'Jurassic Park', 'The Matrix (1999)'])
+def test_unseen_title_is_low_confidence(suggester, title):
+    suggestion = suggester.suggest_genre(title, GENRES)
+    assert suggestion.confidence == 'Low'
+
+@pytest.mark.parametrize('title, genre', [('Winter Silence', 'Drama'), ('Fury Target', 'Action')])
+def test_known_words_are_confident(suggester, title, genre):
+    suggestion = suggester.suggest_genre(title, GENRES)
+    assert suggestion.genre == genre
+    assert suggestion.confidence in ('High', 'Medium')
+
+def test_untrained_model_is_undetermined(tmp_path):
+    suggester = LocalModelGenreSuggester(str(tmp_path / 'genre_model.json'))
+    suggester.initialize()
+    assert suggester.suggest_genre('Winter Silence', GENRES).status == 'undetermined'
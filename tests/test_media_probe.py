@@ -0,0 +1,53 @@
+import pytest
+from benchmarks.bench_media_probe import write_avi, write_mkv, write_mp4
+from movie_library.index import LibraryIndex
+from movie_library.media_probe import MediaTags, best_title, probe_file
+
+SIZE = 3 << 20
+
+@pytest.mark.parametrize('write, name', [(write_mkv, 'movie.mkv'), (write_mp4, 'movie.mp4'), (write_avi, 'movie.avi')])
+def test_tags_are_read_from_each_container(tmp_path, write, name):
+    # Files of several MB keep the MKV tags and the MP4 moov past the first megabyte
+    path = str(tmp_path / name)
+    write(path, SIZE, 'The Thing', 1982)
+    assert probe_file(path) == MediaTags('The Thing', 1982)
+
+def test_mkv_falls_back_to_segment_title(tmp_path):
+    path = str(tmp_path / 'movie.mkv')
+    write_mkv(path, SIZE, None, None)
+    assert probe_file(path) == MediaTags('release.group.encode', None)
+
+def test_unknown_and_broken_files(tmp_path):
+    unknown = tmp_path / 'movie.ts'
+    unknown.write_bytes(b'\x47' * 1024)
+    broken = tmp_path / 'movie.mkv'
+    broken.write_bytes(b'\x1a\x45\xdf\xa3\x00')
+    assert probe_file(str(unknown)) == MediaTags()
+    assert probe_file(str(broken)) is None
+    assert probe_file(str(tmp_path / 'missing.mkv')) is None
+
+@pytest.mark.parametrize('tags, title, year', [
+    (MediaTags('The Thing', 1982), 'The Thing', 1982),
+    (None, 'Thing', 2011),
+    # Release names, adverts and empty titles are not trusted
+    (MediaTags('The.Thing.1982.1080p.BluRay', None), 'Thing', 2011),
+    (MediaTags('The Thing - www.example.com', 1982), 'Thing', 2011),
+    # A tag year that disagrees shows the number is part of the title
+    (MediaTags('Blade Runner 2049', 2017), 'Blade Runner 2049', 2017),
+])
+def test_best_title(tags, title, year):
+    parsed = best_title('Thing.2011.720p.WEB.mkv', tags)
+    assert (parsed.title, parsed.year, parsed.resolution) == (title, year, '720p')
+
+def test_index_probes_new_files_once(tmp_path):
+    root = tmp_path / 'movies'
+    root.mkdir()
+    write_mkv(str(root / 'release.mkv'), SIZE, 'The Thing', 1982)
+    index = LibraryIndex(str(tmp_path / 'library_index.db'))
+    try:
+        index.refresh(str(root))
+        assert index.probe_media(str(root))['probed'] == 1
+        assert index.probe_media(str(root))['probed'] == 0
+        assert index.movie_titles(str(root), ['release.mkv']) == {'release.mkv': 'The Thing (1982)'}
+    finally:
+        index.close()
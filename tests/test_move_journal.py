@@ -0,0 +1,155 @@
+import os
+import subprocess
+import sys
+import pytest
+from movie_library import move_journal
+from movie_library.file_transfer import move_file
+from movie_library.move_journal import FAILED, FILE, MOVE, MOVED, UNDO, UNDO_FAILED, UNDONE, MoveJournal
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = MoveJournal(str(tmp_path / 'move_journal.db'))
+    yield journal
+    journal.close()
+
+@pytest.fixture
+def movie(tmp_path):
+    """A movie file and the genre folder it is on its way to"""
+    source = tmp_path / 'movies' / 'Alien (1979).mkv'
+    source.parent.mkdir()
+    source.write_bytes(b'movie')
+    (tmp_path / 'movies' / 'Sci-Fi').mkdir()
+    return str(source), str(tmp_path / 'movies' / 'Sci-Fi' / 'Alien (1979).mkv')
+
+def begin_as(journal, monkeypatch, pid, source, destination):
+    """Journal the start of a move as if process pid had written it"""
+    monkeypatch.setattr(move_journal, 'current_owner',
+                        lambda: f"{move_journal.HOSTNAME}:{pid}:{move_journal._process_start(pid) or ''}")
+    entry = journal.begin('batch', FILE, source, destination)
+    monkeypatch.undo()
+    return entry
+
+def undo_as(journal, monkeypatch, pid, entry):
+    """Journal the start of undoing entry as if process pid had written it"""
+    monkeypatch.setattr(move_journal, 'current_owner',
+                        lambda: f"{move_journal.HOSTNAME}:{pid}:{move_journal._process_start(pid) or ''}")
+    journal._append([(entry, UNDO, None)])
+    monkeypatch.undo()
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+def state(journal, entry):
+    return next(e['state'] for e in journal.entries('batch') if e['entry'] == entry)
+
+def replay(moves):
+    def move(source, destination):
+        moves.append((source, destination))
+        os.rename(source, destination)
+    return move
+
+def test_recover_leaves_moves_of_running_process_alone(journal, movie, monkeypatch):
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        entry = begin_as(journal, monkeypatch, process.pid, *movie)
+        moves = []
+        journal.recover(replay(moves))
+        assert moves == []
+        assert state(journal, entry) == MOVE
+    finally:
+        process.kill()
+        process.wait()
+
+def test_recover_replays_moves_of_exited_process(journal, movie, monkeypatch):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    entry = begin_as(journal, monkeypatch, process.pid, *movie)
+    moves = []
+    assert journal.recover(replay(moves))[MOVED] == 1
+    assert moves == [movie]
+    assert state(journal, entry) == MOVED
+
+def test_recover_leaves_own_moves_alone(journal, movie):
+    entry = journal.begin('batch', FILE, *movie)
+    journal.recover(replay([]))
+    assert state(journal, entry) == MOVE
+
+def test_entries_are_claimed_once(journal, movie, monkeypatch):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    begin_as(journal, monkeypatch, process.pid, *movie)
+    pending = journal._latest(actions=(MOVE,))
+    assert len(journal._claim(pending)) == 1
+    # A second recovering process read the same state before the first claimed it
+    assert journal._claim(pending) == []
+
+def test_recover_without_move_function_fails_unfinished_moves(journal, movie, monkeypatch):
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    entry = begin_as(journal, monkeypatch, process.pid, *movie)
+    assert journal.recover()[FAILED] == 1
+    assert state(journal, entry) == FAILED
+
+def test_undo_batch_moves_files_back(journal, movie):
+    source, destination = movie
+    entry = journal.begin('batch', FILE, source, destination)
+    move_file(source, destination)
+    journal.finish(entry)
+
+    assert journal.undo_batch('batch', move_file) == {'undone': 1, 'failed': 0}
+    assert os.path.exists(source) and not os.path.exists(destination)
+    assert state(journal, entry) == UNDONE
+
+def test_undo_batch_does_not_overwrite_a_new_file_at_the_source(journal, movie):
+    source, destination = movie
+    entry = journal.begin('batch', FILE, source, destination)
+    move_file(source, destination)
+    journal.finish(entry)
+    with open(source, 'wb') as f:
+        f.write(b'new')
+
+    assert journal.undo_batch('batch', move_file) == {'undone': 0, 'failed': 1}
+    assert state(journal, entry) == UNDO_FAILED
+    with open(source, 'rb') as f:
+        assert f.read() == b'new'
+
+def interrupted_undo(journal, monkeypatch, movie):
+    pid = exited_pid()
+    entry = begin_as(journal, monkeypatch, pid, *movie)
+    journal.finish(entry)
+    undo_as(journal, monkeypatch, pid, entry)
+    return entry
+
+def test_recover_completes_undo_that_moved_the_file_back(journal, movie, monkeypatch):
+    entry = interrupted_undo(journal, monkeypatch, movie)
+    assert journal.recover()[UNDONE] == 1
+    assert state(journal, entry) == UNDONE
+
+def test_recover_keeps_undo_that_never_started_undoable(journal, movie, monkeypatch):
+    source, destination = movie
+    entry = interrupted_undo(journal, monkeypatch, movie)
+    os.rename(source, destination)
+    assert journal.recover()[MOVED] == 1
+    assert state(journal, entry) == MOVED
+
+@pytest.mark.parametrize('layout', ['both', 'neither'])
+def test_recover_fails_undo_with_file_in_both_places_or_neither(journal, movie, monkeypatch, layout):
+    source, destination = movie
+    entry = interrupted_undo(journal, monkeypatch, movie)
+    if layout == 'both':
+        with open(destination, 'wb') as f:
+            f.write(b'other')
+    else:
+        os.remove(source)
+    assert journal.recover()[UNDO_FAILED] == 1
+    assert state(journal, entry) == UNDO_FAILED
+
+def test_recover_finishes_move_stopped_between_link_and_unlink(journal, movie, monkeypatch):
+    source, destination = movie
+    entry = begin_as(journal, monkeypatch, exited_pid(), *movie)
+    os.link(source, destination)
+    assert journal.recover(replay([]))[MOVED] == 1
+    assert state(journal, entry) == MOVED
+    assert not os.path.exists(source) and os.path.exists(destination)
@@ -0,0 +1,95 @@
+from typing import Dict, List
+import pytest
+from genre_suggester.base_suggester import GenreSuggesterInterface, GenreSuggestion
+from genre_suggester.cached_suggester import SuggestionCache
+from genre_suggester.pipeline_suggester import PipelineGenreSuggester, PipelineTier
+from genre_suggester.tmdb_suggester import suggestion_from_details
+
+GENRES = ['Action', 'Drama', 'Sci-Fi']
+
+class FixedSuggester(GenreSuggesterInterface):
+    """Answers from a {title: (genre, confidence)} table and records what it was asked"""
+
+    def __init__(self, answers: Dict[str, tuple]):
+        self.answers = answers
+        self.asked: List[str] = []
+
+    def initialize(self) -> None:
+        pass
+
+    def cleanup(self) -> None:
+        pass
+
+    def suggest_genre(self, title: str, valid_genres: List[str]) -> GenreSuggestion:
+        self.asked.append(title)
+        if title not in self.answers:
+            return GenreSuggestion(genre=None, confidence="Low", status="undetermined")
+        genre, confidence = self.answers[title]
+        return GenreSuggestion(genre=genre, confidence=confidence, status="success")
+
+def pipeline(*tiers, **kwargs):
+    pipeline = PipelineGenreSuggester(list(tiers), **kwargs)
+    pipeline.initialize()
+    return pipeline
+
+def test_answer_outside_configured_genres_does_not_stop_the_chain():
+    tmdb = FixedSuggester({'Alien (1979)': ('Science Fiction', 'High')})
+    openai = FixedSuggester({'Alien (1979)': ('Sci-Fi', 'High')})
+    suggester = pipeline(PipelineTier('tmdb', tmdb), PipelineTier('openai', openai, cost_per_title=0.001))
+    assert suggester.suggest_genre('Alien (1979)', GENRES).genre == 'Sci-Fi'
+    assert openai.asked == ['Alien (1979)']
+
+def test_new_genre_is_kept_when_no_tier_names_a_configured_one():
+    tmdb = FixedSuggester({'Up (2009)': ('Animation', 'High')})
+    openai = FixedSuggester({})
+    suggester = pipeline(PipelineTier('tmdb', tmdb), PipelineTier('openai', openai, cost_per_title=0.001))
+    assert suggester.suggest_genre('Up (2009)', GENRES).genre == 'Animation'
+
+def test_configured_genre_is_preferred_over_confident_new_genre():
+    tmdb = FixedSuggester({'Heat (1995)': ('Crime', 'High')})
+    openai = FixedSuggester({'Heat (1995)': ('Action', 'Low')})
+    suggester = pipeline(PipelineTier('tmdb', tmdb), PipelineTier('openai', openai, cost_per_title=0.001))
+    assert suggester.suggest_genre('Heat (1995)', GENRES).genre == 'Action'
+
+@pytest.mark.parametrize('tmdb_genres, genre', [
+    (['Science Fiction', 'Action'], 'Sci-Fi'),
+    (['Adventure', 'Action'], 'Action'),
+    (['Adventure'], 'Adventure'),
+])
+def test_tmdb_genres_map_onto_configured_genres(tmdb_genres, genre):
+    details = {'title': 'Alien', 'release_date': '1979-05-25', 'genres': [{'name': name} for name in tmdb_genres]}
+    assert suggestion_from_details('Alien (1979)', {'popularity': 50}, details, GENRES).genre == genre
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SuggestionCache(str(tmp_path / 'suggestion_cache.db'))
+    yield cache
+    cache.close()
+
+def test_remote_answers_are_cached(cache):
+    tmdb = FixedSuggester({'Heat (1995)': ('Action', 'High')})
+    suggester = pipeline(PipelineTier('tmdb', tmdb, remote=True), cache=cache)
+    suggester.suggest_genre('Heat (1995)', GENRES)
+    assert suggester.suggest_genre('Heat (1995)', GENRES).genre == 'Action'
+    assert tmdb.asked == ['Heat (1995)']
+
+def test_local_answers_are_not_cached(cache):
+    local = FixedSuggester({'Heat (1995)': ('Action', 'High')})
+    pipeline(PipelineTier('local_model', local), cache=cache).suggest_genre('Heat (1995)', GENRES)
+    assert cache.get('Heat (1995)', GENRES) is None
+
+def test_unsure_answer_is_not_cached_while_a_tier_failed(cache):
+    class Failing(FixedSuggester):
+        def suggest_genre(self, title, valid_genres):
+            return GenreSuggestion(genre=None, confidence="Low", status="error", message="timeout")
+
+    tmdb = FixedSuggester({'Heat (1995)': ('Action', 'Low')})
+    suggester = pipeline(PipelineTier('tmdb', tmdb, remote=True),
+                         PipelineTier('openai', Failing({}), cost_per_title=0.001, remote=True), cache=cache)
+    assert suggester.suggest_genre('Heat (1995)', GENRES).genre == 'Action'
+    assert cache.get('Heat (1995)', GENRES) is None
+
+    settled = pipeline(PipelineTier('tmdb', tmdb, remote=True),
+                       PipelineTier('openai', FixedSuggester({}), cost_per_title=0.001, remote=True), cache=cache)
+    settled.suggest_genre('Heat (1995)', GENRES)
+    assert cache.get('Heat (1995)', GENRES).genre == 'Action'
@@ -0,0 +1,44 @@
+import time
+from concurrent.futures import Executor, Future
+from genre_suggester.base_suggester import GenreSuggestion
+from movie_library.suggestion_jobs import SuggestionJobRunner
+
+class InlineExecutor(Executor):
+    """Runs each submitted call right away, so a job is finished when start returns"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.set_result(fn(*args, **kwargs))
+        return future
+
+def suggest_batch(folder, movie_paths, budget):
+    return [GenreSuggestion(genre='Drama', confidence='High', status='success') for _ in movie_paths]
+
+def runner(stored, **kwargs):
+    return SuggestionJobRunner(InlineExecutor(), suggest_batch,
+                               lambda folder, path, suggestion: stored.append(path), batch_size=2, **kwargs)
+
+def test_job_suggests_every_movie():
+    stored = []
+    job = runner(stored).start('/movies', ['a.mkv', 'b.mkv', 'c.mkv'])
+
+    assert job.to_dict()['state'] == 'completed'
+    assert (job.completed, job.suggested, job.failed) == (3, 3, 0)
+    assert stored == ['a.mkv', 'b.mkv', 'c.mkv']
+
+def test_finished_jobs_are_evicted_after_ttl():
+    jobs = runner([], job_ttl=60)
+    old = jobs.start('/movies', ['a.mkv'])
+    recent = jobs.start('/movies', ['b.mkv'])
+    old.finished_at = time.time() - 61
+
+    assert jobs.get(old.id) is None
+    assert jobs.list_jobs() == [recent]
+
+def test_running_jobs_are_kept():
+    jobs = runner([], job_ttl=0)
+    job = jobs.start('/movies', ['a.mkv'])
+    job.finished_at = None
+    job.created_at -= 3600
+
+    assert jobs.get(job.id) is job
@@ -0,0 +1,116 @@
+import threading
+import time
+from aiohttp import web
+from genre_suggester.http_utils import TokenBucket, create_session, request_with_retries
+from genre_suggester.tmdb_suggester import TMDBGenreSuggester
+
+GENRES = ['Action', 'Drama', 'Sci-Fi']
+
+def flaky_tmdb_app(requests, failures):
+    """TMDB endpoints that answer each path with the queued (status, headers) failures first"""
+    async def respond(request, body):
+        requests.append((request.path, request.transport.get_extra_info('peername')))
+        queued = failures.get(request.path)
+        if queued:
+            status, headers = queued.pop(0)
+            return web.json_response({'status_message': 'busy'}, status=status, headers=headers)
+        return web.json_response(body)
+
+    async def search(request):
+        return await respond(request, {'results': [{'id': 348, 'popularity': 80.0}]})
+
+    async def movie(request):
+        return await respond(request, {'title': 'Alien', 'release_date': '1979-05-25',
+                                       'genres': [{'name': 'Science Fiction'}]})
+
+    app = web.Application()
+    app.router.add_get('/search/movie', search)
+    app.router.add_get('/movie/348', movie)
+    return app
+
+def suggest(base_url, **kwargs):
+    suggester = TMDBGenreSuggester('key', base_url=base_url, **kwargs)
+    suggester.initialize()
+    try:
+        return suggester.suggest_genre('Alien (1979)', GENRES)
+    finally:
+        suggester.cleanup()
+
+def test_retries_rate_limited_requests_over_one_connection(stub_server):
+    requests = []
+    failures = {'/search/movie': [(429, {'Retry-After': '0'})], '/movie/348': [(429, {'Retry-After': '0'})]}
+    suggestion = suggest(stub_server.serve(flaky_tmdb_app(requests, failures)))
+    assert (suggestion.genre, suggestion.status) == ('Sci-Fi', 'success')
+    assert [path for path, _ in requests] == ['/search/movie', '/search/movie', '/movie/348', '/movie/348']
+    # Every request, retries included, went over the same keep-alive connection
+    assert len({peer for _, peer in requests}) == 1
+
+def test_gives_up_after_max_retries(stub_server):
+    requests = []
+    failures = {'/search/movie': [(429, {'Retry-After': '0'})] * 10}
+    suggestion = suggest(stub_server.serve(flaky_tmdb_app(requests, failures)), max_retries=2)
+    assert suggestion.status == 'error'
+    assert len(requests) == 3
+
+def test_backs_off_exponentially_on_server_errors(stub_server, monkeypatch):
+    requests = []
+    base_url = stub_server.serve(flaky_tmdb_app(requests, {'/search/movie': [(503, {})] * 3}))
+    delays = []
+    monkeypatch.setattr('genre_suggester.http_utils.time.sleep', delays.append)
+    session = create_session()
+    try:
+        response = request_with_retries(session, 'GET', f"{base_url}/search/movie", backoff_base=1.0)
+    finally:
+        session.close()
+    assert response.status_code == 200
+    # Each delay is the base doubled per attempt, with up to half taken off as jitter
+    assert [1.0 * 2 ** i / 2 <= delay <= 1.0 * 2 ** i for i, delay in enumerate(delays)] == [True] * 3
+
+def test_retry_after_pauses_the_shared_limiter(stub_server):
+    requests = []
+    base_url = stub_server.serve(flaky_tmdb_app(requests, {'/search/movie': [(429, {'Retry-After': '0.5'})]}))
+    limiter = TokenBucket(rate=100)
+    session = create_session()
+    retrying = threading.Thread(target=request_with_retries,
+                                args=(session, 'GET', f"{base_url}/search/movie"), kwargs={'rate_limiter': limiter})
+    retrying.start()
+    while not requests:
+        time.sleep(0.01)
+    time.sleep(0.1)
+    # Another thread asking while the first waits out the Retry-After waits too
+    start = time.monotonic()
+    limiter.acquire()
+    waited = time.monotonic() - start
+    retrying.join()
+    session.close()
+    assert waited >= 0.3
+
+def test_token_bucket_spaces_out_callers_across_threads():
+    limiter = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # One token up front, then one every 50 ms
+    assert time.monotonic() - start >= 0.25
+
+def test_token_bucket_pause_holds_every_caller():
+    limiter = TokenBucket(rate=100)
+    limiter.pause(0.2)
+    start = time.monotonic()
+    limiter.acquire()
+    assert time.monotonic() - start >= 0.2
+
+def test_token_bucket_pauses_at_once_do_not_add_up():
+    limiter = TokenBucket(rate=20)
+    threads = [threading.Thread(target=limiter.pause, args=(0.3,)) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    start = time.monotonic()
+    limiter.acquire()
+    waited = time.monotonic() - start
+    assert 0.25 <= waited < 0.6
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from movie_library import watcher as library_watcher
+from movie_library.index import LibraryIndex
+from movie_library.watcher import LibraryWatcher
+
+class UnwatchableObserver:
+    """Stands in for watchdog's observer on a mount where watches cannot be added"""
+    daemon = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def join(self):
+        pass
+
+    def schedule(self, handler, path, recursive=False):
+        raise OSError(28, 'inotify watch limit reached')
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / 'movies'
+    (root / 'Drama').mkdir(parents=True)
+    (root / 'Drama' / 'Heat (1995).mkv').write_bytes(b'movie')
+    index = LibraryIndex(str(tmp_path / 'library_index.db'))
+    index.refresh(str(root))
+    yield index, root
+    index.close()
+
+def watch_for_changes(index, root, mode):
+    changed = threading.Event()
+    changes = []
+
+    def on_changes(changed_root, change):
+        changes.append((changed_root, change))
+        changed.set()
+    watcher = LibraryWatcher(index, lambda: [str(root)], on_changes, mode=mode, poll_interval=0.1, debounce=0.05)
+    watcher.start()
+    try:
+        (root / 'Drama' / 'Ronin (1998).mkv').write_bytes(b'movie')
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+    return watcher, changes
+
+def test_roots_that_cannot_be_watched_are_polled(library, monkeypatch):
+    monkeypatch.setattr(library_watcher, 'Observer', UnwatchableObserver)
+    index, root = library
+    watcher, changes = watch_for_changes(index, root, 'inotify')
+    assert watcher._polled == {str(root)}
+    assert changes[0][0] == str(root)
+    assert [movie['path'] for movie in changes[0][1]['added']] == ['Drama/Ronin (1998).mkv']
+
+def test_auto_mode_polls_network_filesystems(library, monkeypatch):
+    monkeypatch.setattr(library_watcher, 'filesystem_type', lambda path: 'nfs4')
+    index, root = library
+    watcher, changes = watch_for_changes(index, root, 'auto')
+    assert watcher.mode == 'inotify' and watcher._watches == {}
+    assert watcher._polled == {str(root)}
+
+def test_filesystem_type_picks_the_innermost_mount(tmp_path, monkeypatch):
+    mounts = tmp_path / 'mounts'
+    mounts.write_text('/dev/sda1 / ext4 rw 0 0\n'
+                      f'nas:/movies {tmp_path}/My\\040Movies nfs4 rw 0 0\n')
+    monkeypatch.setattr(library_watcher, 'MOUNTS_FILE', str(mounts))
+    assert library_watcher.filesystem_type(str(tmp_path / 'My Movies' / 'Drama')) == 'nfs4'
+    assert library_watcher.filesystem_type(str(tmp_path / 'My Movies2')) == 'ext4'
@@ -0,0 +1,12 @@
+"""Entry point for production WSGI servers.
+
+    gunicorn --worker-class gthread --workers 1 --threads 16 --bind 0.0.0.0:5001 wsgi:app
+
+Threads, not processes, give the concurrency: suggestion calls spend their
+time waiting on the network, and jobs, move progress and library change
+events are kept in process memory, so every request must reach the same
+process.
+"""
+from app import create_app
+
+app = create_app()